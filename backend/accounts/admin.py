@@ -1,6 +1,23 @@
 from django.contrib import admin
-from .models import User
+from .models import Follow, User
 # Register your models here.
 
 
-admin.site.register(User)
+@admin.register(User)
+class UserAdmin(admin.ModelAdmin):
+    # Счётчики ведут сигналы Follow (accounts.signals) и команда recount_follows
+    readonly_fields = ('followers_count', 'following_count')
+
+
+@admin.register(Follow)
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ('follower', 'followee', 'created')
+    raw_id_fields = ('follower', 'followee')
+    search_fields = ('follower__username', 'followee__username')
+
+    def get_readonly_fields(self, request, obj=None):
+        # Ребро можно создать или удалить, но не перевесить: смена концов
+        # прошла бы мимо счётчиков подписок
+        if obj is not None:
+            return ('follower', 'followee', 'created')
+        return ('created',)
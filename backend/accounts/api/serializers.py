@@ -1,47 +1,105 @@
 from typing import Any
 
-from accounts.models import User, Notification
-from django.contrib.auth import update_session_auth_hash
+from accounts.backends import find_user_by_login
+from accounts.models import FollowSuggestion, User, Notification, get_following_ids
+from accounts.tokens import CachedBlacklistRefreshToken
+from post.models import PilotStats
+from django.contrib.auth import authenticate, update_session_auth_hash
+from django.contrib.auth.models import update_last_login
 from django.contrib.humanize.templatetags.humanize import naturalday
-from django.db.models import Q
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import (
+    TokenBlacklistSerializer,
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+
+
+def file_url(field_file, default=""):
+    """URL файла из ImageField/FileField; пустое поле или сбой хранилища дают ``default``."""
+    try:
+        if field_file:
+            return field_file.url
+    except Exception:
+        pass
+    return default
 
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     """Выдача JWT по имени пользователя или по email + пароль."""
 
+    token_class = CachedBlacklistRefreshToken
+
     def validate(self, attrs):
         login = (attrs.get("username") or "").strip()
         password = attrs.get("password")
-        user = User.objects.filter(
-            Q(username=login) | Q(email__iexact=login)
-        ).first()
-        if not user:
-            raise serializers.ValidationError("Неверный логин или пароль.")
-        if not user.check_password(password):
+        # authenticate(), а не check_password: проходят настроенные бэкенды,
+        # их user_can_authenticate и сигнал user_login_failed
+        user = authenticate(self.context.get("request"), username=login, password=password)
+        if user is None:
+            inactive = find_user_by_login(login) if login else None
+            if inactive is not None and not inactive.is_active and inactive.check_password(password):
+                raise serializers.ValidationError("Аккаунт деактивирован.")
             raise serializers.ValidationError("Неверный логин или пароль.")
-        if not user.is_active:
-            raise serializers.ValidationError("Аккаунт деактивирован.")
-        attrs["username"] = user.username
-        return super().validate(attrs)
+
+        # Пользователь уже проверен — токены выдаём сами, без повторного
+        # authenticate() (и второго хэширования) в super().validate()
+        self.user = user
+        refresh = self.get_token(user)
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, user)
+        return {"refresh": str(refresh), "access": str(refresh.access_token)}
 
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
         token["user_name"] = user.username
         token["is_staff"] = user.is_staff
-        try:
-            if user.profile_pic:
-                token["profile_pic"] = user.profile_pic.url
-            else:
-                token["profile_pic"] = ""
-        except Exception:
-            token["profile_pic"] = ""
+        # Вместе с user_name и is_staff позволяют собрать пользователя без
+        # запроса к базе (accounts.authentication.ClaimsJWTAuthentication)
+        token["is_read_only"] = user.is_read_only
+        token["is_active"] = user.is_active
+        token["profile_pic"] = file_url(user.profile_pic)
 
         return token
 
 
+class MyTokenRefreshSerializer(TokenRefreshSerializer):
+    """Ротация refresh-токена с проверкой чёрного списка через кэш (JWT_BLACKLIST_CACHE)."""
+
+    token_class = CachedBlacklistRefreshToken
+
+
+class MyTokenBlacklistSerializer(TokenBlacklistSerializer):
+    token_class = CachedBlacklistRefreshToken
+
+
+class UserBriefSerializer(serializers.ModelSerializer):
+    """
+    Компактная карточка пользователя для вложения (пилот маршрута, автор
+    жалобы и т.п.): только поля самой строки users, без доп. запросов.
+    """
+
+    profile_pic = serializers.SerializerMethodField()
+    pilot_type_display = serializers.CharField(source='get_pilot_type_display', read_only=True)
+
+    class Meta:
+        model = User
+        fields = [
+            "id",
+            "username",
+            "profile_pic",
+            "pilot_type",
+            "pilot_type_display",
+            "flight_hours",
+        ]
+        read_only_fields = fields
+
+    def get_profile_pic(self, user):
+        return file_url(user.profile_pic)
+
+
 class UserSerializer(serializers.ModelSerializer):
     followers = serializers.SerializerMethodField()
     following = serializers.SerializerMethodField()
@@ -87,13 +145,7 @@ class UserSerializer(serializers.ModelSerializer):
         representation = super().to_representation(instance)
         
         # Обрабатываем profile_pic
-        if instance.profile_pic:
-            try:
-                representation['profile_pic'] = instance.profile_pic.url
-            except Exception:
-                representation['profile_pic'] = ""
-        else:
-            representation['profile_pic'] = ""
+        representation['profile_pic'] = file_url(instance.profile_pic)
         
         # Обрабатываем cover_pic
         if instance.cover_pic:
@@ -111,10 +163,10 @@ class UserSerializer(serializers.ModelSerializer):
         return representation
 
     def get_followers(self, user):
-        return user.followers.count()
+        return user.followers_count
 
     def get_following(self, user):
-        return user.following.count()
+        return user.following_count
 
     def get_date_joined(self, user):
         return naturalday(user.date_joined)
@@ -128,7 +180,8 @@ class UserSerializer(serializers.ModelSerializer):
             return False
         if request.user.id == user.id:
             return False
-        return request.user.following.filter(id=user.id).exists()
+        # Один запрос на всю страницу: подписки зрителя запоминаются на request.user
+        return user.id in get_following_ids(request.user)
 
     def update(self, instance, validated_data):
         for attr, value in validated_data.items():
@@ -211,3 +264,84 @@ class NotificationSerializer(serializers.ModelSerializer):
                 setattr(instance, attr, value)
         instance.save()
         return instance
+
+
+class PilotStatsSerializer(serializers.ModelSerializer):
+    """Строка лидерборда: статистика пилота и краткие данные профиля."""
+
+    id = serializers.IntegerField(source="pilot_id", read_only=True)
+    username = serializers.CharField(source="pilot.username", read_only=True)
+    profile_pic = serializers.SerializerMethodField()
+    pilot_type = serializers.CharField(source="pilot.pilot_type", read_only=True)
+    total_hours = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PilotStats
+        fields = [
+            "id",
+            "username",
+            "profile_pic",
+            "pilot_type",
+            "routes_count",
+            "total_distance",
+            "total_duration",
+            "total_hours",
+            "aircraft_types_count",
+            "airports_count",
+        ]
+
+    def get_profile_pic(self, obj):
+        return file_url(obj.pilot.profile_pic)
+
+    def get_total_hours(self, obj):
+        return round(obj.total_duration.total_seconds() / 3600, 1)
+
+
+class FollowSuggestionSerializer(serializers.ModelSerializer):
+    """Рекомендация подписки: карточка кандидата и причины совпадения."""
+
+    user = UserBriefSerializer(source="candidate", read_only=True)
+
+    class Meta:
+        model = FollowSuggestion
+        fields = [
+            "user",
+            "score",
+            "shared_follows",
+            "shared_aircraft_types",
+            "shared_airports",
+        ]
+
+
+class FollowEdgeUserSerializer(serializers.Serializer):
+    """
+    Строка списка подписок/подписчиков: компактная карточка пользователя
+    с другого конца ребра Follow.
+
+    Счётчики берутся из колонок пользователя, is_following — из множества
+    ``viewer_following_ids``, которое вью собирает одним запросом на страницу.
+    """
+
+    # Какой конец ребра показываем: "follower" или "followee"
+    user_field = None
+
+    def to_representation(self, edge):
+        user = getattr(edge, self.user_field)
+        return {
+            "id": user.id,
+            "username": user.username,
+            "profile_pic": file_url(user.profile_pic),
+            "pilot_type": user.pilot_type,
+            "followers": user.followers_count,
+            "following": user.following_count,
+            "is_following": user.id in self.context.get("viewer_following_ids", ()),
+            "followed_at": serializers.DateTimeField().to_representation(edge.created),
+        }
+
+
+class FollowerSerializer(FollowEdgeUserSerializer):
+    user_field = "follower"
+
+
+class FollowingSerializer(FollowEdgeUserSerializer):
+    user_field = "followee"
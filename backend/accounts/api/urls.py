@@ -9,6 +9,8 @@ from .views import (
     FollowingListAPIView,
     FollowerListAPIView,
     PilotListAPIView,
+    PilotLeaderboardAPIView,
+    FollowSuggestionListAPIView,
     NotificationListAPIView,
     NotificationReadAPIView,
     NotificationReadAllAPIView,
@@ -29,6 +31,8 @@ urlpatterns = [
     path("follow_unfollow/<int:pk>/", FollowUnfollowUserAPIView.as_view()),
     path('api/token/blacklist/', TokenBlacklistView.as_view(), name='token_blacklist'),
     path("pilots/", PilotListAPIView.as_view(), name='pilot_list'),
+    path("pilots/leaderboard/", PilotLeaderboardAPIView.as_view(), name='pilot_leaderboard'),
+    path("suggestions/", FollowSuggestionListAPIView.as_view(), name='follow_suggestions'),
     path("notifications/", NotificationListAPIView.as_view(), name="notifications"),
     path(
         "notifications/<int:pk>/read/",
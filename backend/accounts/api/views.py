@@ -1,5 +1,7 @@
-from accounts.models import User, Notification
+from accounts.models import Follow, FollowSuggestion, User, Notification
+from django.conf import settings
 from django.db import models
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from datetime import timedelta
@@ -10,15 +12,28 @@ from rest_framework.generics import (
     RetrieveAPIView,
     UpdateAPIView,
 )
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.permissions import AllowAny, IsAdminUser
+from accounts.notifications import touch_notifications
 from accounts.permissions import IsAuthenticatedReadOnlyForDemo
-from post.models import Post, Comment
-
-from .serializers import MyTokenObtainPairSerializer, SignupSerializer, UserSerializer, NotificationSerializer
+from core.http_cache import AnonymousCacheMixin
+from post.models import Post, Comment, PilotStats
+from post.stats import LEADERBOARD_STATS
+
+from .serializers import (
+    MyTokenObtainPairSerializer,
+    SignupSerializer,
+    UserSerializer,
+    NotificationSerializer,
+    PilotStatsSerializer,
+    FollowSuggestionSerializer,
+    FollowerSerializer,
+    FollowingSerializer,
+)
 
 
 def get_tokens_for_user(user):
@@ -80,28 +95,56 @@ class UserDetailAPIView(RetrieveAPIView):
         data = serializer.data
         id = self.kwargs.get("id", None)
         if id and request.user.is_authenticated:
-            data["is_following"] = request.user.following.filter(id=id).exists()
+            data["is_following"] = Follow.objects.filter(follower=request.user, followee_id=id).exists()
         elif id:
             data["is_following"] = False
         return Response(data)
 
 
-class FollowingListAPIView(ListAPIView):
-    serializer_class = UserSerializer
+class FollowCursorPagination(CursorPagination):
+    """Keyset-пагинация по рёбрам Follow: стоимость страницы не зависит от её номера."""
+    ordering = ("-created", "-id")
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class FollowEdgeListAPIView(ListAPIView):
+    """Общая часть списков подписок и подписчиков пользователя ``id``."""
+    pagination_class = FollowCursorPagination
+    # Поле ребра, по которому фильтруем ("follower" / "followee")
+    edge_field = None
 
     def get_queryset(self):
         user_id = self.kwargs.get("id")
-        user = User.objects.get(id=user_id)
-        return user.following.all()
+        if not User.objects.filter(id=user_id).exists():
+            raise Http404
+        user_field = self.serializer_class.user_field
+        return Follow.objects.filter(**{f"{self.edge_field}_id": user_id}).select_related(user_field)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        context = self.get_serializer_context()
+        viewer = request.user
+        if viewer.is_authenticated and page:
+            # Состояние подписки зрителя — один запрос на страницу
+            user_ids = [getattr(edge, f"{self.serializer_class.user_field}_id") for edge in page]
+            context["viewer_following_ids"] = set(
+                Follow.objects.filter(follower=viewer, followee_id__in=user_ids)
+                .values_list("followee_id", flat=True)
+            )
+        serializer = self.serializer_class(page, many=True, context=context)
+        return self.get_paginated_response(serializer.data)
 
 
-class FollowerListAPIView(ListAPIView):
-    serializer_class = UserSerializer
+class FollowingListAPIView(FollowEdgeListAPIView):
+    serializer_class = FollowingSerializer
+    edge_field = "follower"
 
-    def get_queryset(self):
-        user_id = self.kwargs.get("id")
-        user = User.objects.get(id=user_id)
-        return user.followers.all()
+
+class FollowerListAPIView(FollowEdgeListAPIView):
+    serializer_class = FollowerSerializer
+    edge_field = "followee"
 
 
 class FollowUnfollowUserAPIView(APIView):
@@ -110,33 +153,25 @@ class FollowUnfollowUserAPIView(APIView):
     def post(self, request, pk):
         user = request.user
         other_user = get_object_or_404(User, pk=pk)
-        followed = False
         if user == other_user:
             return Response(
                 {"message": "Cannot follow yourself"}, status=status.HTTP_403_FORBIDDEN
             )
-        user_following = user.following
-        other_user_followers = other_user.followers
-        if user_following.filter(id=other_user.id).exists():
-            user_following.remove(other_user)
-            other_user_followers.remove(user)
-        else:
-            followed = True
-            user_following.add(other_user)
-            other_user_followers.add(user)
-            if other_user != user:
-                Notification.objects.create(
-                    user=other_user,
-                    actor=user,
-                    type="follow",
-                    message=f"{user.username} подписался на вас",
-                    target_type="user",
-                    target_id=user.id,
-                )
+        followed = Follow.toggle(user, other_user)
+        if followed:
+            FollowSuggestion.objects.filter(user=user, candidate=other_user).delete()
+            Notification.objects.create(
+                user=other_user,
+                actor=user,
+                type="follow",
+                message=f"{user.username} подписался на вас",
+                target_type="user",
+                target_id=user.id,
+            )
         data = SignupSerializer(user).data
         data["followed"] = followed
         # Число подписчиков у пользователя, на чей профиль смотрят (для обновления карточки)
-        data["followers"] = other_user.followers.count()
+        data["followers"] = other_user.followers_count
         return Response(data)
 
 
@@ -160,11 +195,13 @@ class ProfileUpdateAPIView(UpdateAPIView):
             user.save(update_fields=["profile_pic", "cover_pic"])
 
 
-class PilotListAPIView(ListAPIView):
+class PilotListAPIView(AnonymousCacheMixin, ListAPIView):
     """Список пилотов с фильтрацией по типу"""
     serializer_class = UserSerializer
     permission_classes = [AllowAny]
     authentication_classes = []
+    # Карточки пилотов: профиль, подписчики, статистика маршрутов
+    cache_scopes = ("pilots",)
     
     def get_queryset(self):
         queryset = User.objects.all()
@@ -191,10 +228,63 @@ class PilotListAPIView(ListAPIView):
         order_by = self.request.query_params.get('order_by', '-flight_hours')
         if order_by in ['flight_hours', '-flight_hours', 'username', '-username']:
             queryset = queryset.order_by(order_by)
+        elif order_by in ['logged_hours', '-logged_hours']:
+            # Реальный налёт по маршрутам из PilotStats (колонка с индексом)
+            duration = models.F('flight_stats__total_duration')
+            if order_by.startswith('-'):
+                queryset = queryset.order_by(duration.desc(nulls_last=True), 'id')
+            else:
+                queryset = queryset.order_by(duration.asc(nulls_first=True), 'id')
         
         return queryset
 
 
+class PilotLeaderboardAPIView(ListAPIView):
+    """Лидерборд пилотов по статистике маршрутов (?stat=total_distance и т.п.)"""
+    serializer_class = PilotStatsSerializer
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get_queryset(self):
+        stat = self.request.query_params.get('stat', 'total_duration')
+        if stat not in LEADERBOARD_STATS:
+            stat = 'total_duration'
+        queryset = PilotStats.objects.filter(
+            pilot__is_active=True,
+            routes_count__gt=0,
+        ).select_related('pilot')
+
+        pilot_type = self.request.query_params.get('pilot_type', None)
+        if pilot_type in ('virtual', 'real'):
+            queryset = queryset.filter(pilot__pilot_type__in=[pilot_type, 'both'])
+        elif pilot_type == 'both':
+            queryset = queryset.filter(pilot__pilot_type='both')
+
+        return queryset.order_by(f'-{stat}', 'pilot_id')
+
+
+class FollowSuggestionListAPIView(ListAPIView):
+    """«Возможно, вы знакомы»: предрассчитанные рекомендации (см. build_follow_suggestions)"""
+    serializer_class = FollowSuggestionSerializer
+    permission_classes = [IsAuthenticatedReadOnlyForDemo]
+    pagination_class = None
+
+    def get_queryset(self):
+        try:
+            limit = int(self.request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        limit = max(1, min(limit, settings.FOLLOW_SUGGESTIONS_PER_USER))
+        return (
+            FollowSuggestion.objects.filter(
+                user=self.request.user,
+                expires_at__gt=timezone.now(),
+            )
+            .select_related('candidate')
+            .order_by('-score', 'candidate_id')[:limit]
+        )
+
+
 class NotificationListAPIView(ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticatedReadOnlyForDemo]
@@ -223,7 +313,8 @@ class NotificationReadAllAPIView(APIView):
     allow_read_only_user = True
 
     def post(self, request):
-        Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        if Notification.objects.filter(user=request.user, is_read=False).update(is_read=True):
+            touch_notifications(request.user.pk)
         return Response({"status": "ok"})
 
 
@@ -0,0 +1,88 @@
+"""
+JWT-аутентификация без запроса к таблице пользователей на каждый запрос.
+
+Пользователь собирается из claims access-токена (id и флаги) и
+короткоживущего кэша состояния аккаунта как экземпляр ``User`` с
+отложенными остальными полями: если вью обратится к полю вне них, модель
+догрузит строку одним запросом (см. ``User.refresh_from_db``).
+
+Имя и флаги ``is_active``/``is_staff``/``is_read_only`` берутся из кэша
+состояния (``JWT_REVOCATION_CHECK_TTL`` секунд), а не из токена: кэш
+сбрасывается при сохранении пользователя, так что бан, снятие прав и
+переименование видны сразу, а не по истечении токена. Имя из claim
+``user_name`` не используется — после переименования оно устаревает.
+"""
+from django.conf import settings
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from accounts.models import User
+from core.cache import namespace
+
+cache = namespace("accounts")
+
+# claim -> поле пользователя
+CLAIM_FIELDS = {
+    "is_staff": "is_staff",
+    "is_read_only": "is_read_only",
+    "is_active": "is_active",
+}
+STATE_FIELDS = ("username", "is_active", "is_staff", "is_read_only")
+
+
+def _state_key(user_id) -> str:
+    return f"auth-state:{user_id}"
+
+
+def get_auth_state(user_id) -> dict | None:
+    """Актуальные имя и флаги аккаунта (None — пользователь удалён), с кэшем на TTL."""
+    key = _state_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        row = User.objects.filter(pk=user_id).values(*STATE_FIELDS).first()
+        # Пустой dict кэшируем как «пользователя нет»
+        state = row or {}
+        cache.set(key, state, settings.JWT_REVOCATION_CHECK_TTL)
+    return state or None
+
+
+def invalidate_auth_state(user_id) -> None:
+    cache.delete(_state_key(user_id))
+
+
+def user_from_claims(validated_token, state: dict) -> User:
+    """Экземпляр User только с полями из claims и состояния; остальные поля отложены."""
+    # simplejwt пишет id в claim строкой
+    values = {"id": User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])}
+    for claim, field in CLAIM_FIELDS.items():
+        values[field] = validated_token[claim]
+    values.update(state)
+    # from_db сопоставляет значения с полями по порядку полей модели
+    fields = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+    return User.from_db(router.db_for_read(User), fields, [values[field] for field in fields])
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication, которая не читает пользователя из базы.
+
+    Токены без нужных claims (выпущенные до их появления) и режим
+    CHECK_REVOKE_TOKEN, которому нужен хэш пароля, обрабатываются обычным
+    путём с загрузкой пользователя.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN or any(
+            claim not in validated_token for claim in CLAIM_FIELDS
+        ):
+            return super().get_user(validated_token)
+
+        state = get_auth_state(validated_token[api_settings.USER_ID_CLAIM])
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not state["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user_from_claims(validated_token, state)
@@ -0,0 +1,50 @@
+from django.contrib.auth.backends import ModelBackend
+from django.db.models.functions import Lower
+
+from accounts.models import User
+
+
+def find_user_by_login(login: str):
+    """
+    Пользователь по имени или email.
+
+    Ветка выбирается по виду ввода, и каждая идёт по своему индексу:
+    имя — по уникальному индексу username, email — по индексу lower(email).
+    Имя тоже может содержать «@», поэтому для такого ввода после email
+    проверяем и username.
+    """
+    if "@" in login:
+        user = (
+            User.objects.alias(email_lower=Lower("email"))
+            .filter(email_lower=login.lower())
+            .order_by("pk")
+            .first()
+        )
+        if user is not None:
+            return user
+    return User.objects.filter(username=login).first()
+
+
+class LoginBackend(ModelBackend):
+    """
+    ModelBackend со входом по имени или email (``find_user_by_login``).
+
+    Остальное — как у ModelBackend: ``user_can_authenticate`` отсекает
+    неактивных, права берутся из групп, а ``authenticate()`` при неудаче
+    шлёт ``user_login_failed``.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if not username or password is None:
+            return None
+        user = find_user_by_login(username.strip())
+        if user is None:
+            # Хэшируем пароль и для несуществующего логина, чтобы время ответа
+            # не выдавало, зарегистрирован ли он
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.suggestions import build_follow_suggestions
+
+
+class Command(BaseCommand):
+    help = "Precompute \"pilots you may know\" follow suggestions for all active users (run periodically)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=None,
+            help="Users processed per batch (defaults to FOLLOW_SUGGESTIONS_CHUNK_SIZE).",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Suggestions stored per user (defaults to FOLLOW_SUGGESTIONS_PER_USER).",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = build_follow_suggestions(chunk_size=options["chunk_size"], limit=options["limit"])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Follow suggestions built for {total} users in {elapsed:.1f}s."))
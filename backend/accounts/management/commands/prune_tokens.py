@@ -0,0 +1,75 @@
+import time
+from itertools import takewhile
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from accounts.tokens import remember_blacklisted
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding and blacklisted JWT refresh tokens in small batches "
+        "(run periodically instead of flushexpiredtokens)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Tokens deleted per transaction.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.0,
+            help="Pause between batches in seconds, to leave room for other writers.",
+        )
+        parser.add_argument(
+            "--warm-cache",
+            action="store_true",
+            help="Also load unexpired blacklisted jti values into the cache (JWT_BLACKLIST_CACHE).",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        now = timezone.now()
+        # Срок жизни refresh-токенов одинаковый, поэтому истёкшие токены — это
+        # префикс таблицы по первичному ключу. Читаем порции по pk и
+        # останавливаемся на первом живом токене: на expires_at нет индекса,
+        # и фильтр по нему сканировал бы весь истёкший префикс.
+        deleted = 0
+        last_id = 0
+        while True:
+            rows = list(
+                OutstandingToken.objects.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", "expires_at")[:chunk_size]
+            )
+            ids = [pk for pk, _ in takewhile(lambda row: row[1] <= now, rows)]
+            if ids:
+                # Короткая транзакция на порцию: блокировки держатся недолго
+                with transaction.atomic():
+                    BlacklistedToken.objects.filter(token_id__in=ids).delete()
+                    OutstandingToken.objects.filter(pk__in=ids).delete()
+                deleted += len(ids)
+                last_id = ids[-1]
+            if len(ids) < chunk_size:
+                break
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired tokens."))
+
+        if options["warm_cache"]:
+            warmed = 0
+            rows = BlacklistedToken.objects.filter(token__expires_at__gt=now).values_list(
+                "token__jti", "token__expires_at"
+            )
+            for jti, expires_at in rows.iterator(chunk_size=chunk_size):
+                remember_blacklisted(jti, expires_at)
+                warmed += 1
+            self.stdout.write(self.style.SUCCESS(f"Cached {warmed} blacklisted tokens."))
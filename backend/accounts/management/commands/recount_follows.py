@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from accounts.models import Follow, User
+
+
+def _edge_count(field: str):
+    edges = (
+        Follow.objects.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Coalesce(Subquery(edges, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute User.followers_count and User.following_count from the Follow table. "
+        "Signals keep them up to date; run this after bulk_create/update or raw SQL on Follow."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Users checked per transaction.")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        checked = fixed = 0
+        last_id = 0
+        while True:
+            ids = list(
+                User.objects.filter(pk__gt=last_id).order_by("pk").values_list("pk", flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            checked += len(ids)
+            drifted = list(
+                User.objects.filter(pk__in=ids)
+                .annotate(actual_followers=_edge_count("followee"), actual_following=_edge_count("follower"))
+                .filter(
+                    ~Q(followers_count=F("actual_followers")) | ~Q(following_count=F("actual_following"))
+                )
+                .values_list("pk", flat=True)
+            )
+            if drifted:
+                with transaction.atomic():
+                    # Считаем заново в самом UPDATE: подписки, появившиеся между
+                    # выборкой и записью, не теряются
+                    fixed += User.objects.filter(pk__in=drifted).update(
+                        followers_count=_edge_count("followee"),
+                        following_count=_edge_count("follower"),
+                    )
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} users, fixed counters of {fixed}."))
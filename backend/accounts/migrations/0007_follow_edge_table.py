@@ -0,0 +1,96 @@
+# Перенос подписок из двух зеркальных M2M (following/followers) в таблицу Follow
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def merge_follow_edges(apps, schema_editor):
+    """
+    Объединяет обе старые таблицы в рёбра follower -> followee.
+
+    following: (from_user подписан на to_user);
+    followers: (to_user подписан на from_user). Дубли и подписки на себя
+    отбрасываются.
+    """
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Follow = apps.get_model('accounts', 'Follow')
+    following = User.following.through.objects.values_list('from_user_id', 'to_user_id')
+    followers = User.followers.through.objects.values_list('to_user_id', 'from_user_id')
+
+    edges = {
+        (follower_id, followee_id)
+        for follower_id, followee_id in [*following.iterator(), *followers.iterator()]
+        if follower_id != followee_id
+    }
+    for batch in _chunks(sorted(edges), BATCH_SIZE):
+        Follow.objects.bulk_create(
+            [Follow(follower_id=follower_id, followee_id=followee_id) for follower_id, followee_id in batch],
+            ignore_conflicts=True,
+        )
+
+
+def split_follow_edges(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Follow = apps.get_model('accounts', 'Follow')
+    Following = User.following.through
+    Followers = User.followers.through
+    edges = list(Follow.objects.values_list('follower_id', 'followee_id'))
+    for batch in _chunks(edges, BATCH_SIZE):
+        Following.objects.bulk_create(
+            [Following(from_user_id=follower_id, to_user_id=followee_id) for follower_id, followee_id in batch],
+            ignore_conflicts=True,
+        )
+        Followers.objects.bulk_create(
+            [Followers(from_user_id=followee_id, to_user_id=follower_id) for follower_id, followee_id in batch],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_set_demo_user_read_only'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Follow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('followee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='follower_edges', to=settings.AUTH_USER_MODEL, verbose_name='На кого подписан')),
+                ('follower', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='following_edges', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Подписка',
+                'verbose_name_plural': 'Подписки',
+                'indexes': [models.Index(fields=['followee', 'follower'], name='follow_followee_idx')],
+                'constraints': [
+                    models.UniqueConstraint(fields=('follower', 'followee'), name='follow_unique_edge'),
+                    models.CheckConstraint(condition=models.Q(('follower', models.F('followee')), _negated=True), name='follow_not_self'),
+                ],
+            },
+        ),
+        migrations.RunPython(merge_follow_edges, split_follow_edges),
+        migrations.RemoveField(
+            model_name='user',
+            name='followers',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='following',
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following',
+            field=models.ManyToManyField(blank=True, related_name='followers', through='accounts.Follow', through_fields=('follower', 'followee'), to=settings.AUTH_USER_MODEL),
+        ),
+    ]
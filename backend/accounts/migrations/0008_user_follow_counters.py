@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:33
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_follow_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Follow = apps.get_model('accounts', 'Follow')
+
+    def count_of(field):
+        edges = (
+            Follow.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return Coalesce(Subquery(edges, output_field=IntegerField()), Value(0))
+
+    User.objects.update(
+        followers_count=count_of('followee'),
+        following_count=count_of('follower'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_follow_edge_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Подписок'),
+        ),
+        migrations.RunPython(populate_follow_counters, migrations.RunPython.noop),
+    ]
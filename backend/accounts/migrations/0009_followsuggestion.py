@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_user_follow_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FollowSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0, verbose_name='Оценка')),
+                ('shared_follows', models.PositiveIntegerField(default=0, verbose_name='Общих подписок')),
+                ('shared_aircraft_types', models.PositiveIntegerField(default=0, verbose_name='Общих типов самолетов')),
+                ('shared_airports', models.PositiveIntegerField(default=0, verbose_name='Общих аэропортов')),
+                ('expires_at', models.DateTimeField(verbose_name='Действует до')),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Кандидат')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='follow_suggestions', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Рекомендация подписки',
+                'verbose_name_plural': 'Рекомендации подписок',
+                'indexes': [models.Index(fields=['user', '-score', 'candidate'], name='suggestion_user_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'candidate'), name='suggestion_unique_pair')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_followsuggestion'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='follow',
+            name='follow_followee_idx',
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['follower', '-created', '-id'], name='follow_follower_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['followee', '-created', '-id'], name='follow_followee_created_idx'),
+        ),
+    ]
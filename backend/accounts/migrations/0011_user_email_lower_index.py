@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:46
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_follow_keyset_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='user_email_lower_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import AbstractUser
+from django.db.models.functions import Lower
 import hashlib
 import time
 from django.utils.translation import gettext as _
@@ -22,6 +23,11 @@ def cover_image_path(user, filename: str):
     return f"images/profile/cover/{directory_name}/{hash}.{extension}"
 
 
+# Поля карточки автора во фрагментах постов и маршрутов (post.fragments):
+# их изменение сбрасывает фрагменты, остальные сохранения — нет
+AUTHOR_CARD_FIELDS = ("username", "email", "profile_pic", "pilot_type", "flight_hours")
+
+
 class User(AbstractUser):
     PILOT_TYPE_CHOICES = [
         ('virtual', 'Виртуальный пилот'),
@@ -31,20 +37,21 @@ class User(AbstractUser):
     
     profile_pic = models.ImageField(
         upload_to=profile_path, null=True, blank=True)
+    # Подписки хранятся одной таблицей рёбер Follow:
+    # user.following — на кого подписан пользователь, user.followers — его подписчики
     following = models.ManyToManyField(
-        'self', 
-        symmetrical=False, 
+        'self',
+        through='Follow',
+        through_fields=('follower', 'followee'),
+        symmetrical=False,
         blank=True,
-        related_name='user_followers'
+        related_name='followers'
     )
     cover_pic = models.ImageField(
         upload_to=cover_image_path, null=True, blank=True, default="images/cover/coverphoto.jpg")
-    followers = models.ManyToManyField(
-        'self', 
-        symmetrical=False, 
-        blank=True,
-        related_name='user_following'
-    )
+    # Счётчики подписок; поддерживаются Follow.toggle и сигналом удаления пользователя
+    followers_count = models.PositiveIntegerField(default=0, verbose_name='Подписчиков')
+    following_count = models.PositiveIntegerField(default=0, verbose_name='Подписок')
     
     # Поля для пилотов
     pilot_type = models.CharField(
@@ -83,6 +90,75 @@ class User(AbstractUser):
         help_text='Запрет постов, комментариев, редактирования профиля и т.п.',
     )
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Вход по email без учёта регистра (см. MyTokenObtainPairSerializer)
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+        ]
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        """
+        Догрузка отложенного поля подтягивает сразу все отложенные поля.
+
+        Пользователь из JWT-claims (accounts.authentication) создаётся только
+        с id, именем и флагами; без этого каждое новое поле стоило бы
+        отдельного запроса.
+        """
+        if fields is not None:
+            deferred = self.get_deferred_fields()
+            if deferred and set(fields) <= deferred:
+                fields = list(deferred)
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._remember_author_card(fields)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_author_card()
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Перед записью запоминает изменённые поля карточки автора.
+
+        Сигналы post.signals читают ``_changed_author_fields`` вместо
+        лишнего SELECT старой строки; вход (``last_login``) их не трогает.
+        """
+        update_fields = kwargs.get("update_fields")
+        self._changed_author_fields = self.changed_author_fields(update_fields)
+        super().save(*args, **kwargs)
+        self._remember_author_card(update_fields)
+
+    def _author_card(self):
+        deferred = self.get_deferred_fields()
+        card = {}
+        for name in AUTHOR_CARD_FIELDS:
+            if name not in deferred:
+                value = getattr(self, name)
+                # Для файла сравниваем путь, а не объект FieldFile
+                card[name] = getattr(value, "name", value)
+        return card
+
+    def _remember_author_card(self, fields=None):
+        card = self._author_card()
+        if fields is not None:
+            card = {name: value for name, value in card.items() if name in fields}
+        self._loaded_author_card = {**getattr(self, "_loaded_author_card", {}), **card}
+
+    def changed_author_fields(self, update_fields=None):
+        """Поля карточки автора, отличающиеся от загруженных из базы."""
+        if self._state.adding or not hasattr(self, "_loaded_author_card"):
+            changed = set(AUTHOR_CARD_FIELDS)
+        else:
+            loaded = self._loaded_author_card
+            changed = {
+                name for name, value in self._author_card().items()
+                if name not in loaded or loaded[name] != value
+            }
+        if update_fields is not None:
+            changed &= set(update_fields)
+        return changed
+
     def media_posts(self):
         """Возвращает посты пользователя с изображениями"""
         from django.db.models import Q
@@ -100,6 +176,135 @@ class User(AbstractUser):
         return []
 
 
+class Follow(models.Model):
+    """Ребро графа подписок: follower подписан на followee."""
+
+    follower = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following_edges',
+        verbose_name=_("Подписчик"),
+    )
+    followee = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follower_edges',
+        verbose_name=_("На кого подписан"),
+    )
+    created = models.DateTimeField(auto_now_add=True, verbose_name=_("Создано"))
+
+    class Meta:
+        verbose_name = _("Подписка")
+        verbose_name_plural = _("Подписки")
+        constraints = [
+            # Уникальный индекс (follower, followee) покрывает проверки «подписан ли»
+            models.UniqueConstraint(fields=['follower', 'followee'], name='follow_unique_edge'),
+            models.CheckConstraint(
+                condition=~models.Q(follower=models.F('followee')),
+                name='follow_not_self',
+            ),
+        ]
+        indexes = [
+            # Постраничные списки подписок/подписчиков (keyset по created, id)
+            models.Index(fields=['follower', '-created', '-id'], name='follow_follower_created_idx'),
+            models.Index(fields=['followee', '-created', '-id'], name='follow_followee_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.follower_id} -> {self.followee_id}"
+
+    @classmethod
+    def toggle(cls, follower, followee) -> bool:
+        """
+        Подписывает или отписывает; возвращает True, если подписка появилась.
+
+        Без предварительного exists(): удаляем ребро, а если удалять было
+        нечего — вставляем его. Счётчики в базе меняют сигналы post_save и
+        post_delete (``accounts.signals``) — так их поддерживают и админка, и
+        каскадное удаление; здесь только обновляются загруженные объекты.
+        """
+        with transaction.atomic():
+            deleted, _ = cls.objects.filter(follower=follower, followee=followee).delete()
+            if deleted:
+                cls._sync_loaded_counters(follower, followee, -1)
+                return False
+            try:
+                with transaction.atomic():
+                    cls.objects.create(follower=follower, followee=followee)
+            except IntegrityError:
+                # Параллельный запрос уже подписал — счётчики увеличил его сигнал
+                return True
+            cls._sync_loaded_counters(follower, followee, 1)
+            return True
+
+    @staticmethod
+    def _sync_loaded_counters(follower, followee, delta: int) -> None:
+        # Отложенные (не загруженные) счётчики не трогаем, чтобы не догружать строку
+        if 'following_count' in follower.__dict__:
+            follower.following_count = max(follower.following_count + delta, 0)
+        if 'followers_count' in followee.__dict__:
+            followee.followers_count = max(followee.followers_count + delta, 0)
+        # Кэш id подписок (см. get_following_ids) больше не актуален
+        follower.__dict__.pop('_following_ids', None)
+
+
+def get_following_ids(user) -> frozenset:
+    """
+    Множество id пользователей, на которых подписан ``user``.
+
+    Запрашивается один раз за запрос (запоминается на объекте пользователя)
+    по индексу (follower, followee): им пользуются и фильтры видимости, и
+    is_following в сериализаторах — вместо exists() на каждую строку.
+    """
+    following_ids = getattr(user, '_following_ids', None)
+    if following_ids is None:
+        following_ids = frozenset(
+            Follow.objects.filter(follower=user).values_list('followee_id', flat=True)
+        )
+        user._following_ids = following_ids
+    return following_ids
+
+
+class FollowSuggestion(models.Model):
+    """
+    Предрассчитанная рекомендация «возможно, вы знакомы».
+
+    Заполняется пакетной задачей (accounts.suggestions); эндпоинт читает
+    строки пользователя по индексу (user, -score, candidate).
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+        verbose_name=_("Пользователь"),
+    )
+    candidate = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_("Кандидат"),
+    )
+    score = models.FloatField(default=0, verbose_name=_("Оценка"))
+    shared_follows = models.PositiveIntegerField(default=0, verbose_name=_("Общих подписок"))
+    shared_aircraft_types = models.PositiveIntegerField(default=0, verbose_name=_("Общих типов самолетов"))
+    shared_airports = models.PositiveIntegerField(default=0, verbose_name=_("Общих аэропортов"))
+    expires_at = models.DateTimeField(verbose_name=_("Действует до"))
+
+    class Meta:
+        verbose_name = _("Рекомендация подписки")
+        verbose_name_plural = _("Рекомендации подписок")
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'candidate'], name='suggestion_unique_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-score', 'candidate'], name='suggestion_user_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.candidate_id} ({self.score:.1f})"
+
+
 class Notification(models.Model):
     """Уведомления для пользователей."""
 
@@ -0,0 +1,25 @@
+"""
+Метка изменения уведомлений пользователя.
+
+Long-polling ``unread_count`` (``core.notification_views``) ждёт изменений,
+сверяя метку в общем кэше, а не пересчитывая непрочитанные в базе на каждом
+шаге. Метку меняют сигналы ``Notification`` и массовые ``update()``, которые
+сигналов не шлют.
+"""
+import time
+
+from core.cache import namespace
+
+cache = namespace("accounts")
+
+
+def _key(user_id) -> str:
+    return f"notifications:{user_id}"
+
+
+def get_notifications_version(user_id):
+    return cache.get(_key(user_id))
+
+
+def touch_notifications(user_id) -> None:
+    cache.set(_key(user_id), time.time_ns(), None)
@@ -0,0 +1,72 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from accounts.authentication import invalidate_auth_state
+from accounts.models import Follow, Notification, User
+from accounts.notifications import touch_notifications
+from core.http_cache import schedule_invalidation
+
+# Поля, которые не попадают в публичные ответы: их сохранение не сбрасывает кэш
+PRIVATE_UPDATE_FIELDS = {"last_login", "password"}
+
+
+@receiver(post_save, sender=User)
+def reset_auth_state(sender, instance, **kwargs):
+    """Бан, права, read-only — сбрасываем кэш состояния для JWT-аутентификации."""
+    invalidate_auth_state(instance.pk)
+
+
+@receiver(pre_delete, sender=User)
+def reset_deleted_auth_state(sender, instance, **kwargs):
+    invalidate_auth_state(instance.pk)
+
+
+def _shift_follow_counters(follower_id, followee_id, delta: int) -> None:
+    following = User.objects.filter(pk=follower_id)
+    followers = User.objects.filter(pk=followee_id)
+    if delta < 0:
+        following = following.filter(following_count__gt=0)
+        followers = followers.filter(followers_count__gt=0)
+    following.update(following_count=F("following_count") + delta)
+    followers.update(followers_count=F("followers_count") + delta)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    """
+    Счётчики подписок ведутся здесь, а не во вью: через них проходят и
+    ``Follow.toggle``, и админка, и каскад при удалении пользователя.
+    ``bulk_create``/``update`` сигналов не шлют — после них счётчики
+    пересчитывает команда ``recount_follows``.
+    """
+    if created and not raw:
+        _shift_follow_counters(instance.follower_id, instance.followee_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_removed_follow(sender, instance, **kwargs):
+    _shift_follow_counters(instance.follower_id, instance.followee_id, -1)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, update_fields=None, **kwargs):
+    """Профиль пользователя входит в карточки постов, маршрутов и пилотов (core.http_cache)."""
+    if update_fields and set(update_fields) <= PRIVATE_UPDATE_FIELDS:
+        return
+    schedule_invalidation("users", "pilots")
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_pilots_cache(sender, instance, **kwargs):
+    """Счётчики подписчиков выводятся в списке пилотов."""
+    schedule_invalidation("pilots")
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def touch_user_notifications(sender, instance, **kwargs):
+    """Будит long-polling счётчика непрочитанных (core.notification_views)."""
+    touch_notifications(instance.user_id)
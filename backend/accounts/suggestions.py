@@ -0,0 +1,248 @@
+"""
+Рекомендации подписок («возможно, вы знакомы»).
+
+Кандидаты ранжируются по трём сигналам:
+
+- общие подписки (друзья друзей): сколько из тех, на кого подписан
+  пользователь, подписаны на кандидата;
+- общие типы самолетов (``User.aircraft_types``);
+- общие аэропорты из маршрутов (``FlightRoute.departure/destination``).
+
+Пакетная задача идёт по пользователям порциями. Объём работы ограничен:
+индексы «тип самолета → пилоты» и «аэропорт → пилоты» строятся один раз за
+запуск и обрезаются до ``MAX_USERS_PER_KEY`` самых заметных пилотов, у
+пользователя учитываются не больше ``MAX_KEYS_PER_USER`` аэропортов. Друзья
+друзей берутся из ``MAX_FOLLOWEES_PER_USER`` последних подписок пользователя,
+а у каждой из них — из ``MAX_EDGES_PER_FOLLOWEE`` её последних подписок
+(окно ROW_NUMBER по индексу (follower, -created, -id)): подписка на
+знаменитость с сотнями тысяч подписок не раздувает порцию.
+"""
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber, Trim, Upper
+from django.utils import timezone
+
+from accounts.models import Follow, FollowSuggestion, User
+
+WEIGHT_SHARED_FOLLOW = 3.0
+WEIGHT_SHARED_AIRPORT = 1.5
+WEIGHT_SHARED_AIRCRAFT_TYPE = 1.0
+
+# Сколько пилотов держим на один тип самолета / аэропорт
+MAX_USERS_PER_KEY = 50
+# Сколько самых посещаемых аэропортов пользователя учитываем
+MAX_KEYS_PER_USER = 20
+# Друзья друзей: последние подписки пользователя и последние подписки каждой из них
+MAX_FOLLOWEES_PER_USER = 100
+MAX_EDGES_PER_FOLLOWEE = 50
+FOLLOWEE_BATCH_SIZE = 2000
+
+
+# Индексы счётчиков в списке кандидата
+_FOLLOWS, _AIRCRAFT_TYPES, _AIRPORTS = range(3)
+
+
+def _score(counters) -> float:
+    return (
+        counters[_FOLLOWS] * WEIGHT_SHARED_FOLLOW
+        + counters[_AIRPORTS] * WEIGHT_SHARED_AIRPORT
+        + counters[_AIRCRAFT_TYPES] * WEIGHT_SHARED_AIRCRAFT_TYPE
+    )
+
+
+def normalize_aircraft_type(value: str) -> str:
+    return " ".join(value.split()).upper()
+
+
+def _build_aircraft_index():
+    """Типы самолетов пользователей и обратный индекс тип → пилоты."""
+    user_types = {}
+    by_type = defaultdict(list)
+    rows = (
+        User.objects.filter(is_active=True)
+        .exclude(aircraft_types__isnull=True)
+        .exclude(aircraft_types="")
+        # Популярные пилоты попадают в обрезанные списки первыми
+        .order_by("-followers_count", "pk")
+        .values_list("pk", "aircraft_types")
+    )
+    for pk, raw in rows.iterator(chunk_size=2000):
+        types = {normalize_aircraft_type(item) for item in raw.split(",") if item.strip()}
+        if not types:
+            continue
+        user_types[pk] = types
+        for aircraft_type in types:
+            bucket = by_type[aircraft_type]
+            if len(bucket) < MAX_USERS_PER_KEY:
+                bucket.append(pk)
+    return user_types, by_type
+
+
+def _build_airport_index():
+    """Аэропорты пилотов (по числу посещений) и обратный индекс аэропорт → пилоты."""
+    from post.models import FlightRoute
+
+    visits = defaultdict(int)
+    routes = FlightRoute.objects.order_by()
+    for field in ("departure", "destination"):
+        pairs = (
+            routes.annotate(code=Upper(Trim(field)))
+            .values("pilot_id", "code")
+            .annotate(total=Count("pk"))
+            .values_list("pilot_id", "code", "total")
+        )
+        for pilot_id, code, total in pairs.iterator(chunk_size=5000):
+            if code:
+                visits[(pilot_id, code)] += total
+
+    per_pilot = defaultdict(list)
+    per_airport = defaultdict(list)
+    for (pilot_id, code), total in visits.items():
+        per_pilot[pilot_id].append((total, code))
+        per_airport[code].append((total, pilot_id))
+
+    pilot_airports = {
+        pilot_id: [code for _, code in heapq.nlargest(MAX_KEYS_PER_USER, items)]
+        for pilot_id, items in per_pilot.items()
+    }
+    by_airport = {
+        code: [pilot_id for _, pilot_id in heapq.nlargest(MAX_USERS_PER_KEY, items)]
+        for code, items in per_airport.items()
+    }
+    return pilot_airports, by_airport
+
+
+def _rank_chunk(user_ids, aircraft_index, airport_index, inactive_ids, limit):
+    """
+    Кандидаты для порции пользователей: {user_id: [(candidate_id, counters), ...]}.
+
+    counters — список [общие подписки, общие типы, общие аэропорты]: на
+    сотнях тысяч кандидатов за порцию это заметно дешевле объектов.
+    """
+    user_types, by_type = aircraft_index
+    pilot_airports, by_airport = airport_index
+
+    following = defaultdict(set)
+    recent_following = defaultdict(list)
+    for follower_id, followee_id in (
+        Follow.objects.filter(follower_id__in=user_ids)
+        .order_by("follower_id", "-created", "-pk")
+        .values_list("follower_id", "followee_id")
+    ):
+        following[follower_id].add(followee_id)
+        if len(recent_following[follower_id]) < MAX_FOLLOWEES_PER_USER:
+            recent_following[follower_id].append(followee_id)
+
+    # Последние подписки тех, на кого подписаны пользователи порции; id —
+    # пачками, чтобы не упереться в лимит параметров запроса
+    edges = defaultdict(list)
+    followee_ids = sorted({pk for ids in recent_following.values() for pk in ids})
+    for start in range(0, len(followee_ids), FOLLOWEE_BATCH_SIZE):
+        recent_edges = (
+            Follow.objects.filter(follower_id__in=followee_ids[start:start + FOLLOWEE_BATCH_SIZE])
+            .annotate(
+                position=Window(
+                    RowNumber(), partition_by=[F("follower_id")], order_by=[F("created").desc(), F("pk").desc()]
+                )
+            )
+            .filter(position__lte=MAX_EDGES_PER_FOLLOWEE)
+            .values_list("follower_id", "followee_id")
+        )
+        for follower_id, followee_id in recent_edges.iterator(chunk_size=5000):
+            edges[follower_id].append(followee_id)
+
+    candidates = {user_id: {} for user_id in user_ids}
+    # Друзья друзей: user -> X -> candidate; считаем число X
+    for user_id in user_ids:
+        user_candidates = candidates[user_id]
+        for followee_id in recent_following[user_id]:
+            for candidate_id in edges[followee_id]:
+                counters = user_candidates.get(candidate_id)
+                if counters is None:
+                    user_candidates[candidate_id] = [1, 0, 0]
+                else:
+                    counters[_FOLLOWS] += 1
+
+    for user_id in user_ids:
+        user_candidates = candidates[user_id]
+        for aircraft_type in user_types.get(user_id, ()):
+            for candidate_id in by_type.get(aircraft_type, ()):
+                counters = user_candidates.get(candidate_id)
+                if counters is None:
+                    user_candidates[candidate_id] = [0, 1, 0]
+                else:
+                    counters[_AIRCRAFT_TYPES] += 1
+        for code in pilot_airports.get(user_id, ()):
+            for candidate_id in by_airport.get(code, ()):
+                counters = user_candidates.get(candidate_id)
+                if counters is None:
+                    user_candidates[candidate_id] = [0, 0, 1]
+                else:
+                    counters[_AIRPORTS] += 1
+
+    ranked = {}
+    for user_id in user_ids:
+        user_candidates = candidates[user_id]
+        user_candidates.pop(user_id, None)
+        for candidate_id in following[user_id] | inactive_ids:
+            user_candidates.pop(candidate_id, None)
+        ranked[user_id] = heapq.nlargest(
+            limit,
+            user_candidates.items(),
+            key=lambda item: (_score(item[1]), -item[0]),
+        )
+    return ranked
+
+
+def build_follow_suggestions(chunk_size: int | None = None, limit: int | None = None) -> int:
+    """
+    Пересчитывает рекомендации всех активных пользователей.
+
+    Каждая порция заменяет свои строки в отдельной транзакции, так что
+    эндпоинт всё время видит либо старые, либо новые рекомендации.
+    Возвращает число обработанных пользователей.
+    """
+    chunk_size = chunk_size or settings.FOLLOW_SUGGESTIONS_CHUNK_SIZE
+    limit = limit or settings.FOLLOW_SUGGESTIONS_PER_USER
+    now = timezone.now()
+    expires_at = now + timedelta(hours=settings.FOLLOW_SUGGESTIONS_TTL_HOURS)
+
+    FollowSuggestion.objects.filter(expires_at__lte=now).delete()
+    aircraft_index = _build_aircraft_index()
+    airport_index = _build_airport_index()
+    inactive_ids = set(User.objects.filter(is_active=False).values_list("pk", flat=True))
+
+    total = 0
+    last_id = 0
+    while True:
+        user_ids = list(
+            User.objects.filter(pk__gt=last_id, is_active=True)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:chunk_size]
+        )
+        if not user_ids:
+            return total
+        ranked = _rank_chunk(user_ids, aircraft_index, airport_index, inactive_ids, limit)
+        rows = [
+            FollowSuggestion(
+                user_id=user_id,
+                candidate_id=candidate_id,
+                score=_score(counters),
+                shared_follows=counters[_FOLLOWS],
+                shared_aircraft_types=counters[_AIRCRAFT_TYPES],
+                shared_airports=counters[_AIRPORTS],
+                expires_at=expires_at,
+            )
+            for user_id, items in ranked.items()
+            for candidate_id, counters in items
+        ]
+        with transaction.atomic():
+            FollowSuggestion.objects.filter(user_id__in=user_ids).delete()
+            FollowSuggestion.objects.bulk_create(rows, batch_size=1000)
+        total += len(user_ids)
+        last_id = user_ids[-1]
@@ -1,3 +1,331 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from accounts.api.serializers import MyTokenObtainPairSerializer
+from accounts.authentication import ClaimsJWTAuthentication
+from accounts.models import Follow, FollowSuggestion, User
+from accounts.suggestions import build_follow_suggestions
+from accounts.tokens import CachedBlacklistRefreshToken
+from accounts.tokens import cache as blacklist_cache
+
+
+class FollowCounterTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        self.bob = User.objects.create_user(username="bob", email="bob@example.com", password="x")
+        self.carol = User.objects.create_user(username="carol", email="carol@example.com", password="x")
+
+    def _counts(self, user):
+        user.refresh_from_db(fields=["followers_count", "following_count"])
+        return user.followers_count, user.following_count
+
+    def test_toggle_updates_counters_once(self):
+        self.assertTrue(Follow.toggle(self.alice, self.bob))
+        self.assertEqual(self._counts(self.alice), (0, 1))
+        self.assertEqual(self._counts(self.bob), (1, 0))
+        self.assertFalse(Follow.toggle(self.alice, self.bob))
+        self.assertEqual(self._counts(self.alice), (0, 0))
+        self.assertEqual(self._counts(self.bob), (0, 0))
+
+    def test_direct_writes_update_counters(self):
+        # Так пишет админка: save() и delete() без Follow.toggle
+        edge = Follow.objects.create(follower=self.alice, followee=self.bob)
+        self.assertEqual(self._counts(self.bob), (1, 0))
+        edge.delete()
+        self.assertEqual(self._counts(self.bob), (0, 0))
+
+    def test_deleting_user_releases_neighbour_counters(self):
+        Follow.toggle(self.alice, self.bob)
+        Follow.toggle(self.bob, self.carol)
+        self.bob.delete()
+        self.assertEqual(self._counts(self.alice), (0, 0))
+        self.assertEqual(self._counts(self.carol), (0, 0))
+
+    def test_recount_fixes_drift_after_bulk_create(self):
+        Follow.objects.bulk_create(
+            [Follow(follower=self.alice, followee=self.bob), Follow(follower=self.carol, followee=self.bob)]
+        )
+        User.objects.filter(pk=self.carol.pk).update(followers_count=7)
+        out = io.StringIO()
+        call_command("recount_follows", chunk_size=2, stdout=out)
+        self.assertIn("fixed counters of 3", out.getvalue())
+        self.assertEqual(self._counts(self.alice), (0, 1))
+        self.assertEqual(self._counts(self.bob), (2, 0))
+        self.assertEqual(self._counts(self.carol), (0, 1))
+
+
+class FollowEdgeMigrationTests(TransactionTestCase):
+    """Подписки из старых M2M переживают переход на Follow и счётчики."""
+
+    migrate_from = [("accounts", "0006_set_demo_user_read_only")]
+    migrate_to = [("accounts", "0008_user_follow_counters")]
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_m2m_rows_become_edges_with_counters(self):
+        old_apps = self._migrate(self.migrate_from)
+        OldUser = old_apps.get_model("accounts", "User")
+        alice, bob, carol = (
+            OldUser.objects.create(username=name, email=f"{name}@example.com", password="x")
+            for name in ("alice", "bob", "carol")
+        )
+        Following = OldUser.following.through
+        Followers = OldUser.followers.through
+        # alice -> bob записана в обеих таблицах, bob -> carol только в followers,
+        # подписка на себя должна отброситься
+        Following.objects.create(from_user_id=alice.pk, to_user_id=bob.pk)
+        Followers.objects.create(from_user_id=bob.pk, to_user_id=alice.pk)
+        Followers.objects.create(from_user_id=carol.pk, to_user_id=bob.pk)
+        Following.objects.create(from_user_id=carol.pk, to_user_id=alice.pk)
+        Following.objects.create(from_user_id=carol.pk, to_user_id=carol.pk)
+
+        new_apps = self._migrate(self.migrate_to)
+        NewUser = new_apps.get_model("accounts", "User")
+        NewFollow = new_apps.get_model("accounts", "Follow")
+        self.assertEqual(
+            set(NewFollow.objects.values_list("follower__username", "followee__username")),
+            {("alice", "bob"), ("bob", "carol"), ("carol", "alice")},
+        )
+        counts = {
+            user.username: (user.followers_count, user.following_count)
+            for user in NewUser.objects.all()
+        }
+        self.assertEqual(counts, {"alice": (1, 1), "bob": (1, 1), "carol": (1, 1)})
+
+        self._migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+        out = io.StringIO()
+        call_command("recount_follows", stdout=out)
+        self.assertIn("Checked 3 users, fixed counters of 0.", out.getvalue())
+
+
+@override_settings(ACTION_LOG_BUFFERED=False)
+class FollowEdgeListTests(TestCase):
+    def setUp(self):
+        self.star = User.objects.create_user(username="star", email="star@example.com", password="x")
+        self.viewer = User.objects.create_user(username="viewer", email="viewer@example.com", password="x")
+        self.fans = [
+            User.objects.create_user(username=f"fan{i}", email=f"fan{i}@example.com", password="x")
+            for i in range(5)
+        ]
+        for fan in self.fans:
+            Follow.toggle(fan, self.star)
+        Follow.toggle(self.viewer, self.fans[0])
+        # Одинаковое время подписки: порядок держится на id
+        Follow.objects.filter(followee=self.star).update(created=timezone.now())
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def _walk(self, url):
+        pages, seen = 0, []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages += 1
+            seen += [row["username"] for row in response.data["results"]]
+            url = response.data["next"]
+        return pages, seen
+
+    def test_cursor_pages_are_stable_on_equal_timestamps(self):
+        pages, seen = self._walk(f"/api/accounts/{self.star.pk}/followers/?page_size=2")
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, [fan.username for fan in reversed(self.fans)])
+
+    def test_rows_carry_viewer_state_and_counters(self):
+        response = self.client.get(f"/api/accounts/{self.star.pk}/followers/")
+        rows = {row["username"]: row for row in response.data["results"]}
+        self.assertTrue(rows["fan0"]["is_following"])
+        self.assertFalse(rows["fan1"]["is_following"])
+        self.assertEqual((rows["fan0"]["followers"], rows["fan0"]["following"]), (1, 1))
+
+        response = self.client.get(f"/api/accounts/{self.fans[0].pk}/following/")
+        self.assertEqual([row["username"] for row in response.data["results"]], ["star"])
+
+    def test_unknown_user_is_404(self):
+        missing = User.objects.order_by("-pk").first().pk + 1
+        for kind in ("followers", "following"):
+            self.assertEqual(self.client.get(f"/api/accounts/{missing}/{kind}/").status_code, 404)
+
+
+class FollowSuggestionFanOutTests(TestCase):
+    def test_friends_of_friends_use_recent_edges_only(self):
+        alice, bob, old, new = (
+            User.objects.create_user(username=name, email=f"{name}@example.com", password="x")
+            for name in ("alice", "bob", "old", "new")
+        )
+        Follow.toggle(alice, bob)
+        Follow.toggle(bob, old)
+        Follow.toggle(bob, new)
+        Follow.objects.filter(follower=bob, followee=old).update(created=timezone.now() - timedelta(days=1))
+
+        with mock.patch("accounts.suggestions.MAX_EDGES_PER_FOLLOWEE", 1):
+            build_follow_suggestions()
+        suggested = FollowSuggestion.objects.filter(user=alice).values_list("candidate__username", "shared_follows")
+        self.assertEqual(list(suggested), [("new", 1)])
+
+
+@override_settings(JWT_BLACKLIST_CACHE=True)
+class BlacklistCacheTests(TestCase):
+    def test_revoked_refresh_token_is_kept_in_tokens_cache(self):
+        user = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        token = CachedBlacklistRefreshToken.for_user(user)
+        token.blacklist()
+
+        self.assertEqual(blacklist_cache.alias, "tokens")
+        self.assertTrue(caches["tokens"].get(blacklist_cache.make_key(token["jti"])))
+        with self.assertRaises(TokenError):
+            CachedBlacklistRefreshToken(str(token))
+
+
+class PruneTokensTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        now = timezone.now()
+        # Истёкшие токены идут префиксом по pk, за ними — живые
+        self.expired = [self._token(f"old{i}", now - timedelta(days=1)) for i in range(5)]
+        self.live = [self._token(f"new{i}", now + timedelta(days=1)) for i in range(2)]
+        BlacklistedToken.objects.create(token=self.expired[0])
+        BlacklistedToken.objects.create(token=self.live[0])
+        caches["tokens"].clear()
+
+    def _token(self, jti, expires_at):
+        return OutstandingToken.objects.create(
+            user=self.user, jti=jti, token=f"token-{jti}", created_at=expires_at - timedelta(days=7), expires_at=expires_at
+        )
+
+    def test_deletes_only_expired_prefix(self):
+        out = io.StringIO()
+        call_command("prune_tokens", chunk_size=2, stdout=out)
+        self.assertIn("Deleted 5 expired tokens.", out.getvalue())
+        self.assertEqual(
+            set(OutstandingToken.objects.values_list("jti", flat=True)), {"new0", "new1"}
+        )
+        self.assertEqual(list(BlacklistedToken.objects.values_list("token__jti", flat=True)), ["new0"])
+
+    def test_walk_is_bounded_by_pk(self):
+        with CaptureQueriesContext(connection) as queries:
+            call_command("prune_tokens", chunk_size=10, stdout=io.StringIO())
+        # Одна порция по pk, без фильтра по неиндексированному expires_at
+        walks = [query["sql"] for query in queries if "ORDER BY" in query["sql"]]
+        self.assertEqual(len(walks), 1)
+        self.assertNotIn("expires_at", walks[0].split("WHERE")[1])
+
+    def test_warm_cache_loads_live_blacklisted_tokens(self):
+        out = io.StringIO()
+        call_command("prune_tokens", warm_cache=True, stdout=out)
+        self.assertIn("Cached 1 blacklisted tokens.", out.getvalue())
+        self.assertTrue(blacklist_cache.get("new0"))
+        self.assertIsNone(blacklist_cache.get("old0"))
+
+
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password="old-password")
+        self.token = MyTokenObtainPairSerializer.get_token(self.user).access_token
+
+    def _authenticate(self):
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        return ClaimsJWTAuthentication().authenticate(request)[0]
+
+    def test_user_is_built_without_loading_the_row(self):
+        self._authenticate()
+        with self.assertNumQueries(0):
+            user = self._authenticate()
+        self.assertEqual((user.pk, user.username, user.is_active), (self.user.pk, "alice", True))
+        self.assertIn("email", user.get_deferred_fields())
+
+    def test_deferred_fields_load_on_access(self):
+        user = self._authenticate()
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, "alice@example.com")
+
+    def test_renamed_user_gets_new_name_with_old_token(self):
+        self._authenticate()
+        self.user.username = "alice-renamed"
+        self.user.save()
+        self.assertEqual(self._authenticate().username, "alice-renamed")
+
+    def test_deactivated_user_is_rejected(self):
+        self._authenticate()
+        self.user.is_active = False
+        self.user.save(update_fields=["is_active"])
+        with self.assertRaises(AuthenticationFailed) as raised:
+            self._authenticate()
+        self.assertEqual(raised.exception.detail["code"], "user_inactive")
+
+    def test_deleted_user_is_rejected(self):
+        self._authenticate()
+        self.user.delete()
+        with self.assertRaises(AuthenticationFailed) as raised:
+            self._authenticate()
+        self.assertEqual(raised.exception.detail["code"], "user_not_found")
+
+    def test_password_change_revokes_token_with_check_revoke_token(self):
+        # override_settings не доходит до модулей, импортировавших api_settings
+        with mock.patch.object(api_settings, "CHECK_REVOKE_TOKEN", True):
+            self.token = MyTokenObtainPairSerializer.get_token(self.user).access_token
+            self.assertEqual(self._authenticate().pk, self.user.pk)
+            self.user.set_password("new-password")
+            self.user.save()
+            with self.assertRaises(AuthenticationFailed) as raised:
+                self._authenticate()
+        self.assertEqual(raised.exception.detail["code"], "password_changed")
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", email="Alice@Example.com", password="secret-pass")
+        self.failed = []
+        user_login_failed.connect(self._record_failure)
+        self.addCleanup(user_login_failed.disconnect, self._record_failure)
+
+    def _record_failure(self, sender, credentials, **kwargs):
+        self.failed.append(credentials["username"])
+
+    def _login(self, login, password):
+        return APIClient().post("/api/accounts/token/", {"username": login, "password": password}, format="json")
+
+    def test_login_by_username_or_email(self):
+        for login in ("alice", "alice@example.com"):
+            with self.subTest(login=login):
+                response = self._login(login, "secret-pass")
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("access", response.json())
+        self.assertEqual(self.failed, [])
+
+    def test_wrong_password_and_unknown_user_are_rejected_alike(self):
+        for login in ("alice", "nobody"):
+            with self.subTest(login=login):
+                response = self._login(login, "wrong-pass")
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("Неверный логин или пароль.", str(response.json()))
+        self.assertEqual(self.failed, ["alice", "nobody"])
+
+    def test_inactive_user_is_rejected(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self._login("alice", "secret-pass")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Аккаунт деактивирован.", str(response.json()))
+        self.assertEqual(self.failed, ["alice"])
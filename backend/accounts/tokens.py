@@ -0,0 +1,48 @@
+"""
+Refresh-токен с необязательной проверкой чёрного списка через кэш.
+
+При ``JWT_BLACKLIST_CACHE=True`` отозванные jti записываются в кэш до
+истечения токена, и проверка при refresh не ходит в базу (JOIN
+BlacklistedToken/OutstandingToken). Кэш должен быть общим для всех
+процессов и не терять ключи — иначе отозванный токен может пройти
+проверку. Поэтому записи идут в отдельный кэш ``tokens``
+(``JWT_BLACKLIST_CACHE_URL``, в production — Redis с ``noeviction``), а не
+в общий кэш, который вытесняет давние ключи при нехватке памяти. Таблицы по-прежнему пишутся: после потери кэша его можно
+заполнить командой ``prune_tokens --warm-cache``.
+"""
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.cache import namespace
+
+cache = namespace("jwt-blacklist", alias="tokens")
+
+
+def remember_blacklisted(jti: str, expires_at: datetime) -> None:
+    """Запоминает отозванный jti в кэше до момента истечения токена."""
+    timeout = int((expires_at - datetime.now(timezone.utc)).total_seconds())
+    if timeout > 0:
+        cache.set(jti, True, timeout)
+
+
+class CachedBlacklistRefreshToken(RefreshToken):
+
+    def check_blacklist(self) -> None:
+        if not settings.JWT_BLACKLIST_CACHE:
+            return super().check_blacklist()
+        if cache.get(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        result = super().blacklist()
+        if settings.JWT_BLACKLIST_CACHE:
+            remember_blacklisted(
+                self.payload[api_settings.JTI_CLAIM],
+                datetime.fromtimestamp(self.payload["exp"], tz=timezone.utc),
+            )
+        return result
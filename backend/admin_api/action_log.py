@@ -0,0 +1,234 @@
+"""
+Буферизованная запись журнала действий (``UserActionLog``).
+
+Middleware кладёт запись в ограниченную очередь процесса и сразу отдаёт
+ответ. Фоновый поток забирает записи пачками и пишет их одним
+``bulk_create``, когда набралось ``ACTION_LOG_BATCH_SIZE`` записей или прошло
+``ACTION_LOG_FLUSH_INTERVAL`` секунд, и в той же транзакции обновляет
+сводки для дашборда (``admin_api.rollups``). При остановке воркера остаток очереди
+дописывается (``atexit``).
+
+Если база не успевает и очередь заполнена, новые записи отбрасываются —
+журнал не должен тормозить запросы. Число потерянных записей копится в
+``ActionLogWriter.dropped`` и периодически пишется в лог.
+
+Одна плохая строка не должна ронять всю пачку: IP из X-Forwarded-For
+проверяется до постановки в очередь (невалидный — NULL), а если пачка всё
+же не записалась (например, пользователя удалили до сброса буфера),
+записи повторяются по одной и теряются только отвергнутые базой.
+"""
+import atexit
+import ipaddress
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def clean_ip(value) -> str | None:
+    """IP-адрес для GenericIPAddressField или None, если это не адрес."""
+    if not value:
+        return None
+    try:
+        return str(ipaddress.ip_address(str(value).strip()))
+    except ValueError:
+        return None
+
+
+def _store_batch(entries: list, batch_size: int | None) -> None:
+    from admin_api.models import UserActionLog
+    from admin_api.rollups import record_entries
+
+    with transaction.atomic():
+        UserActionLog.objects.bulk_create(
+            [UserActionLog(**entry) for entry in entries], batch_size=batch_size
+        )
+        record_entries(entries)
+
+
+def store_entries(entries: list, batch_size: int | None = None) -> int:
+    """
+    Пишет записи журнала и прибавляет их к сводкам дашборда одной транзакцией.
+
+    Если база отвергла пачку, записи повторяются по одной; возвращает число
+    записанных.
+    """
+    try:
+        _store_batch(entries, batch_size)
+        return len(entries)
+    except DatabaseError:
+        if len(entries) == 1:
+            raise
+        logger.warning("Action log batch of %s entries failed, retrying one by one", len(entries), exc_info=True)
+
+    stored = 0
+    for entry in entries:
+        try:
+            _store_batch([entry], None)
+        except DatabaseError:
+            logger.exception(
+                "Dropping action log entry %r by user %s at %s", entry["action"], entry["user_id"], entry["created"]
+            )
+        else:
+            stored += 1
+    return stored
+
+
+class ActionLogWriter:
+    """Очередь записей журнала и поток, который сбрасывает её в базу."""
+
+    def __init__(self, buffer_size: int, batch_size: int, flush_interval: float):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max(1, buffer_size))
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._reported_dropped = 0
+
+    def submit(self, entry: dict) -> bool:
+        """Ставит запись в очередь; False — буфер полон и запись отброшена."""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def _ensure_thread(self) -> None:
+        # После fork (gunicorn --preload) поток родителя в дочернем процессе не живёт
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="action-log-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _next_batch(self) -> tuple[list, bool]:
+        """Пачка записей до batch_size или до истечения flush_interval."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _run(self) -> None:
+        stopped = False
+        while not stopped:
+            batch, stopped = self._next_batch()
+            self._write(batch)
+            self._report_dropped()
+
+    def _write(self, batch: list) -> None:
+        if not batch:
+            return
+        close_old_connections()
+        try:
+            store_entries(batch, batch_size=self.batch_size)
+        except Exception:
+            logger.exception("Failed to write %s action log entries", len(batch))
+        finally:
+            close_old_connections()
+
+    def _report_dropped(self) -> None:
+        dropped = self.dropped
+        if dropped != self._reported_dropped:
+            logger.warning(
+                "Action log buffer overflow: %s entries dropped (%s total)",
+                dropped - self._reported_dropped,
+                dropped,
+            )
+            self._reported_dropped = dropped
+
+    def drain(self, timeout: float = 5.0) -> None:
+        """Останавливает поток и дописывает всё, что осталось в очереди."""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(timeout)
+        self._thread = None
+        # Хвост, пришедший после маркера остановки
+        rest = []
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _STOP:
+                rest.append(entry)
+        self._write(rest)
+        self._report_dropped()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> ActionLogWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ActionLogWriter(
+                buffer_size=settings.ACTION_LOG_BUFFER_SIZE,
+                batch_size=settings.ACTION_LOG_BATCH_SIZE,
+                flush_interval=settings.ACTION_LOG_FLUSH_INTERVAL,
+            )
+            atexit.register(_writer.drain)
+        return _writer
+
+
+def should_sample(method: str) -> bool:
+    """GET-запросы пишем с вероятностью ACTION_LOG_GET_SAMPLE_RATE, остальные — всегда."""
+    if method not in ("GET", "HEAD"):
+        return True
+    rate = settings.ACTION_LOG_GET_SAMPLE_RATE
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def log_action(user_id, action: str, path: str, ip_address=None, extra=None) -> None:
+    """Записывает действие в журнал: через буфер или сразу, если он выключен."""
+    entry = {
+        "user_id": user_id,
+        "action": action[:150],
+        "path": path[:255],
+        "ip_address": clean_ip(ip_address),
+        "extra": extra or {},
+        # Время действия, а не время сброса буфера
+        "created": timezone.now(),
+    }
+    if not settings.ACTION_LOG_BUFFERED:
+        store_entries([entry])
+        return
+    get_writer().submit(entry)
@@ -6,3 +6,5 @@ class AdminApiConfig(AppConfig):
     name = "admin_api"
     verbose_name = "Админ API"
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,354 @@
+"""
+Хранение журнала действий (``UserActionLog``): срок жизни, архив, партиции.
+
+- Записи старше ``ACTION_LOG_RETENTION_DAYS`` удаляются порциями по
+  ``chunk_size`` строк в короткой транзакции каждая.
+- Перед удалением их можно выгрузить в хранилище (``default_storage``)
+  gzip-файлами JSONL, по файлу на месяц: ``ACTION_LOG_ARCHIVE_DIR/ГГГГ/ММ/``.
+- На PostgreSQL таблицу можно один раз перевести на помесячные партиции
+  (``prune_action_logs --partition``). Дальше та же команда заранее создаёт
+  партиции на ``ACTION_LOG_PARTITIONS_AHEAD`` месяцев вперёд, а истёкшие
+  месяцы архивирует и удаляет целиком (DROP вместо DELETE). Строки вне
+  созданных партиций попадают в партицию по умолчанию и переносятся в
+  нужную при её создании.
+
+Первичный ключ партиционированной таблицы — ``(id, created)``; Django
+по-прежнему считает ключом ``id``, значения берутся из последовательности.
+Миграции, меняющие эту таблицу после перевода, нужно проверять вручную.
+"""
+import gzip
+import json
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from admin_api.models import UserActionLog
+
+ARCHIVE_FIELDS = ("id", "user_id", "action", "path", "ip_address", "extra", "created")
+
+# SQL индекса для action__icontains (см. миграцию 0003)
+TRIGRAM_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS actionlog_action_trgm_idx"
+    " ON {table} USING gin (upper(action) gin_trgm_ops)"
+)
+
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def month_start(value: datetime) -> datetime:
+    value = value.astimezone(dt_timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1)
+
+
+def retention_cutoff(days: int | None = None) -> datetime | None:
+    """Граница хранения; None — журнал хранится бессрочно."""
+    days = settings.ACTION_LOG_RETENTION_DAYS if days is None else days
+    if days <= 0:
+        return None
+    return timezone.now() - timedelta(days=days)
+
+
+# --- Архив -------------------------------------------------------------------
+
+
+def archive_action_logs(start: datetime, end: datetime, chunk_size: int = 5000, storage=None) -> str | None:
+    """
+    Выгружает записи ``[start, end)`` в gzip JSONL и возвращает имя файла в
+    хранилище (None — записей нет). Файл собирается во временном файле, а не
+    в памяти.
+    """
+    storage = storage or default_storage
+    rows = (
+        UserActionLog.objects.filter(created__gte=start, created__lt=end)
+        .order_by()
+        .values(*ARCHIVE_FIELDS)
+    )
+    count = 0
+    with tempfile.TemporaryFile() as buffer:
+        with gzip.GzipFile(fileobj=buffer, mode="wb") as archive:
+            for row in rows.iterator(chunk_size=chunk_size):
+                line = json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False)
+                archive.write(line.encode("utf-8") + b"\n")
+                count += 1
+        if not count:
+            return None
+        buffer.seek(0)
+        name = (
+            f"{settings.ACTION_LOG_ARCHIVE_DIR}/{start:%Y/%m}/"
+            f"user_action_log_{start:%Y%m%dT%H%M%S}_{end:%Y%m%dT%H%M%S}.jsonl.gz"
+        )
+        return storage.save(name, File(buffer))
+
+
+# --- Удаление порциями ---------------------------------------------------------
+
+
+def purge_action_logs(start: datetime | None, end: datetime, chunk_size: int = 5000, sleep: float = 0.0) -> int:
+    """Удаляет записи ``[start, end)`` порциями; возвращает число удалённых строк."""
+    rows = UserActionLog.objects.filter(created__lt=end)
+    if start is not None:
+        rows = rows.filter(created__gte=start)
+    deleted = 0
+    while True:
+        # Выборка идёт по индексу на created; удалённые строки в неё больше не попадают
+        ids = list(rows.order_by("created").values_list("pk", flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            UserActionLog.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+        if sleep:
+            time.sleep(sleep)
+
+
+def expire_rows(cutoff: datetime, archive: bool, chunk_size: int = 5000, sleep: float = 0.0):
+    """
+    Архивирует (по желанию) и удаляет записи старше ``cutoff`` помесячно.
+
+    Каждый месяц сначала выгружается, потом удаляется: если выгрузка упала,
+    записи остаются в базе. Возвращает (удалено строк, список архивов).
+    """
+    oldest = (
+        UserActionLog.objects.filter(created__lt=cutoff)
+        .order_by("created")
+        .values_list("created", flat=True)
+        .first()
+    )
+    deleted, archives = 0, []
+    if oldest is None:
+        return deleted, archives
+    start = month_start(oldest)
+    while start < cutoff:
+        end = min(add_months(start, 1), cutoff)
+        if archive:
+            name = archive_action_logs(max(start, oldest), end, chunk_size=chunk_size)
+            if name:
+                archives.append(name)
+        deleted += purge_action_logs(start, end, chunk_size=chunk_size, sleep=sleep)
+        start = end
+    return deleted, archives
+
+
+# --- Партиции PostgreSQL -------------------------------------------------------
+
+
+def _table() -> str:
+    return UserActionLog._meta.db_table
+
+
+def _quote(name: str) -> str:
+    return connection.ops.quote_name(name)
+
+
+def _literal(value: datetime) -> str:
+    # Границы партиций в DDL нельзя передать параметрами
+    return "'" + value.astimezone(dt_timezone.utc).strftime("%Y-%m-%d %H:%M:%S+00") + "'"
+
+
+def is_partitioned() -> bool:
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid"
+            " WHERE c.relname = %s",
+            [_table()],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions() -> dict[datetime, str]:
+    """Помесячные партиции: {начало месяца: имя таблицы}."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i"
+            " JOIN pg_class c ON c.oid = i.inhrelid"
+            " JOIN pg_class p ON p.oid = i.inhparent"
+            " WHERE p.relname = %s",
+            [_table()],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        match = _PARTITION_SUFFIX.search(name)
+        if match:
+            start = datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)
+            partitions[start] = name
+    return partitions
+
+
+def _create_partition(cursor, start: datetime) -> str:
+    table = _table()
+    name = f"{table}_p{start:%Y%m}"
+    end = add_months(start, 1)
+    cursor.execute(f"CREATE TABLE {_quote(name)} (LIKE {_quote(table)} INCLUDING DEFAULTS)")
+    # Строки этого месяца, успевшие попасть в партицию по умолчанию
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {_quote(table + '_default')}"
+        f" WHERE created >= %s AND created < %s RETURNING *)"
+        f" INSERT INTO {_quote(name)} SELECT * FROM moved",
+        [start, end],
+    )
+    cursor.execute(
+        f"ALTER TABLE {_quote(table)} ATTACH PARTITION {_quote(name)}"
+        f" FOR VALUES FROM ({_literal(start)}) TO ({_literal(end)})"
+    )
+    return name
+
+
+def ensure_partitions(months_ahead: int | None = None, since: datetime | None = None) -> list[str]:
+    """Создаёт недостающие партиции с ``since`` (по умолчанию — текущий месяц) вперёд."""
+    months_ahead = settings.ACTION_LOG_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+    existing = list_partitions()
+    current = month_start(timezone.now())
+    start = month_start(since) if since else current
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        while start <= add_months(current, months_ahead):
+            if start not in existing:
+                created.append(_create_partition(cursor, start))
+            start = add_months(start, 1)
+    return created
+
+
+def drop_expired_partitions(cutoff: datetime, archive: bool, chunk_size: int = 5000) -> tuple[list, list]:
+    """Архивирует и удаляет партиции, целиком лежащие раньше ``cutoff``."""
+    table = _table()
+    dropped, archives = [], []
+    for start, name in sorted(list_partitions().items()):
+        end = add_months(start, 1)
+        if end > cutoff:
+            break
+        if archive:
+            archive_name = archive_action_logs(start, end, chunk_size=chunk_size)
+            if archive_name:
+                archives.append(archive_name)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {_quote(table)} DETACH PARTITION {_quote(name)}")
+            cursor.execute(f"DROP TABLE {_quote(name)}")
+        dropped.append(name)
+    return dropped, archives
+
+
+def convert_to_partitioned() -> list[str]:
+    """
+    Переводит таблицу журнала на помесячные партиции (только PostgreSQL).
+
+    Выполняется в одной транзакции и копирует все строки, поэтому на большой
+    таблице его стоит запускать после очистки по сроку хранения.
+    """
+    if connection.vendor != "postgresql":
+        raise ValueError("Партиционирование журнала поддерживается только на PostgreSQL.")
+    if is_partitioned():
+        return []
+
+    from accounts.models import User
+
+    table = _table()
+    legacy = f"{table}_legacy"
+    sequence = f"{table}_pk_seq"
+    user_table = User._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SELECT min(created), coalesce(max(id), 0) FROM {_quote(table)}")
+        oldest, max_id = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE {_quote(table)} RENAME TO {_quote(legacy)}")
+        # Имена индексов уникальны в схеме: старые освобождаем для новой таблицы
+        cursor.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+            [legacy, f"{table}_pkey"],
+        )
+        for (index_name,) in cursor.fetchall():
+            cursor.execute(f"DROP INDEX IF EXISTS {_quote(index_name)}")
+        cursor.execute(
+            f"ALTER TABLE {_quote(legacy)} RENAME CONSTRAINT {_quote(table + '_pkey')}"
+            f" TO {_quote(legacy + '_pkey')}"
+        )
+
+        cursor.execute(f"CREATE SEQUENCE {_quote(sequence)}")
+        cursor.execute("SELECT setval(%s, %s)", [sequence, max_id + 1])
+        cursor.execute(
+            f"CREATE TABLE {_quote(table)} (LIKE {_quote(legacy)} INCLUDING DEFAULTS)"
+            f" PARTITION BY RANGE (created)"
+        )
+        cursor.execute(
+            f"ALTER TABLE {_quote(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')"
+        )
+        cursor.execute(f"ALTER SEQUENCE {_quote(sequence)} OWNED BY {_quote(table)}.id")
+        cursor.execute(
+            f"ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(table + '_pkey')}"
+            f" PRIMARY KEY (id, created)"
+        )
+        cursor.execute(
+            f"ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(table + '_user_id_fk')}"
+            f" FOREIGN KEY (user_id) REFERENCES {_quote(user_table)} (id)"
+            f" DEFERRABLE INITIALLY DEFERRED"
+        )
+        cursor.execute(
+            f"CREATE TABLE {_quote(table + '_default')} PARTITION OF {_quote(table)} DEFAULT"
+        )
+
+    created = ensure_partitions(since=oldest)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {_quote(table)} SELECT * FROM {_quote(legacy)}")
+        cursor.execute(f"DROP TABLE {_quote(legacy)}")
+        with connection.schema_editor(atomic=False) as editor:
+            for index in UserActionLog._meta.indexes:
+                editor.add_index(UserActionLog, index)
+        cursor.execute(TRIGRAM_INDEX_SQL.format(table=_quote(table)))
+    return created
+
+
+# --- Точка входа ---------------------------------------------------------------
+
+
+def apply_retention(
+    days: int | None = None,
+    archive: bool | None = None,
+    chunk_size: int = 5000,
+    sleep: float = 0.0,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Полный проход: партиции вперёд, удаление истёкших месяцев и хвоста строк.
+
+    ``dry_run`` ничего не меняет: в отчёте — партиции и число строк, которые
+    были бы удалены.
+    """
+    archive = settings.ACTION_LOG_ARCHIVE if archive is None else archive
+    report = {"created_partitions": [], "dropped_partitions": [], "deleted": 0, "archives": []}
+    partitioned = is_partitioned()
+    if partitioned and not dry_run:
+        report["created_partitions"] = ensure_partitions()
+
+    cutoff = retention_cutoff(days)
+    if cutoff is None:
+        return report
+    if dry_run:
+        if partitioned:
+            report["dropped_partitions"] = [
+                name for start, name in sorted(list_partitions().items()) if add_months(start, 1) <= cutoff
+            ]
+        report["deleted"] = UserActionLog.objects.filter(created__lt=cutoff).count()
+        return report
+    if partitioned:
+        dropped, archives = drop_expired_partitions(cutoff, archive, chunk_size=chunk_size)
+        report["dropped_partitions"] = dropped
+        report["archives"] += archives
+    deleted, archives = expire_rows(cutoff, archive, chunk_size=chunk_size, sleep=sleep)
+    report["deleted"] = deleted
+    report["archives"] += archives
+    return report
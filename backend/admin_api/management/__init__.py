@@ -0,0 +1 @@
+"""Django management package for admin_api app."""
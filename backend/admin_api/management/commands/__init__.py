@@ -0,0 +1 @@
+"""Management commands for admin_api app."""
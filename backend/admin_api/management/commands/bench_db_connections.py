@@ -0,0 +1,76 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-request database latency with the current connection settings "
+        "(DB_CONN_MAX_AGE, DB_POOL). Each simulated request goes through the "
+        "request_started/request_finished signals like a real one and runs a small query. "
+        "Run it once per configuration and compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Simulated requests in total.")
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=1,
+            help="Concurrent request threads (like gunicorn --threads).",
+        )
+        parser.add_argument(
+            "--query",
+            default="SELECT 1",
+            help="SQL executed by every request.",
+        )
+
+    def handle(self, *args, **options):
+        opened = 0
+        lock = threading.Lock()
+
+        def count_connection(**kwargs):
+            nonlocal opened
+            with lock:
+                opened += 1
+
+        connection_created.connect(count_connection, weak=False)
+
+        def one_request(_):
+            started = time.perf_counter()
+            request_started.send(sender=self.__class__)
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(options["query"])
+                    cursor.fetchall()
+            finally:
+                request_finished.send(sender=self.__class__)
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=options["threads"]) as executor:
+            started = time.perf_counter()
+            latencies = sorted(executor.map(one_request, range(options["requests"])))
+            elapsed = time.perf_counter() - started
+        connection_created.disconnect(count_connection)
+
+        settings_dict = connection.settings_dict
+        pool = settings_dict.get("OPTIONS", {}).get("pool")
+        self.stdout.write(
+            f"{connection.vendor}: CONN_MAX_AGE={settings_dict['CONN_MAX_AGE']} "
+            f"health checks={settings_dict['CONN_HEALTH_CHECKS']} pool={bool(pool)}"
+        )
+        p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+        self.stdout.write(
+            f"{len(latencies)} requests, {options['threads']} threads: "
+            f"mean {statistics.mean(latencies) * 1000:.2f} ms, "
+            f"p50 {statistics.median(latencies) * 1000:.2f} ms, "
+            f"p95 {p95 * 1000:.2f} ms, "
+            f"{len(latencies) / elapsed:.0f} req/s, "
+            f"{opened} connections opened"
+        )
@@ -0,0 +1,88 @@
+import io
+import json
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from core.fast_json import BACKENDS, FastJSONParser, FastJSONRenderer, load_backend
+from post.api.route_serializers import FlightRouteSerializer
+from post.api.serializers import PostSerializer
+from post.models import FlightRoute, Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare JSON backends (orjson, msgspec, stdlib) on real API payloads: a feed page "
+        "of posts and a page of flight routes, serialized from the current database. "
+        "Reports render and parse time per payload and checks every backend against the "
+        "stdlib renderer: same bytes, or at least the same data after parsing "
+        "(float exponents may be written differently)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=100, help="Objects per payload.")
+        parser.add_argument("--iterations", type=int, default=200, help="Renders/parses per measurement.")
+
+    def handle(self, *args, **options):
+        request = Request(RequestFactory().get("/"))
+        request.user = AnonymousUser()
+        context = {"request": request}
+        limit = options["limit"]
+        payloads = {
+            "feed": PostSerializer(
+                Post.objects.select_related("creator").order_by("-created")[:limit], many=True, context=context
+            ).data,
+            "routes": FlightRouteSerializer(
+                FlightRoute.objects.select_related("pilot").order_by("-created")[:limit], many=True, context=context
+            ).data,
+        }
+        payloads = {
+            name: {"count": len(results), "next": None, "previous": None, "results": results}
+            for name, results in payloads.items()
+            if results
+        }
+        if not payloads:
+            raise CommandError("No posts or flight routes in the database to build payloads from.")
+
+        backends = []
+        for name in BACKENDS:
+            try:
+                backends.append(load_backend(name))
+            except ImproperlyConfigured as exc:
+                self.stdout.write(f"{name}: skipped ({exc})")
+
+        iterations = options["iterations"]
+        for payload_name, data in payloads.items():
+            self.stdout.write(f"{payload_name}: {data['count']} objects")
+            reference = JSONRenderer().render(data, "application/json")
+            for backend in backends:
+                renderer = type("Renderer", (FastJSONRenderer,), {"backend": backend})()
+                parser = type("Parser", (FastJSONParser,), {"backend": backend})()
+                body = renderer.render(data, "application/json")
+
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    renderer.render(data, "application/json")
+                render_time = (time.perf_counter() - started) / iterations
+
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    parser.parse(io.BytesIO(body), "application/json", {})
+                parse_time = (time.perf_counter() - started) / iterations
+
+                self.stdout.write(
+                    f"  {backend.name:8} {len(body):>8} bytes  "
+                    f"render {render_time * 1000:7.3f} ms  parse {parse_time * 1000:7.3f} ms  "
+                    f"same as stdlib: {self._compare(body, reference)}"
+                )
+
+    @staticmethod
+    def _compare(body: bytes, reference: bytes) -> str:
+        if body == reference:
+            return "yes"
+        return "same data" if json.loads(body) == json.loads(reference) else "NO"
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = "Show shared cache hit rates per namespace (summed over all workers)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Reset the counters after printing them.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Backend: {settings.CACHES['default']['BACKEND']}")
+        for name, stats in get_stats().items():
+            rate = "-" if stats["hit_rate"] is None else f"{stats['hit_rate']:.1%}"
+            self.stdout.write(f"{name:<12} hits={stats['hits']:<10} misses={stats['misses']:<10} hit rate={rate}")
+        if options["reset"]:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
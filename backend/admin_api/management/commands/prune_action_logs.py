@@ -0,0 +1,83 @@
+import argparse
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_api.log_retention import apply_retention, convert_to_partitioned
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply the user action log retention policy: archive and delete entries older than "
+        "ACTION_LOG_RETENTION_DAYS in small batches and maintain monthly partitions on PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=None,
+            help="Keep entries for this many days (defaults to ACTION_LOG_RETENTION_DAYS, 0 keeps everything).",
+        )
+        parser.add_argument(
+            "--archive",
+            action=argparse.BooleanOptionalAction,
+            default=None,
+            help="Export expired entries to gzipped JSONL in storage before deleting "
+            "(defaults to ACTION_LOG_ARCHIVE).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Entries deleted per transaction.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.0,
+            help="Pause between batches in seconds, to leave room for other writers.",
+        )
+        parser.add_argument(
+            "--partition",
+            action="store_true",
+            help="Convert the log table to monthly partitions first (PostgreSQL only, one-off).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be dropped and deleted; change nothing.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        if options["partition"] and dry_run:
+            raise CommandError("--partition cannot be combined with --dry-run.")
+        if options["partition"]:
+            try:
+                created = convert_to_partitioned()
+            except ValueError as exc:
+                raise CommandError(str(exc)) from exc
+            self.stdout.write(self.style.SUCCESS(f"Partitioned the log table ({len(created)} partitions)."))
+
+        report = apply_retention(
+            days=options["days"],
+            archive=options["archive"],
+            chunk_size=options["chunk_size"],
+            sleep=options["sleep"],
+            dry_run=dry_run,
+        )
+
+        for name in report["created_partitions"]:
+            self.stdout.write(f"Created partition {name}.")
+        for name in report["dropped_partitions"]:
+            self.stdout.write(f"Would drop partition {name}." if dry_run else f"Dropped partition {name}.")
+        for name in report["archives"]:
+            self.stdout.write(f"Archived to {name}.")
+        days = settings.ACTION_LOG_RETENTION_DAYS if options["days"] is None else options["days"]
+        if days <= 0:
+            self.stdout.write("Retention is disabled, nothing deleted.")
+        elif dry_run:
+            self.stdout.write(f"Would delete {report['deleted']} log entries.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Deleted {report['deleted']} log entries."))
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from admin_api.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recalculate the dashboard activity rollups (UserActionRollup) from the user action log."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=None,
+            help="Only rebuild the last N days (default: the whole log; older rollups are kept).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Log rows fetched per query.",
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options["days"]:
+            since = timezone.now() - timedelta(days=options["days"] - 1)
+        total = rebuild_rollups(since=since, chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rollups from {total} log entries."))
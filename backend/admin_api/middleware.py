@@ -1,7 +1,8 @@
 from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 
-from .models import SiteSettings, UserActionLog
+from .action_log import clean_ip, log_action, should_sample
+from .site_settings import get_site_settings
 
 
 class SiteClosedForPublicMiddleware(MiddlewareMixin):
@@ -28,8 +29,8 @@ class SiteClosedForPublicMiddleware(MiddlewareMixin):
         ):
             return None
 
-        # Получаем настройки сайта
-        settings_obj = SiteSettings.get_solo()
+        # Получаем настройки сайта (из памяти процесса, см. admin_api.site_settings)
+        settings_obj = get_site_settings()
         if not settings_obj.is_closed_for_public:
             return None
 
@@ -66,20 +67,25 @@ class UserActionLogMiddleware(MiddlewareMixin):
     Логирует действия аутентифицированных пользователей.
 
     Для уменьшения шума записываем:
-    - любые запросы (GET/POST/...) к /api/post/
+    - любые запросы (GET/POST/...) к /api/post/ (GET — с долей
+      ACTION_LOG_GET_SAMPLE_RATE)
     - мутационные запросы (POST/PUT/PATCH/DELETE) к /api/accounts/
+
+    Запись уходит в буфер (см. ``admin_api.action_log``) после ответа вью:
+    к этому моменту DRF уже аутентифицировал JWT-пользователя, а INSERT
+    выполняет фоновый поток.
     """
 
-    def process_view(self, request: HttpRequest, view_func, view_args, view_kwargs):
+    def process_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
         user = getattr(request, "user", None)
         if not (user and user.is_authenticated):
-            return None
+            return response
 
         path = request.path or ""
 
         # Не логируем чисто админские запросы (для них есть отдельные инструменты)
         if path.startswith("/api/admin/"):
-            return None
+            return response
 
         method = request.method.upper()
 
@@ -89,23 +95,23 @@ class UserActionLogMiddleware(MiddlewareMixin):
         elif path.startswith("/api/accounts/") and method in {"POST", "PUT", "PATCH", "DELETE"}:
             should_log = True
 
-        if not should_log:
-            return None
+        if not should_log or not should_sample(method):
+            return response
 
         try:
             xff = request.META.get("HTTP_X_FORWARDED_FOR", "")
-            ip = (xff.split(",")[0].strip() if xff else "") or request.META.get("REMOTE_ADDR")
+            # X-Forwarded-For присылает клиент: мусор в нём не должен ронять запись пачки
+            ip = clean_ip(xff.split(",")[0]) or request.META.get("REMOTE_ADDR")
 
-            UserActionLog.objects.create(
-                user=user,
+            log_action(
+                user_id=user.pk,
                 action=f"{method} {path}",
                 path=path,
                 ip_address=ip or None,
-                extra={},
+                extra={"status": response.status_code},
             )
         except Exception:
             # Логирование не должно ломать основной запрос
-            return None
-
-        return None
+            return response
 
+        return response
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='useractionlog',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Создано'),
+        ),
+    ]
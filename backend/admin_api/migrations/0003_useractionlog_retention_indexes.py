@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_action_trigram_index(apps, schema_editor):
+    """Фильтр action__icontains в ленте действий: триграммный индекс (только PostgreSQL)."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS actionlog_action_trgm_idx"
+        " ON admin_api_useractionlog USING gin (upper(action) gin_trgm_ops)"
+    )
+
+
+def drop_action_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS actionlog_action_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_api', '0002_useractionlog_created_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useractionlog',
+            index=models.Index(fields=['-created'], name='actionlog_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractionlog',
+            index=models.Index(fields=['user', '-created'], name='actionlog_user_created_idx'),
+        ),
+        migrations.AlterField(
+            model_name='useractionlog',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='action_logs', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.RunPython(create_action_trigram_index, drop_action_trigram_index),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:57
+
+from django.db import migrations, models
+
+# Сводки за уже накопленный журнал заполняет команда rebuild_action_rollups:
+# её запускают один раз после этой миграции. Миграция не зовёт код
+# приложения — он зависит от текущего urlconf и со временем меняется.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_api', '0003_useractionlog_retention_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserActionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Час'), ('day', 'День')], max_length=4, verbose_name='Период')),
+                ('bucket', models.DateTimeField(verbose_name='Начало периода')),
+                ('action_type', models.CharField(max_length=150, verbose_name='Тип действия')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество')),
+            ],
+            options={
+                'verbose_name': 'Сводка действий',
+                'verbose_name_plural': 'Сводки действий',
+                'ordering': ['period', 'bucket'],
+                'constraints': [models.UniqueConstraint(fields=('period', 'bucket', 'action_type'), name='actionrollup_unique_bucket')],
+            },
+        ),
+    ]
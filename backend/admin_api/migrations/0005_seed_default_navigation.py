@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+DEFAULT_PUBLIC_NAV_ITEMS = [
+    {"key": "home", "label": "Главная", "order": 0},
+    {"key": "explore", "label": "Обзор", "order": 1},
+    {"key": "pilots", "label": "Пилоты", "order": 2},
+    {"key": "routes", "label": "Маршруты", "order": 3},
+    {"key": "notifications", "label": "Уведомления", "order": 4},
+    {"key": "likes", "label": "Лайки", "order": 5},
+    {"key": "saved", "label": "Сохраненные", "order": 6},
+    {"key": "profile", "label": "Профиль", "order": 7},
+]
+
+
+def seed_default_navigation(apps, schema_editor):
+    """Базовые пункты публичного sidebar (раньше создавались на каждом GET навигации)."""
+    NavigationItem = apps.get_model('admin_api', 'NavigationItem')
+    existing = set(NavigationItem.objects.values_list('key', flat=True))
+    NavigationItem.objects.bulk_create([
+        NavigationItem(
+            key=item['key'],
+            label=item['label'],
+            order=item['order'],
+            location='public_sidebar',
+            is_visible_for_users=True,
+            is_enabled=True,
+        )
+        for item in DEFAULT_PUBLIC_NAV_ITEMS
+        if item['key'] not in existing
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_api', '0004_useractionrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_default_navigation, migrations.RunPython.noop),
+    ]
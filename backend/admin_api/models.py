@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 User = settings.AUTH_USER_MODEL
@@ -66,6 +67,8 @@ class UserActionLog(models.Model):
         blank=True,
         related_name="action_logs",
         verbose_name="Пользователь",
+        # Покрывается составным индексом (user, -created)
+        db_index=False,
     )
     action = models.CharField(max_length=150, verbose_name="Действие")
     path = models.CharField(max_length=255, blank=True, verbose_name="Путь/страница")
@@ -79,10 +82,15 @@ class UserActionLog(models.Model):
         blank=True,
         verbose_name="Доп. данные",
     )
-    created = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    # Не auto_now_add: буферизованная запись передаёт время самого действия
+    created = models.DateTimeField(default=timezone.now, editable=False, verbose_name="Создано")
 
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["-created"], name="actionlog_created_idx"),
+            models.Index(fields=["user", "-created"], name="actionlog_user_created_idx"),
+        ]
         verbose_name = "Лог действия пользователя"
         verbose_name_plural = "Логи действий пользователей"
 
@@ -90,6 +98,41 @@ class UserActionLog(models.Model):
         return f"{self.user} – {self.action} @ {self.created}"
 
 
+class UserActionRollup(models.Model):
+    """
+    Число действий по часам и дням в разрезе типа действия (см. admin_api.rollups).
+
+    Пополняется писателем журнала, читается дашбордом; переживает очистку
+    самого журнала по сроку хранения.
+    """
+
+    PERIOD_HOUR = "hour"
+    PERIOD_DAY = "day"
+
+    PERIOD_CHOICES = [
+        (PERIOD_HOUR, "Час"),
+        (PERIOD_DAY, "День"),
+    ]
+
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES, verbose_name="Период")
+    bucket = models.DateTimeField(verbose_name="Начало периода")
+    action_type = models.CharField(max_length=150, verbose_name="Тип действия")
+    count = models.PositiveIntegerField(default=0, verbose_name="Количество")
+
+    class Meta:
+        ordering = ["period", "bucket"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["period", "bucket", "action_type"], name="actionrollup_unique_bucket"
+            ),
+        ]
+        verbose_name = "Сводка действий"
+        verbose_name_plural = "Сводки действий"
+
+    def __str__(self) -> str:
+        return f"{self.action_type} @ {self.bucket} ({self.period}): {self.count}"
+
+
 class NavigationItem(models.Model):
     """Конфигурация пунктов меню (публичный sidebar, админ‑вкладки и т.п.)."""
 
@@ -0,0 +1,55 @@
+"""
+Публичная навигация (sidebar) из кэша с ETag.
+
+Конфигурация запрашивается при каждом запуске фронтенда, а меняется редко,
+поэтому готовый ответ вместе с ETag хранится в общем кэше ``core.cache``.
+Любое изменение ``NavigationItem`` (сигналы, ``NavigationConfigAPIView.put``)
+после коммита пересобирает запись целиком — читатели видят либо старую, либо новую
+конфигурацию, без промежуточного пустого кэша. Базовые пункты создаёт
+миграция ``0005_seed_default_navigation``.
+"""
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from core.cache import namespace
+
+cache = namespace("admin")
+
+PUBLIC_NAVIGATION_KEY = "navigation:public"
+
+
+def build_public_navigation() -> tuple[str, list]:
+    """(ETag, данные) видимых пользователям пунктов публичного sidebar."""
+    from admin_api.models import NavigationItem
+    from admin_api.serializers import NavigationItemSerializer
+
+    items = NavigationItem.objects.filter(
+        location=NavigationItem.LOCATION_PUBLIC_SIDEBAR,
+        is_visible_for_users=True,
+        is_enabled=True,
+    ).order_by("order", "id")
+    data = NavigationItemSerializer(items, many=True).data
+    payload = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode("utf-8")
+    etag = '"' + hashlib.md5(payload).hexdigest() + '"'
+    return etag, data
+
+
+def rebuild_public_navigation() -> tuple[str, list]:
+    entry = build_public_navigation()
+    cache.set(PUBLIC_NAVIGATION_KEY, entry, None)
+    return entry
+
+
+def get_public_navigation() -> tuple[str, list]:
+    entry = cache.get(PUBLIC_NAVIGATION_KEY)
+    if entry is None:
+        entry = rebuild_public_navigation()
+    return entry
+
+
+def schedule_navigation_rebuild() -> None:
+    """Пересобирает кэш после коммита текущей транзакции (или сразу вне её)."""
+    transaction.on_commit(rebuild_public_navigation)
@@ -0,0 +1,187 @@
+"""
+Сводки журнала действий для дашборда (``UserActionRollup``).
+
+Тип действия — метод и шаблон маршрута из резолвера URL, а не сам путь:
+``POST /api/post/routes/{pk}/like/``. Так число типов ограничено числом
+маршрутов: slug-и, username и прочие переменные сегменты не плодят новых
+строк, пути, которых нет в urlconf, сводятся к ``<метод> [unmatched]``, а
+нестандартные методы — к ``OTHER``. Счётчики ведутся по часам и по дням
+(границы дня — в ``TIME_ZONE``).
+
+Писатель журнала (``admin_api.action_log``) прибавляет каждую записанную
+пачку к сводкам в той же транзакции. ``rebuild_rollups`` (команда
+``rebuild_action_rollups``) пересчитывает их из журнала — для сверки и для
+заполнения истории: её запускают один раз после миграции, создавшей сводки. При ``ACTION_LOG_GET_SAMPLE_RATE`` < 1 сводки, как и
+журнал, содержат только записанные GET-запросы. Пересчёт, запущенный одновременно с записью журнала, может
+потерять или задвоить несколько только что записанных действий.
+"""
+import re
+from collections import Counter
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from functools import lru_cache
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+HOUR = "hour"
+DAY = "day"
+
+
+UNMATCHED = "[unmatched]"
+# Строк в одном INSERT: 4 параметра на строку, у SQLite предел — 999 параметров
+UPSERT_BATCH_SIZE = 200
+METHODS = {"GET", "HEAD", "OPTIONS", "POST", "PUT", "PATCH", "DELETE"}
+
+# <int:pk> в path() и (?P<pk>...) в re_path()
+_CONVERTER = re.compile(r"<(?:\w+:)?(\w+)>")
+_NAMED_GROUP = re.compile(r"\(\?P<(\w+)>[^)]*\)")
+
+
+@lru_cache(maxsize=4096)
+def route_pattern(path: str) -> str:
+    """``/api/post/routes/42/`` -> ``/api/post/routes/{pk}/``; неизвестный путь — ``[unmatched]``."""
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return UNMATCHED
+    route = _NAMED_GROUP.sub(r"{\1}", match.route).replace("^", "").replace("$", "")
+    return "/" + _CONVERTER.sub(r"{\1}", route)
+
+
+def action_type(action: str) -> str:
+    """``GET /api/post/routes/42/`` -> ``GET /api/post/routes/{pk}/``."""
+    method, _, path = action.partition(" ")
+    if method not in METHODS:
+        method = "OTHER"
+    return f"{method} {route_pattern(path)}"[:150]
+
+
+def hour_bucket(value: datetime) -> datetime:
+    return timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(value: datetime) -> datetime:
+    local = timezone.localtime(value)
+    return timezone.make_aware(datetime.combine(local.date(), time.min))
+
+
+def count_entries(entries) -> Counter:
+    """Счётчики {(период, начало, тип действия): число} для пар (created, action)."""
+    counts = Counter()
+    for created, action in entries:
+        kind = action_type(action)
+        counts[(HOUR, hour_bucket(created), kind)] += 1
+        counts[(DAY, day_bucket(created), kind)] += 1
+    return counts
+
+
+def add_counts(counts) -> None:
+    """
+    Прибавляет счётчики к сводкам одним ``INSERT … ON CONFLICT DO UPDATE``
+    на пачку (PostgreSQL и SQLite).
+
+    Прибавление делает сама база, поэтому параллельные писатели не теряют
+    счётчики и не блокируют лишних строк: каждая строка блокируется своим
+    оператором, а ключи отсортированы — порядок блокировок у всех писателей
+    одинаков, и взаимной блокировки нет.
+    """
+    from admin_api.models import UserActionRollup
+
+    if not counts:
+        return
+    table = connection.ops.quote_name(UserActionRollup._meta.db_table)
+    count_column = connection.ops.quote_name("count")
+    rows = sorted(counts.items(), key=lambda item: (item[0][0], item[0][1].timestamp(), item[0][2]))
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            params = []
+            for (period, bucket, kind), count in batch:
+                params += [period, connection.ops.adapt_datetimefield_value(bucket), kind, count]
+            cursor.execute(
+                f"INSERT INTO {table} (period, bucket, action_type, {count_column}) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s)'] * len(batch))} "
+                "ON CONFLICT (period, bucket, action_type) "
+                f"DO UPDATE SET {count_column} = {table}.{count_column} + EXCLUDED.{count_column}",
+                params,
+            )
+
+
+def record_entries(entries) -> None:
+    """Учитывает в сводках записи журнала (словари с created и action)."""
+    add_counts(count_entries((entry["created"], entry["action"]) for entry in entries))
+
+
+def rebuild_rollups(since: datetime | None = None, chunk_size: int = 5000) -> int:
+    """
+    Пересчитывает сводки из журнала начиная с ``since`` (с начала суток; None —
+    весь журнал). Более старые сводки не трогает: журнал мог быть очищен.
+    Возвращает число учтённых записей.
+    """
+    from admin_api.models import UserActionLog, UserActionRollup
+
+    rows = UserActionLog.objects.order_by()
+    stale = UserActionRollup.objects.all()
+    if since is not None:
+        since = day_bucket(since)
+        rows = rows.filter(created__gte=since)
+        stale = stale.filter(bucket__gte=since)
+
+    entries = rows.values_list("created", "action").iterator(chunk_size=chunk_size)
+    counts = count_entries(entries)
+    total = sum(count for (period, _, _), count in counts.items() if period == DAY)
+
+    with transaction.atomic():
+        stale.delete()
+        UserActionRollup.objects.bulk_create(
+            [
+                UserActionRollup(period=period, bucket=bucket, action_type=kind, count=count)
+                for (period, bucket, kind), count in counts.items()
+            ],
+            batch_size=1000,
+        )
+    return total
+
+
+def activity_series(days: int, period: str = DAY, kind: str | None = None, now: datetime | None = None) -> list:
+    """
+    Ряд [(начало периода, число)] за последние ``days`` дней, включая пустые
+    периоды. Читает не больше days * 24 сводок на тип действия.
+    """
+    from admin_api.models import UserActionRollup
+
+    now = now or timezone.now()
+    if period == HOUR:
+        # Шагаем в UTC: локальное время при переходе на летнее не непрерывно
+        last = hour_bucket(now).astimezone(dt_timezone.utc)
+        buckets = [
+            timezone.localtime(last - timedelta(hours=offset))
+            for offset in range(days * 24 - 1, -1, -1)
+        ]
+    else:
+        today = timezone.localtime(now).date()
+        buckets = [
+            timezone.make_aware(datetime.combine(today - timedelta(days=offset), time.min))
+            for offset in range(days - 1, -1, -1)
+        ]
+
+    rows = UserActionRollup.objects.filter(period=period, bucket__gte=buckets[0], bucket__lte=buckets[-1])
+    if kind:
+        rows = rows.filter(action_type=kind)
+    # Ключи — aware datetime: сравниваются по моменту времени, а не по поясу
+    totals = dict(
+        rows.order_by().values("bucket").annotate(total=Sum("count")).values_list("bucket", "total")
+    )
+    return [(bucket, totals.get(bucket, 0)) for bucket in buckets]
+
+
+def actions_since(since: datetime) -> int:
+    """Число действий с начала часа, в который попадает ``since``."""
+    from admin_api.models import UserActionRollup
+
+    total = UserActionRollup.objects.filter(period=HOUR, bucket__gte=hour_bucket(since)).aggregate(
+        total=Sum("count")
+    )["total"]
+    return total or 0
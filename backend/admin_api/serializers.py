@@ -2,7 +2,7 @@ from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
 from .models import Complaint, NavigationItem, SiteSettings, UserActionLog
-from accounts.api.serializers import UserSerializer
+from accounts.api.serializers import UserBriefSerializer, UserSerializer
 
 
 User = get_user_model()
@@ -19,8 +19,8 @@ class AdminMeSerializer(UserSerializer):
 
 
 class ComplaintSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
-    handled_by = UserSerializer(read_only=True)
+    user = UserBriefSerializer(read_only=True)
+    handled_by = UserBriefSerializer(read_only=True)
 
     class Meta:
         model = Complaint
@@ -45,7 +45,7 @@ class ComplaintUpdateSerializer(serializers.ModelSerializer):
 
 
 class UserActionLogSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+    user = UserBriefSerializer(read_only=True)
 
     class Meta:
         model = UserActionLog
@@ -66,6 +66,23 @@ class NavigationItemSerializer(serializers.ModelSerializer):
         ]
 
 
+class NavigationItemListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        keys = [item["key"] for item in attrs]
+        duplicates = sorted({key for key in keys if keys.count(key) > 1})
+        if duplicates:
+            raise serializers.ValidationError(f"Повторяющиеся ключи: {', '.join(duplicates)}.")
+        return attrs
+
+
+class NavigationItemWriteSerializer(NavigationItemSerializer):
+    """Пункт в PUT конфигурации: ключ уникален в пределах запроса, существующие пункты обновляются."""
+
+    class Meta(NavigationItemSerializer.Meta):
+        list_serializer_class = NavigationItemListSerializer
+        extra_kwargs = {"key": {"validators": []}}
+
+
 class SiteSettingsSerializer(serializers.ModelSerializer):
     class Meta:
         model = SiteSettings
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from admin_api.models import NavigationItem, SiteSettings
+from admin_api.navigation import schedule_navigation_rebuild
+from admin_api.site_settings import invalidate_site_settings
+
+
+@receiver(post_save, sender=SiteSettings)
+@receiver(post_delete, sender=SiteSettings)
+def reset_site_settings_cache(sender, instance, **kwargs):
+    """Воркеры перечитают настройки при следующей сверке версии."""
+    invalidate_site_settings()
+
+
+@receiver(post_save, sender=NavigationItem)
+@receiver(post_delete, sender=NavigationItem)
+def rebuild_navigation_cache(sender, instance, **kwargs):
+    """Правка пункта (в т.ч. из Django admin) пересобирает кэш публичной навигации."""
+    schedule_navigation_rebuild()
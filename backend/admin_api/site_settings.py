@@ -0,0 +1,63 @@
+"""
+Кэш ``SiteSettings`` в памяти процесса.
+
+Middleware режима обслуживания читает настройки на каждом запросе, поэтому
+экземпляр держится в памяти воркера. Раз в ``SITE_SETTINGS_CACHE_TTL`` секунд
+воркер сверяет номер версии в общем кэше ``core.cache`` (без запроса к базе) и
+перечитывает строку, только если версия изменилась. Сохранение настроек
+меняет версию (сигнал ``post_save``), так что изменение доходит до всех
+воркеров не позже чем через TTL.
+
+Версия работает только с общим кэшем (``CACHE_URL``, см. ``core.cache``).
+В памяти процесса другие воркеры её не видят, поэтому без общего кэша
+строка перечитывается из базы каждые TTL секунд.
+
+Возвращаемый экземпляр общий для всех запросов процесса — только для чтения.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+from core.cache import is_shared, namespace
+
+cache = namespace("admin")
+
+VERSION_KEY = "site-settings:version"
+
+# (экземпляр, версия, время проверки по time.monotonic())
+_entry = None
+# RLock: get_solo() при первом создании строки сам вызывает invalidate_site_settings()
+_lock = threading.RLock()
+
+
+def get_site_settings():
+    """Настройки сайта без обращения к базе в установившемся режиме."""
+    global _entry
+    from admin_api.models import SiteSettings
+
+    entry = _entry
+    now = time.monotonic()
+    if entry is not None and now - entry[2] < settings.SITE_SETTINGS_CACHE_TTL:
+        return entry[0]
+
+    with _lock:
+        entry = _entry
+        if entry is not None and now - entry[2] < settings.SITE_SETTINGS_CACHE_TTL:
+            return entry[0]
+        version = cache.get(VERSION_KEY)
+        if entry is not None and entry[1] == version and is_shared():
+            _entry = (entry[0], version, now)
+            return entry[0]
+        obj = SiteSettings.get_solo()
+        _entry = (obj, version, now)
+        return obj
+
+
+def invalidate_site_settings() -> None:
+    """Сбрасывает кэш этого процесса и меняет версию для остальных воркеров."""
+    global _entry
+    with _lock:
+        _entry = None
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
@@ -0,0 +1,295 @@
+import gzip
+import io
+import json
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps as django_apps
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+
+from . import site_settings
+from .action_log import clean_ip, store_entries
+from .rollups import DAY, HOUR, action_type, activity_series, add_counts, count_entries, hour_bucket
+from .middleware import SiteClosedForPublicMiddleware
+from .models import NavigationItem, SiteSettings, UserActionLog, UserActionRollup
+
+
+@override_settings(SITE_SETTINGS_CACHE_TTL=60)
+class SiteClosedForPublicMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        site_settings._entry = None
+        SiteSettings.get_solo()
+        self.factory = RequestFactory()
+        self.middleware = SiteClosedForPublicMiddleware(lambda request: HttpResponse("ok"))
+
+    def _request(self, path="/api/post/routes/", user=None):
+        request = self.factory.get(path)
+        request.user = user or AnonymousUser()
+        return request
+
+    def test_steady_state_makes_no_queries(self):
+        # Первый запрос прогревает кэш процесса
+        self.middleware.process_request(self._request())
+        with self.assertNumQueries(0):
+            for path in ("/api/post/routes/", "/media/avatar.png", "/static/app.js", "/"):
+                self.assertIsNone(self.middleware.process_request(self._request(path)))
+
+    @mock.patch("admin_api.site_settings.is_shared", return_value=True)
+    def test_expired_ttl_checks_version_without_query(self, _):
+        self.middleware.process_request(self._request())
+        with override_settings(SITE_SETTINGS_CACHE_TTL=0), self.assertNumQueries(0):
+            self.middleware.process_request(self._request())
+
+    def test_process_local_cache_rereads_row_after_ttl(self):
+        # Без общего кэша версию другого воркера не увидеть — читаем строку по TTL
+        self.middleware.process_request(self._request())
+        SiteSettings.objects.filter(pk=1).update(is_closed_for_public=True)
+        self.assertIsNone(self.middleware.process_request(self._request()))
+        with override_settings(SITE_SETTINGS_CACHE_TTL=0):
+            response = self.middleware.process_request(self._request())
+        self.assertEqual(response.status_code, 503)
+
+    def test_saving_settings_invalidates_cache(self):
+        self.middleware.process_request(self._request())
+        obj = SiteSettings.get_solo()
+        obj.is_closed_for_public = True
+        obj.maintenance_message = "Техработы"
+        obj.save()
+
+        response = self.middleware.process_request(self._request())
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(json.loads(response.content)["detail"], "Техработы")
+
+    def test_other_worker_picks_up_new_version_after_ttl(self):
+        self.middleware.process_request(self._request())
+        # Другой воркер сохранил настройки: в этом процессе остался старый экземпляр
+        SiteSettings.objects.filter(pk=1).update(is_closed_for_public=True)
+        site_settings.cache.set(site_settings.VERSION_KEY, "other-worker")
+
+        self.assertIsNone(self.middleware.process_request(self._request()))
+        with override_settings(SITE_SETTINGS_CACHE_TTL=0):
+            response = self.middleware.process_request(self._request())
+        self.assertEqual(response.status_code, 503)
+
+    def test_admin_passes_when_closed(self):
+        SiteSettings.objects.update_or_create(pk=1, defaults={"is_closed_for_public": True})
+        admin = User(username="admin", is_staff=True)
+        self.assertIsNone(self.middleware.process_request(self._request(user=admin)))
+
+
+@override_settings(COMPRESSION_MIN_SIZE=0)
+class PublicNavigationETagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("admin_api:navigation-public")
+
+    def test_compressed_etag_revalidates(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_strong_etag_revalidates(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(ACTION_LOG_BUFFERED=False)
+class NavigationConfigTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("admin_api:navigation")
+        self.public_url = reverse("admin_api:navigation-public")
+        admin = User.objects.create_user(username="admin", email="admin@example.com", password="x", is_staff=True)
+        self.admin = APIClient()
+        self.admin.force_authenticate(admin)
+
+    def _items(self, **labels):
+        return [
+            {"key": key, "label": label, "order": order, "location": "public_sidebar"}
+            for order, (key, label) in enumerate(labels.items())
+        ]
+
+    def _put(self, items):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.admin.put(self.url, items, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_put_upserts_by_key(self):
+        home_id = NavigationItem.objects.get(key="home").pk
+        self._put(self._items(home="Домой", routes="Маршруты", about="О проекте"))
+
+        self.assertEqual(
+            dict(NavigationItem.objects.values_list("key", "label")),
+            {"home": "Домой", "routes": "Маршруты", "about": "О проекте"},
+        )
+        # Обновлённый пункт сохраняет id
+        self.assertEqual(NavigationItem.objects.get(key="home").pk, home_id)
+
+    def test_put_invalidates_cached_etag(self):
+        old_etag = self.client.get(self.public_url)["ETag"]
+        self._put(self._items(home="Домой", routes="Маршруты"))
+
+        response = self.client.get(self.public_url, HTTP_IF_NONE_MATCH=old_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["label"] for item in response.json()], ["Домой", "Маршруты"])
+        new_etag = response["ETag"]
+        self.assertNotEqual(new_etag, old_etag)
+
+        # Та же конфигурация — тот же ETag
+        self._put(self._items(home="Домой", routes="Маршруты"))
+        self.assertEqual(self.client.get(self.public_url, HTTP_IF_NONE_MATCH=new_etag).status_code, 304)
+
+    def test_seed_migration_is_idempotent(self):
+        seed = import_module("admin_api.migrations.0005_seed_default_navigation")
+        NavigationItem.objects.filter(key="home").update(label="Домой")
+        NavigationItem.objects.filter(key="saved").delete()
+
+        seed.seed_default_navigation(django_apps, None)
+        seed.seed_default_navigation(django_apps, None)
+
+        keys = [item["key"] for item in seed.DEFAULT_PUBLIC_NAV_ITEMS]
+        self.assertEqual(sorted(NavigationItem.objects.values_list("key", flat=True)), sorted(keys))
+        # Существующие пункты не перезаписываются
+        self.assertEqual(NavigationItem.objects.get(key="home").label, "Домой")
+
+
+class ActionLogStoreTests(TransactionTestCase):
+    """Плохая запись не должна уносить с собой всю пачку журнала."""
+
+    def _entry(self, user_id, action="GET /api/post/"):
+        return {
+            "user_id": user_id,
+            "action": action,
+            "path": "/api/post/",
+            "ip_address": None,
+            "extra": {},
+            "created": timezone.now(),
+        }
+
+    def test_entry_of_deleted_user_is_dropped_alone(self):
+        user = User.objects.create_user(username="alive", email="alive@example.com", password="x")
+        gone = User.objects.create_user(username="gone", email="gone@example.com", password="x")
+        gone_id = gone.pk
+        gone.delete()
+
+        with self.assertLogs("admin_api.action_log", "ERROR"):
+            stored = store_entries([self._entry(user.pk), self._entry(gone_id), self._entry(user.pk)])
+
+        self.assertEqual(stored, 2)
+        self.assertEqual(UserActionLog.objects.filter(user=user).count(), 2)
+        self.assertEqual(
+            UserActionRollup.objects.filter(period=UserActionRollup.PERIOD_DAY).values_list("count", flat=True).get(), 2
+        )
+
+    def test_clean_ip(self):
+        self.assertEqual(clean_ip(" 10.0.0.1 "), "10.0.0.1")
+        self.assertEqual(clean_ip("2001:DB8::1"), "2001:db8::1")
+        self.assertIsNone(clean_ip("unknown"))
+        self.assertIsNone(clean_ip("10.0.0.1:8080"))
+        self.assertIsNone(clean_ip(""))
+
+
+class ActionRollupTests(TestCase):
+    def test_action_type_uses_route_pattern(self):
+        self.assertEqual(action_type("POST /api/post/routes/42/like/"), "POST /api/post/routes/{pk}/like/")
+        self.assertEqual(action_type("GET /api/accounts/7/info/"), "GET /api/accounts/{id}/info/")
+        self.assertEqual(action_type("GET /api/post/routes/not-a-number/"), "GET [unmatched]")
+        self.assertEqual(action_type("BREW /api/post/routes/1/"), "OTHER /api/post/routes/{pk}/")
+
+    def test_add_counts_accumulates(self):
+        now = timezone.now()
+        entries = [(now, "GET /api/post/routes/1/"), (now, "GET /api/post/routes/2/"), (now, "POST /api/post/routes/3/like/")]
+        add_counts(count_entries(entries))
+        add_counts(count_entries(entries[:1]))
+        daily = dict(UserActionRollup.objects.filter(period=DAY).values_list("action_type", "count"))
+        self.assertEqual(daily, {"GET /api/post/routes/{pk}/": 3, "POST /api/post/routes/{pk}/like/": 1})
+        self.assertEqual(UserActionRollup.objects.count(), 4)
+
+    def test_add_counts_upserts_in_batches(self):
+        now = timezone.now()
+        entries = [(now, "GET /api/post/routes/1/"), (now, "POST /api/post/routes/1/like/")] * 2
+        with mock.patch("admin_api.rollups.UPSERT_BATCH_SIZE", 1):
+            add_counts(count_entries(entries))
+            add_counts(count_entries(entries))
+        hourly = UserActionRollup.objects.filter(period=HOUR, bucket=hour_bucket(now))
+        self.assertEqual(sorted(hourly.values_list("count", flat=True)), [4, 4])
+        self.assertEqual(activity_series(1, DAY, now=now)[-1][1], 8)
+
+
+class ActionLogRetentionTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(
+            override_settings(
+                MEDIA_ROOT=media,
+                STORAGES={
+                    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+                },
+            )
+        )
+        now = timezone.now()
+        self.old = [
+            UserActionLog.objects.create(action=f"GET /old/{days}/", created=now - timedelta(days=days)).pk
+            for days in (95, 65, 40)
+        ]
+        self.fresh = [
+            UserActionLog.objects.create(action=f"GET /fresh/{days}/", created=now - timedelta(days=days)).pk
+            for days in (20, 0)
+        ]
+
+    def _prune(self, *args):
+        out = io.StringIO()
+        call_command("prune_action_logs", "--days=30", *args, stdout=out)
+        return out.getvalue()
+
+    def test_only_expired_entries_are_archived_and_deleted(self):
+        output = self._prune("--archive", "--chunk-size=1")
+
+        self.assertIn("Deleted 3 log entries.", output)
+        self.assertEqual(sorted(UserActionLog.objects.values_list("pk", flat=True)), sorted(self.fresh))
+        archived = []
+        for name in re.findall(r"Archived to (\S+)\.\n", output):
+            with default_storage.open(name) as stored, gzip.open(stored, "rt", encoding="utf-8") as lines:
+                archived += [json.loads(line)["id"] for line in lines]
+        self.assertEqual(sorted(archived), sorted(self.old))
+
+    def test_dry_run_deletes_nothing(self):
+        output = self._prune("--archive", "--dry-run")
+
+        self.assertIn("Would delete 3 log entries.", output)
+        self.assertNotIn("Archived to", output)
+        self.assertEqual(UserActionLog.objects.count(), 5)
+
+    def test_zero_days_keeps_everything(self):
+        out = io.StringIO()
+        call_command("prune_action_logs", "--days=0", stdout=out)
+        self.assertIn("Retention is disabled", out.getvalue())
+        self.assertEqual(UserActionLog.objects.count(), 5)
+
+    def test_partitioning_needs_postgresql(self):
+        with self.assertRaises(CommandError):
+            call_command("prune_action_logs", "--partition", stdout=io.StringIO())
@@ -6,6 +6,7 @@ from .views import (
     AdminListCreateAPIView,
     AdminMeAPIView,
     AdminUpdateDestroyAPIView,
+    CacheStatsAPIView,
     ComplaintDetailAPIView,
     ComplaintListAPIView,
     NavigationConfigAPIView,
@@ -31,6 +32,7 @@ urlpatterns = [
     path("navigation/", NavigationConfigAPIView.as_view(), name="navigation"),
     path("navigation/public/", PublicNavigationAPIView.as_view(), name="navigation-public"),
     path("site-settings/", SiteSettingsAPIView.as_view(), name="site-settings"),
+    path("system/cache/", CacheStatsAPIView.as_view(), name="system-cache"),
     path("admins/", AdminListCreateAPIView.as_view(), name="admins-list-create"),
     path("admins/<int:pk>/", AdminUpdateDestroyAPIView.as_view(), name="admins-detail"),
 ]
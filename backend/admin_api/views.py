@@ -1,23 +1,32 @@
+import hashlib
 from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Count
+from django.db import transaction
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from rest_framework import generics, permissions, status
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from accounts.api.serializers import UserSerializer
+from core.cache import get_stats, namespace
+from core.http_cache import etag_matches
 from accounts.models import Notification
 from post.models import Comment, Post
 
+from . import rollups
 from .models import Complaint, NavigationItem, SiteSettings, UserActionLog
+from .navigation import get_public_navigation, schedule_navigation_rebuild
 from .serializers import (
     AdminMeSerializer,
     ComplaintSerializer,
     ComplaintUpdateSerializer,
     NavigationItemSerializer,
+    NavigationItemWriteSerializer,
     SiteSettingsSerializer,
     UserActionLogSerializer,
 )
@@ -25,32 +34,11 @@ from .serializers import (
 
 User = get_user_model()
 
+# Диапазоны графика активности на дашборде, дней
+DASHBOARD_RANGES = (7, 30, 365)
+DASHBOARD_METRICS_CACHE_KEY = "dashboard:metrics"
 
-DEFAULT_PUBLIC_NAV_ITEMS = [
-    {"key": "home", "label": "Главная", "order": 0},
-    {"key": "explore", "label": "Обзор", "order": 1},
-    {"key": "pilots", "label": "Пилоты", "order": 2},
-    {"key": "routes", "label": "Маршруты", "order": 3},
-    {"key": "notifications", "label": "Уведомления", "order": 4},
-    {"key": "likes", "label": "Лайки", "order": 5},
-    {"key": "saved", "label": "Сохраненные", "order": 6},
-    {"key": "profile", "label": "Профиль", "order": 7},
-]
-
-
-def ensure_default_navigation() -> None:
-    """Гарантирует наличие базовых пунктов навигации для публичного sidebar."""
-    for item in DEFAULT_PUBLIC_NAV_ITEMS:
-        NavigationItem.objects.get_or_create(
-            key=item["key"],
-            location=NavigationItem.LOCATION_PUBLIC_SIDEBAR,
-            defaults={
-                "label": item["label"],
-                "order": item["order"],
-                "is_visible_for_users": True,
-                "is_enabled": True,
-            },
-        )
+cache = namespace("admin")
 
 
 class IsAdmin(permissions.BasePermission):
@@ -71,51 +59,69 @@ class AdminMeAPIView(generics.RetrieveAPIView):
 
 
 class AdminDashboardMetricsAPIView(APIView):
-    """Метрики для дашборда админ‑панели."""
+    """Метрики для дашборда админ‑панели (кэшируются на ADMIN_DASHBOARD_CACHE_TTL секунд)."""
 
     permission_classes = [IsAdmin]
 
     def get(self, request):
-        now = timezone.now()
-        day_ago = now - timedelta(days=1)
-
-        total_users = User.objects.count()
-        active_last_day = User.objects.filter(last_login__gte=day_ago).count()
-        new_complaints = Complaint.objects.filter(created__gte=day_ago).count()
-        actions_last_day = UserActionLog.objects.filter(created__gte=day_ago).count()
-
-        data = {
-            "total_users": total_users,
-            "active_last_day": active_last_day,
-            "new_complaints": new_complaints,
-            "actions_last_day": actions_last_day,
-        }
+        data = cache.get(DASHBOARD_METRICS_CACHE_KEY)
+        if data is None:
+            now = timezone.now()
+            day_ago = now - timedelta(days=1)
+            data = {
+                "total_users": User.objects.count(),
+                "active_last_day": User.objects.filter(last_login__gte=day_ago).count(),
+                "new_complaints": Complaint.objects.filter(created__gte=day_ago).count(),
+                # Из почасовых сводок, а не COUNT по журналу
+                "actions_last_day": rollups.actions_since(day_ago),
+            }
+            cache.set(DASHBOARD_METRICS_CACHE_KEY, data, settings.ADMIN_DASHBOARD_CACHE_TTL)
         return Response(data)
 
 
 class AdminDashboardActivityChartAPIView(APIView):
-    """Простые данные для графика активности пользователей."""
+    """
+    Данные для графика активности пользователей из сводок ``UserActionRollup``.
+
+    Параметры: ``range`` — 7, 30 или 365 дней (по умолчанию 7), ``interval`` —
+    ``day`` или ``hour`` (только для 7 дней), ``action_type`` — один тип действия.
+    """
 
     permission_classes = [IsAdmin]
 
     def get(self, request):
-        now = timezone.now()
-        days = 7
-        start = now - timedelta(days=days - 1)
-
-        qs = (
-            UserActionLog.objects.filter(created__date__gte=start.date())
-            .extra(select={"day": "date(created)"})
-            .values("day")
-            .annotate(count=Count("id"))
-            .order_by("day")
-        )
-
-        # Преобразуем к формату [{date: 'YYYY-MM-DD', count: N}, ...]
-        results = [
-            {"date": row["day"].isoformat() if hasattr(row["day"], "isoformat") else row["day"], "count": row["count"]}
-            for row in qs
-        ]
+        try:
+            days = int(request.query_params.get("range", DASHBOARD_RANGES[0]))
+        except ValueError:
+            days = None
+        if days not in DASHBOARD_RANGES:
+            return Response(
+                {"detail": f"range должен быть одним из: {', '.join(map(str, DASHBOARD_RANGES))}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        interval = request.query_params.get("interval", rollups.DAY)
+        if interval not in (rollups.DAY, rollups.HOUR) or (interval == rollups.HOUR and days > 7):
+            return Response(
+                {"detail": "interval: day, либо hour для диапазона в 7 дней."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        action_type = request.query_params.get("action_type") or ""
+
+        # Тип действия содержит пробелы и может быть длинным — в ключе только хэш
+        action_hash = hashlib.md5(action_type.encode("utf-8")).hexdigest()
+        cache_key = f"dashboard:activity:{days}:{interval}:{action_hash}"
+        results = cache.get(cache_key)
+        if results is None:
+            series = rollups.activity_series(days, interval, action_type or None)
+            # Формат [{date: 'YYYY-MM-DD', count: N}, ...]; для часов — ISO-время
+            results = [
+                {
+                    "date": bucket.date().isoformat() if interval == rollups.DAY else bucket.isoformat(),
+                    "count": count,
+                }
+                for bucket, count in series
+            ]
+            cache.set(cache_key, results, settings.ADMIN_DASHBOARD_CACHE_TTL)
         return Response(results)
 
 
@@ -155,11 +161,19 @@ class ComplaintDetailAPIView(generics.RetrieveUpdateAPIView):
         )
 
 
+class ActionLogCursorPagination(CursorPagination):
+    """Keyset-пагинация журнала: без COUNT(*) и OFFSET по всей таблице."""
+    ordering = ("-created", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
 class UserActionLogListAPIView(generics.ListAPIView):
     """Лента действий пользователей с фильтрами."""
 
     serializer_class = UserActionLogSerializer
     permission_classes = [IsAdmin]
+    pagination_class = ActionLogCursorPagination
 
     def get_queryset(self):
         qs = UserActionLog.objects.select_related("user")
@@ -178,7 +192,6 @@ class NavigationConfigAPIView(APIView):
     permission_classes = [IsAdmin]
 
     def get(self, request):
-        ensure_default_navigation()
         items = NavigationItem.objects.all()
         serializer = NavigationItemSerializer(items, many=True)
         return Response(serializer.data)
@@ -196,33 +209,56 @@ class NavigationConfigAPIView(APIView):
             else:
                 data = list(data.values())
 
-        serializer = NavigationItemSerializer(data=data, many=True)
+        serializer = NavigationItemWriteSerializer(data=data, many=True)
         serializer.is_valid(raise_exception=True)
 
-        NavigationItem.objects.all().delete()
-        NavigationItem.objects.bulk_create(
-            [NavigationItem(**item_data) for item_data in serializer.validated_data]
-        )
+        items = [NavigationItem(**item_data) for item_data in serializer.validated_data]
+        # Upsert по key вместо «удалить всё и создать заново»: id пунктов
+        # сохраняются, а читатели не видят пустую навигацию
+        with transaction.atomic():
+            NavigationItem.objects.exclude(key__in=[item.key for item in items]).delete()
+            NavigationItem.objects.bulk_create(
+                items,
+                update_conflicts=True,
+                unique_fields=["key"],
+                update_fields=["label", "location", "is_visible_for_users", "is_enabled", "order"],
+            )
+            schedule_navigation_rebuild()
+
+        serializer = NavigationItemSerializer(NavigationItem.objects.all(), many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 class PublicNavigationAPIView(APIView):
-    """Публичный endpoint с конфигурацией навигации для обычных пользователей."""
+    """
+    Публичный endpoint с конфигурацией навигации для обычных пользователей.
+
+    Ответ берётся из кэша (``admin_api.navigation``) и помечается ETag: при
+    совпадении If-None-Match возвращается 304 без тела.
+    """
 
     permission_classes = [AllowAny]
+    authentication_classes = []
 
     def get(self, request):
-        ensure_default_navigation()
-        items = (
-            NavigationItem.objects.filter(
-                location=NavigationItem.LOCATION_PUBLIC_SIDEBAR,
-                is_visible_for_users=True,
-                is_enabled=True,
-            )
-            .order_by("order", "id")
-        )
-        serializer = NavigationItemSerializer(items, many=True)
-        return Response(serializer.data)
+        etag, data = get_public_navigation()
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response["ETag"] = etag
+        # Браузер хранит ответ, но перепроверяет его по ETag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class CacheStatsAPIView(APIView):
+    """Бэкенд общего кэша и доля попаданий по пространствам имён (core.cache)."""
+
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return Response({"backend": settings.CACHES["default"]["BACKEND"], "namespaces": get_stats()})
 
 
 class SiteSettingsAPIView(APIView):
@@ -13,4 +13,39 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+
+def _static_application():
+    """
+    WhiteNoise для /static/ вне цепочки middleware Django: как синхронная
+    middleware он занимал бы поток на каждый запрос.
+    """
+    from asgiref.wsgi import WsgiToAsgi
+    from django.conf import settings
+    from whitenoise import WhiteNoise
+
+    def not_found(environ, start_response):
+        start_response("404 Not Found", [("Content-Type", "text/plain")])
+        return [b"Not Found"]
+
+    static = WhiteNoise(not_found, root=settings.STATIC_ROOT, prefix=settings.STATIC_URL)
+    static_app = WsgiToAsgi(static)
+
+    async def application(scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(settings.STATIC_URL):
+            return await static_app(scope, receive, send)
+        return await django_application(scope, receive, send)
+
+    return application
+
+
+def _build_application():
+    from django.conf import settings
+
+    if settings.SERVER_PROFILE == "asgi" and not settings.DEBUG:
+        return _static_application()
+    return django_application
+
+
+application = _build_application()
@@ -0,0 +1,167 @@
+"""
+Общий кэш приложения с пространствами имён и счётчиками попаданий.
+
+Бэкенд задаётся в settings (``CACHE_URL``): Redis или Memcached, а без
+внешних сервисов — таблица в базе или память процесса (только для одного
+воркера). Код приложений не обращается к ``django.core.cache``
+напрямую, а заводит своё пространство имён::
+
+    cache = namespace("admin")
+    cache.get("dashboard:metrics")
+
+Ключ в бэкенде — ``<пространство>:v<версия>:<ключ>`` (поверх ``KEY_PREFIX``
+и ``VERSION`` из ``CACHES``). Версия пространства повышается в коде, когда
+меняется формат его значений: старые записи перестают читаться и
+вытесняются по TTL, не задевая остальные приложения.
+
+Попадания и промахи считаются в памяти процесса и раз в
+``CACHE_STATS_FLUSH_INTERVAL`` секунд добавляются к общим счётчикам в
+кэше — так ``get_stats()`` (команда ``cache_stats``, ``/api/admin/system/cache/``)
+показывает сумму по всем воркерам.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache as _backend, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+_STATS_PREFIX = "cache-stats:"
+_MISSING = object()
+
+_namespaces: dict[str, "CacheNamespace"] = {}
+# пространство -> [попадания, промахи] с последнего сброса в общий кэш
+_pending: dict[str, list] = {}
+_stats_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def _record(name: str, hits: int, misses: int) -> None:
+    global _last_flush
+    with _stats_lock:
+        counters = _pending.setdefault(name, [0, 0])
+        counters[0] += hits
+        counters[1] += misses
+        due = time.monotonic() - _last_flush >= settings.CACHE_STATS_FLUSH_INTERVAL
+    if due:
+        flush_stats()
+
+
+def flush_stats() -> None:
+    """Добавляет накопленные в процессе счётчики к общим."""
+    global _last_flush
+    with _stats_lock:
+        pending = {name: counters for name, counters in _pending.items() if any(counters)}
+        _pending.clear()
+        _last_flush = time.monotonic()
+    for name, (hits, misses) in pending.items():
+        for kind, delta in (("hits", hits), ("misses", misses)):
+            if not delta:
+                continue
+            key = f"{_STATS_PREFIX}{name}:{kind}"
+            _backend.add(key, 0, None)
+            try:
+                _backend.incr(key, delta)
+            except ValueError:
+                # Ключ вытеснили между add и incr — начинаем отсчёт заново
+                _backend.set(key, delta, None)
+
+
+def get_stats() -> dict:
+    """{пространство: {"hits", "misses", "hit_rate"}} по всем воркерам."""
+    flush_stats()
+    keys = [f"{_STATS_PREFIX}{name}:{kind}" for name in sorted(_namespaces) for kind in ("hits", "misses")]
+    found = _backend.get_many(keys)
+    stats = {}
+    for name in sorted(_namespaces):
+        hits = found.get(f"{_STATS_PREFIX}{name}:hits", 0)
+        misses = found.get(f"{_STATS_PREFIX}{name}:misses", 0)
+        total = hits + misses
+        stats[name] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else None,
+        }
+    return stats
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        _pending.clear()
+    _backend.delete_many(
+        [f"{_STATS_PREFIX}{name}:{kind}" for name in _namespaces for kind in ("hits", "misses")]
+    )
+
+
+class CacheNamespace:
+    """Обёртка над кэшем Django: префикс и версия пространства, учёт попаданий."""
+
+    def __init__(self, name: str, version: int = 1, alias: str = "default"):
+        self.name = name
+        self.version = version
+        self.alias = alias
+        self._prefix = f"{name}:v{version}:"
+
+    @property
+    def _backend(self):
+        return caches[self.alias]
+
+    def make_key(self, key: str) -> str:
+        return self._prefix + key
+
+    def get(self, key: str, default=None):
+        value = self._backend.get(self.make_key(key), _MISSING)
+        if value is _MISSING:
+            _record(self.name, 0, 1)
+            return default
+        _record(self.name, 1, 0)
+        return value
+
+    def get_many(self, keys) -> dict:
+        keys = list(keys)
+        found = self._backend.get_many([self.make_key(key) for key in keys])
+        result = {key: found[self.make_key(key)] for key in keys if self.make_key(key) in found}
+        _record(self.name, len(result), len(keys) - len(result))
+        return result
+
+    def set(self, key: str, value, timeout=DEFAULT_TIMEOUT) -> None:
+        self._backend.set(self.make_key(key), value, timeout)
+
+    def set_many(self, mapping: dict, timeout=DEFAULT_TIMEOUT) -> None:
+        self._backend.set_many({self.make_key(key): value for key, value in mapping.items()}, timeout)
+
+    def add(self, key: str, value, timeout=DEFAULT_TIMEOUT) -> bool:
+        return self._backend.add(self.make_key(key), value, timeout)
+
+    def delete(self, key: str) -> None:
+        self._backend.delete(self.make_key(key))
+
+    def delete_many(self, keys) -> None:
+        keys = [self.make_key(key) for key in keys]
+        if keys:
+            self._backend.delete_many(keys)
+
+
+def is_shared() -> bool:
+    """Видят ли записи кэша другие процессы: с памятью процесса (без CACHE_URL) — нет."""
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def namespace(name: str, version: int = 1, alias: str = "default") -> CacheNamespace:
+    """Пространство имён приложения; повторный вызов возвращает тот же объект.
+
+    ``alias`` — кэш из ``CACHES``, если пространству нужен не общий кэш
+    (например, ``tokens`` для чёрного списка JWT).
+    """
+    existing = _namespaces.get(name)
+    if existing is not None:
+        if (existing.version, existing.alias) != (version, alias):
+            raise ValueError(
+                f"Cache namespace {name!r} is already registered with version {existing.version} "
+                f"in cache {existing.alias!r}"
+            )
+        return existing
+    _namespaces[name] = ns = CacheNamespace(name, version, alias)
+    return ns
@@ -0,0 +1,141 @@
+"""
+Сжатие ответов gzip или brotli (вместо ``django.middleware.gzip.GZipMiddleware``).
+
+Сжимаются только ответы с типом из ``COMPRESSION_CONTENT_TYPES`` (JSON,
+текст, CSS/JS, SVG…): уже сжатые форматы — JPEG, PNG, WebP, видео, архивы,
+в том числе из медиапрокси — отдаются как есть. HTML в списке по умолчанию
+нет: страницы с CSRF-токеном в сжатом виде уязвимы к BREACH.
+
+Обычный ответ короче ``COMPRESSION_MIN_SIZE`` байт не сжимается — выигрыш
+меньше заголовков. Потоковый ответ сжимается по частям (каждая часть
+отправляется сразу), если его Content-Length неизвестен или не меньше
+порога.
+
+Brotli выбирается, если клиент его принимает и установлен пакет ``brotli``,
+иначе gzip. Уровни — ``COMPRESSION_GZIP_LEVEL`` и
+``COMPRESSION_BROTLI_QUALITY``: для ответов, которые сжимаются на каждый
+запрос, выгодны средние значения. Статику сжимает collectstatic с
+максимальным уровнем, а WhiteNoise отдаёт готовые .br/.gz раньше, чем ответ
+дошёл бы до этой middleware.
+"""
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def accepted_encoding(header: str) -> str | None:
+    """``br`` или ``gzip`` по Accept-Encoding клиента (q=0 — отказ), либо None."""
+    codings = {}
+    for part in header.lower().split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        codings[coding.strip()] = quality
+    for encoding in ("br", "gzip") if brotli is not None else ("gzip",):
+        if codings.get(encoding, codings.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+class StreamCompressor:
+    """Сжатие по частям: ``compress`` возвращает всё, что можно отправить сразу."""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._brotli = None
+            # wbits 16 + 15 — формат gzip
+            self._zlib = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(chunk) + self._brotli.flush()
+        return self._zlib.compress(chunk) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def compress(encoding: str, data: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def is_compressible(content_type: str) -> bool:
+    mime = content_type.split(";", 1)[0].strip().lower()
+    allowed = settings.COMPRESSION_CONTENT_TYPES
+    return mime in allowed or f"{mime.split('/', 1)[0]}/*" in allowed
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        if response.has_header("Content-Encoding") or response.status_code == 206:
+            return response
+        if not is_compressible(response.get("Content-Type", "")):
+            return response
+        min_size = settings.COMPRESSION_MIN_SIZE
+        if response.streaming:
+            length = response.get("Content-Length")
+            if length is not None and length.isdigit() and int(length) < min_size:
+                return response
+        elif len(response.content) < min_size:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = accepted_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            compressor = StreamCompressor(encoding)
+            if response.is_async:
+                original = response.streaming_content
+
+                async def compressed():
+                    async for chunk in original:
+                        if data := compressor.compress(chunk):
+                            yield data
+                    yield compressor.finish()
+
+                response.streaming_content = compressed()
+            else:
+                response.streaming_content = self._compress_sequence(compressor, response.streaming_content)
+            # Длина сжатого потока заранее неизвестна
+            del response.headers["Content-Length"]
+        else:
+            compressed_content = compress(encoding, response.content)
+            if len(compressed_content) >= len(response.content):
+                return response
+            response.content = compressed_content
+            response.headers["Content-Length"] = str(len(response.content))
+
+        # Сжатое тело отличается побайтно — ETag становится слабым, как у GZipMiddleware
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    @staticmethod
+    def _compress_sequence(compressor, sequence):
+        for chunk in sequence:
+            if data := compressor.compress(chunk):
+                yield data
+        yield compressor.finish()
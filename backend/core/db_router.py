@@ -0,0 +1,167 @@
+"""
+Чтение с реплик базы для безопасных (GET/HEAD/OPTIONS) запросов.
+
+Реплики задаются ``DB_REPLICAS`` (см. settings) и получают алиасы
+``replica1``, ``replica2``… ``ReplicaRoutingMiddleware`` в начале запроса
+решает, можно ли читать с реплики, выбирает живую реплику и запоминает выбор
+в contextvar; ``PrimaryReplicaRouter`` направляет по нему чтения. Запись,
+чтение внутри транзакции основной базы, фоновые потоки и команды управления
+всегда работают с ``default``.
+
+Read-your-writes: после небезопасного запроса ответ ставит cookie
+``DB_REPLICA_STICKY_COOKIE`` и заголовок ``X-DB-Sticky-Until`` (unix-время);
+пока cookie жива или клиент присылает этот заголовок обратно, его чтения идут
+в основную базу — реплика за это время успевает догнать запись. Общие кэши
+(ответы ``core.http_cache``, фрагменты ``post.fragments``) в это же окно не
+заполняются с реплики (``reads_from_replica``): иначе анонимный запрос
+положил бы в кэш ещё не догнавшее запись состояние сразу после инвалидации.
+
+Если к реплике не удаётся подключиться, она исключается на
+``DB_REPLICA_RETRY_SECONDS`` секунд, а запрос читает с другой реплики или с
+основной базы.
+"""
+import contextvars
+import itertools
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+logger = logging.getLogger(__name__)
+
+STICKY_HEADER = "X-DB-Sticky-Until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_read_alias = contextvars.ContextVar("db_read_alias", default=DEFAULT_DB_ALIAS)
+
+# алиас -> time.monotonic(), до которого реплика считается недоступной
+_down_until: dict[str, float] = {}
+_down_lock = threading.Lock()
+_round_robin = itertools.count()
+
+
+def replica_aliases() -> list[str]:
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+def _mark_down(alias: str, exc: Exception) -> None:
+    with _down_lock:
+        _down_until[alias] = time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS
+    logger.warning(
+        "Database replica %s is unavailable, skipping it for %s s: %s",
+        alias,
+        settings.DB_REPLICA_RETRY_SECONDS,
+        exc,
+    )
+
+
+def choose_replica() -> str:
+    """Живая реплика по кругу; если подходящих нет — основная база."""
+    aliases = replica_aliases()
+    if not aliases:
+        return DEFAULT_DB_ALIAS
+    start = next(_round_robin)
+    now = time.monotonic()
+    for offset in range(len(aliases)):
+        alias = aliases[(start + offset) % len(aliases)]
+        if _down_until.get(alias, 0) > now:
+            continue
+        try:
+            connections[alias].ensure_connection()
+        except OperationalError as exc:
+            _mark_down(alias, exc)
+            continue
+        return alias
+    return DEFAULT_DB_ALIAS
+
+
+def is_sticky(request) -> bool:
+    """Клиент недавно писал — его чтения должны видеть собственные изменения."""
+    if settings.DB_REPLICA_STICKY_COOKIE in request.COOKIES:
+        return True
+    try:
+        until = float(request.headers.get(STICKY_HEADER, 0))
+    except ValueError:
+        return False
+    return until > time.time()
+
+
+def reads_from_replica() -> bool:
+    """Чтения текущего запроса идут с реплики, которая может отставать от основной базы."""
+    return _read_alias.get() != DEFAULT_DB_ALIAS
+
+
+def _alias_for(request) -> str:
+    if request.method in SAFE_METHODS and not is_sticky(request):
+        return choose_replica()
+    return DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _read_alias.set(_alias_for(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self._remember_write(request, response)
+
+    async def __acall__(self, request):
+        # Без реплик выбирать нечего — не занимаем поток ради ensure_connection
+        alias = await sync_to_async(_alias_for)(request) if replica_aliases() else DEFAULT_DB_ALIAS
+        token = _read_alias.set(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self._remember_write(request, response)
+
+    @staticmethod
+    def _remember_write(request, response):
+        if request.method not in SAFE_METHODS:
+            window = settings.DB_REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                settings.DB_REPLICA_STICKY_COOKIE,
+                "1",
+                max_age=window,
+                secure=request.is_secure(),
+                httponly=True,
+                samesite="Lax",
+            )
+            response[STICKY_HEADER] = f"{time.time() + window:.3f}"
+        return response
+
+
+class PrimaryReplicaRouter:
+    """Чтения текущего запроса — с выбранной middleware реплики, всё остальное — в default."""
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias != DEFAULT_DB_ALIAS and connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Внутри транзакции читаем то, что в ней же записали
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии default: объекты из любых алиасов относятся к одной базе
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
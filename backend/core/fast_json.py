@@ -0,0 +1,129 @@
+"""
+Быстрый JSON для DRF: рендерер и парсер на orjson или msgspec, если они
+установлены, иначе — стандартный ``json``, как у самого DRF.
+
+Библиотека выбирается настройкой ``JSON_BACKEND``: ``auto`` (orjson, затем
+msgspec, затем stdlib) или явное имя. Данные в выводе те же, что у
+``rest_framework.renderers.JSONRenderer``: datetime — ISO 8601 с ``Z`` для
+UTC, Decimal — числом, ленивые строки перевода — строкой, прочие типы —
+через ``rest_framework.utils.encoders.JSONEncoder``; U+2028/U+2029
+экранируются. Вывод сериализаторов (Decimal и длительности в нём уже
+строки) совпадает побайтно, а числа, которые доходят до рендерера
+значениями, могут быть записаны иначе: ``1.5e-7`` и ``0.00001`` вместо
+``1.5e-07`` и ``1e-05``, у msgspec ещё ``1e16`` вместо ``1e+16`` и
+``Decimal("1.10")`` как ``1.10``, а не ``1.1`` — после разбора значения те
+же. msgspec сам кодирует timedelta (``"PT5400S"``, а не ``"5400.0"``).
+Отступы (``indent`` в Accept, browsable API), ``UNICODE_JSON = False`` и
+``COMPACT_JSON = False`` обрабатывает стандартный рендерер. NaN и Infinity
+выводятся как ``null``, а не приводят к ошибке при ``STRICT_JSON``.
+
+Если быстрая библиотека не справилась (целые за пределами 64 бит в ответе,
+битый JSON на входе), работа передаётся стандартному коду — с его
+результатом или его сообщением об ошибке. Такие целые во входящем JSON
+orjson, в отличие от msgspec, читает как float.
+
+Сравнение бэкендов на реальных ответах — команда ``bench_json``.
+"""
+import io
+from typing import Callable, NamedTuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+BACKENDS = ("orjson", "msgspec", "stdlib")
+
+
+class JSONBackend(NamedTuple):
+    name: str
+    dumps: Callable | None
+    loads: Callable | None
+    encode_errors: tuple
+    decode_errors: tuple
+
+
+def _orjson() -> JSONBackend:
+    import orjson
+
+    default = encoders.JSONEncoder().default
+    option = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def dumps(data):
+        return orjson.dumps(data, default=default, option=option)
+
+    # orjson.JSONEncodeError — подкласс TypeError
+    return JSONBackend("orjson", dumps, orjson.loads, (TypeError,), (orjson.JSONDecodeError,))
+
+
+def _msgspec() -> JSONBackend:
+    import msgspec
+
+    encoder = msgspec.json.Encoder(enc_hook=encoders.JSONEncoder().default, decimal_format="number")
+    decoder = msgspec.json.Decoder()
+    return JSONBackend(
+        "msgspec",
+        encoder.encode,
+        decoder.decode,
+        (msgspec.EncodeError, TypeError, OverflowError),
+        (msgspec.DecodeError,),
+    )
+
+
+def _stdlib() -> JSONBackend:
+    return JSONBackend("stdlib", None, None, (), ())
+
+
+_LOADERS = {"orjson": _orjson, "msgspec": _msgspec, "stdlib": _stdlib}
+
+
+def load_backend(name: str = "auto") -> JSONBackend:
+    """Бэкенд по имени; ``auto`` — первый установленный из ``BACKENDS``."""
+    if name == "auto":
+        for candidate in BACKENDS:
+            try:
+                return _LOADERS[candidate]()
+            except ImportError:
+                continue
+    if name not in _LOADERS:
+        raise ImproperlyConfigured(f"JSON_BACKEND must be 'auto' or one of {', '.join(BACKENDS)}, got {name!r}")
+    try:
+        return _LOADERS[name]()
+    except ImportError as exc:
+        raise ImproperlyConfigured(f"JSON_BACKEND={name!r}, but the library is not installed") from exc
+
+
+backend = load_backend(getattr(settings, "JSON_BACKEND", "auto"))
+
+
+class FastJSONRenderer(JSONRenderer):
+    backend = backend
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        dumps = self.backend.dumps
+        if data is None or dumps is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = dumps(data)
+        except self.backend.encode_errors:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+    backend = backend
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        loads = self.backend.loads
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        if loads is None or encoding.lower().replace("-", "") != "utf8":
+            return super().parse(stream, media_type, parser_context)
+        data = stream.read()
+        try:
+            return loads(data)
+        except self.backend.decode_errors:
+            return super().parse(io.BytesIO(data), media_type, parser_context)
@@ -0,0 +1,174 @@
+"""
+Кэш ответов публичных GET-эндпоинтов для анонимных посетителей.
+
+Ответ хранится в общем кэше (``core.cache``, пространство ``http``) целиком
+(тело, ETag, Last-Modified) под ключом из хоста, пути, отсортированных
+query-параметров и вида ответа (JSON или browsable API). Ключ включает «поколения» областей, от которых зависит
+ответ: ``posts``, ``post:<id>``, ``routes``, ``users`` и т.п. Сигналы
+(``post.signals``, ``accounts.signals``) при изменении данных меняют
+поколение своей области, и зависящие от неё записи просто перестают
+находиться — без перебора ключей. Поколение меняется после коммита
+транзакции (``schedule_invalidation``): иначе параллельный запрос успел бы
+закэшировать ещё старые данные уже под новым поколением. Поколение — время
+изменения (``time.time_ns()``), поэтому ответ, прочитанный с реплики в
+течение ``DB_REPLICA_STICKY_SECONDS`` после изменения области, не
+кэшируется: реплика могла ещё не получить запись.
+
+Повторный запрос с If-None-Match / If-Modified-Since получает 304.
+Вью без аутентификации (``authentication_classes = []``) отдают всем один и
+тот же ответ и кэшируются для всех; остальные — только для запросов без
+Authorization и сессионной cookie.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+from core.cache import namespace
+from core.db_router import reads_from_replica
+
+cache = namespace("http")
+
+_GENERATION_PREFIX = "gen:"
+_ENTRY_PREFIX = "entry:"
+
+
+def _generation_key(scope: str) -> str:
+    return f"{_GENERATION_PREFIX}{scope}"
+
+
+def get_generations(scopes) -> list:
+    keys = [_generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    generations = []
+    for key in keys:
+        value = found.get(key)
+        if value is None:
+            # Новое (или вытесненное) поколение — уникальное значение, а не 0:
+            # старые записи с тем же номером не должны ожить
+            value = time.time_ns()
+            if not cache.add(key, value, None):
+                value = cache.get(key, value)
+        generations.append(value)
+    return generations
+
+
+def invalidate(*scopes: str) -> None:
+    """Делает устаревшими все закэшированные ответы, зависящие от областей."""
+    cache.set_many({_generation_key(scope): time.time_ns() for scope in scopes}, None)
+
+
+def schedule_invalidation(*scopes: str) -> None:
+    """``invalidate`` после коммита текущей транзакции (или сразу вне её)."""
+    transaction.on_commit(lambda: invalidate(*scopes))
+
+
+def _replica_may_lag(generations) -> bool:
+    """Ответ читался с реплики, а область менялась недавно — реплика могла отстать."""
+    if not generations or not reads_from_replica():
+        return False
+    window_ns = settings.DB_REPLICA_STICKY_SECONDS * 1_000_000_000
+    return time.time_ns() - max(generations) < window_ns
+
+
+def is_anonymous_request(request) -> bool:
+    return "HTTP_AUTHORIZATION" not in request.META and settings.SESSION_COOKIE_NAME not in request.COOKIES
+
+
+def _response_kind(request) -> str:
+    # Браузер без явного формата получает browsable API — кэшируем его отдельно
+    if request.GET.get("format"):
+        return request.GET["format"]
+    return "html" if "text/html" in request.META.get("HTTP_ACCEPT", "") else "json"
+
+
+def _entry_key(request, generations) -> str:
+    query = urlencode(sorted((key, value) for key, values in request.GET.lists() for value in values))
+    raw = "|".join(
+        [request.get_host(), request.path, query, _response_kind(request)] + [str(gen) for gen in generations]
+    )
+    return _ENTRY_PREFIX + hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+def etag_matches(request, etag: str) -> bool:
+    """
+    Совпадает ли ETag с If-None-Match запроса.
+
+    Сравнение слабое (RFC 9110): CompressionMiddleware отдаёт ETag сжатого
+    ответа как ``W/"…"``, и клиент присылает обратно именно его.
+    """
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH", "")
+    if if_none_match.strip() == "*":
+        return True
+    etag = etag.removeprefix("W/")
+    return any(tag.removeprefix("W/") == etag for tag in parse_etags(if_none_match))
+
+
+def _not_modified(request, etag: str, last_modified: float) -> bool:
+    if request.META.get("HTTP_IF_NONE_MATCH"):
+        return etag_matches(request, etag)
+    since = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+    return since is not None and int(last_modified) <= since
+
+
+def _finalize(response, etag: str, last_modified: float, public_for_all: bool):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=settings.HTTP_CACHE_MAX_AGE)
+    vary = ["Accept"] if public_for_all else ["Accept", "Authorization", "Cookie"]
+    patch_vary_headers(response, vary)
+    return response
+
+
+class AnonymousCacheMixin:
+    """
+    Кэширование GET-ответов для анонимных запросов в DRF-вью.
+
+    Вью перечисляет области, от которых зависит ответ, в ``get_cache_scopes``.
+    """
+
+    cache_scopes = ()
+
+    def get_cache_scopes(self, request, *args, **kwargs):
+        return self.cache_scopes
+
+    def dispatch(self, request, *args, **kwargs):
+        public_for_all = not self.authentication_classes
+        if (
+            not settings.HTTP_CACHE_ENABLED
+            or request.method not in ("GET", "HEAD")
+            or not (public_for_all or is_anonymous_request(request))
+        ):
+            return super().dispatch(request, *args, **kwargs)
+
+        generations = get_generations(self.get_cache_scopes(request, *args, **kwargs))
+        key = _entry_key(request, generations)
+        entry = cache.get(key)
+        if entry is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200 or response.has_header("Set-Cookie"):
+                return response
+            if hasattr(response, "render"):
+                response.render()
+            content = response.content
+            entry = {
+                "content": content,
+                "content_type": response["Content-Type"],
+                "etag": '"' + hashlib.md5(content).hexdigest() + '"',
+                "last_modified": time.time(),
+            }
+            if not _replica_may_lag(generations):
+                cache.set(key, entry, settings.HTTP_CACHE_TIMEOUT)
+            if not _not_modified(request, entry["etag"], entry["last_modified"]):
+                return _finalize(response, entry["etag"], entry["last_modified"], public_for_all)
+
+        if _not_modified(request, entry["etag"], entry["last_modified"]):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(entry["content"], content_type=entry["content_type"])
+        return _finalize(response, entry["etag"], entry["last_modified"], public_for_all)
@@ -0,0 +1,132 @@
+"""
+Прокси медиафайлов из S3/MinIO через Django (см. ``core.storage.MediaStorage.url``).
+
+Объект читается одним ``GetObject`` через клиент самого хранилища и
+отдаётся клиенту по частям, не загружаясь в память целиком. Есть две
+версии вью:
+
+- ``media_proxy`` — синхронная, для sync/gthread-профилей gunicorn: медленный
+  S3 занимает один поток воркера, а не весь воркер;
+- ``media_proxy_async`` — для ASGI-профиля: ожидание S3 не держит ни поток
+  обработчика, ни событийный цикл; блокирующие вызовы boto3 идут в отдельный
+  пул из ``MEDIA_PROXY_THREADS`` потоков (пул asgiref по умолчанию — всего
+  cpu + 4 потока).
+
+Обе версии используют один клиент boto3 на процесс (клиенты потокобезопасны)
+с пулом HTTP-соединений на ``MEDIA_PROXY_THREADS``: thread-local соединение
+хранилища создавало бы свой клиент в каждом потоке, а это заметная нагрузка
+на CPU при первом запросе каждого потока.
+"""
+import logging
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404, StreamingHttpResponse
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+_executor = None
+_client = None
+_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.MEDIA_PROXY_THREADS,
+                thread_name_prefix="media-proxy",
+            )
+        return _executor
+
+
+def _get_client():
+    global _client
+    with _lock:
+        if _client is None:
+            from botocore.config import Config
+
+            config = default_storage.client_config.merge(
+                Config(max_pool_connections=settings.MEDIA_PROXY_THREADS)
+            )
+            _client = default_storage._create_session().client(
+                "s3",
+                region_name=default_storage.region_name,
+                use_ssl=default_storage.use_ssl,
+                endpoint_url=default_storage.endpoint_url,
+                config=config,
+                verify=default_storage.verify,
+            )
+        return _client
+
+
+def _fetch(path: str) -> dict:
+    """Ответ GetObject для файла или Http404."""
+    from botocore.exceptions import ClientError
+
+    key = path.lstrip("/")
+    if not key:
+        raise Http404("Media file path is empty")
+    try:
+        return _get_client().get_object(Bucket=default_storage.bucket_name, Key=key)
+    except ClientError as e:
+        error_code = e.response.get("Error", {}).get("Code", "")
+        if error_code in ("NoSuchKey", "404"):
+            logger.warning(f"File not found in MinIO: {key}")
+        else:
+            logger.warning(f"Failed to get file from MinIO: {e}")
+    except Exception as e:
+        logger.warning(f"Failed to get file from MinIO: {e}")
+    raise Http404(f"Media file not found: {key}")
+
+
+def _response(path: str, obj: dict, streaming_content) -> StreamingHttpResponse:
+    content_type = obj.get("ContentType")
+    if not content_type or content_type == "binary/octet-stream":
+        content_type, _ = mimetypes.guess_type(path)
+    response = StreamingHttpResponse(streaming_content, content_type=content_type or "application/octet-stream")
+    if obj.get("ContentLength") is not None:
+        response["Content-Length"] = str(obj["ContentLength"])
+    if obj.get("ETag"):
+        response["ETag"] = obj["ETag"]
+    # Добавляем заголовки для кэширования и CORS
+    response["Cache-Control"] = "public, max-age=3600"
+    response["Access-Control-Allow-Origin"] = "*"
+    response["Access-Control-Allow-Methods"] = "GET, HEAD, OPTIONS"
+    return response
+
+
+def media_proxy(request, path):
+    obj = _fetch(path)
+    body = obj["Body"]
+
+    def stream():
+        try:
+            yield from body.iter_chunks(CHUNK_SIZE)
+        finally:
+            body.close()
+
+    return _response(path, obj, stream())
+
+
+async def media_proxy_async(request, path):
+    executor = _get_executor()
+    obj = await sync_to_async(_fetch, thread_sensitive=False, executor=executor)(path)
+    body = obj["Body"]
+    read = sync_to_async(body.read, thread_sensitive=False, executor=executor)
+
+    async def stream():
+        try:
+            while chunk := await read(CHUNK_SIZE):
+                yield chunk
+        finally:
+            body.close()
+
+    return _response(path, obj, stream())
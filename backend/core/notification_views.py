@@ -1,8 +1,16 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import MethodNotAllowed
 from accounts.permissions import IsAuthenticatedReadOnlyForDemo
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from accounts.models import Notification
+from accounts.notifications import get_notifications_version
 
 
 @api_view(["GET"])
@@ -13,3 +21,70 @@ def unread_notifications_count(request):
     """
     count = Notification.objects.filter(user=request.user, is_read=False).count()
     return Response({"unread_count": count})
+
+
+class UnreadNotificationsCountPoll(APIView):
+    """
+    Проверки DRF для async-версии счётчика.
+
+    ``begin`` повторяет первую половину ``APIView.dispatch``: аутентификация,
+    права, троттлинг и тела ошибок те же, что у ``unread_notifications_count``.
+    Само ожидание идёт уже в event loop.
+    """
+
+    permission_classes = [IsAuthenticatedReadOnlyForDemo]
+
+    def begin(self, request):
+        """(запрос DRF, ответ с ошибкой или None)."""
+        self.args, self.kwargs = (), {}
+        request = self.initialize_request(request)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            self.initial(request)
+            if request.method != "GET":
+                raise MethodNotAllowed(request.method)
+        except Exception as exc:
+            return request, self.finalize_response(request, self.handle_exception(exc))
+        return request, None
+
+    def finish(self, request, data):
+        return self.finalize_response(request, Response(data))
+
+
+async def unread_notifications_count_async(request):
+    """
+    Количество непрочитанных уведомлений (ASGI-профиль) с long-polling.
+
+    ``?since=<N>&wait=<сек>``: если непрочитанных по-прежнему N, ответ ждёт
+    изменения до ``wait`` (не больше NOTIFICATION_POLL_MAX_WAIT) секунд.
+    Ожидание сверяет метку изменений в кэше и не занимает ни поток, ни
+    соединение с базой.
+    """
+    view = UnreadNotificationsCountPoll()
+    request, error = await sync_to_async(view.begin)(request)
+    if error is not None:
+        return error
+    user = request.user
+
+    count_unread = sync_to_async(
+        lambda: Notification.objects.filter(user_id=user.pk, is_read=False).count()
+    )
+    get_version = sync_to_async(get_notifications_version, thread_sensitive=False)
+
+    version = await get_version(user.pk)
+    count = await count_unread()
+    try:
+        since = int(request.query_params["since"])
+        wait = min(float(request.query_params.get("wait", 0)), settings.NOTIFICATION_POLL_MAX_WAIT)
+    except (KeyError, ValueError):
+        since, wait = None, 0
+
+    deadline = time.monotonic() + wait
+    while count == since and time.monotonic() < deadline:
+        await asyncio.sleep(settings.NOTIFICATION_POLL_INTERVAL)
+        current = await get_version(user.pk)
+        if current != version:
+            version = current
+            count = await count_unread()
+    return view.finish(request, {"unread_count": count})
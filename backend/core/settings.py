@@ -10,11 +10,14 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import copy
 import os
 import logging
 from datetime import timedelta
 from pathlib import Path
 import colorlog
+from corsheaders.defaults import default_headers
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -36,6 +39,27 @@ def _split_env(name: str, default: str = "") -> list[str]:
 
 ALLOWED_HOSTS = _split_env("ALLOWED_HOSTS", "localhost,127.0.0.1")
 
+# Профиль сервера (см. gunicorn.conf.py): sync — один запрос на процесс,
+# gthread — потоки в процессе, asgi — uvicorn-воркеры с async-версиями
+# медиапрокси и счётчика уведомлений
+SERVER_PROFILE = os.getenv("SERVER_PROFILE", "gthread")
+# Процессы и потоки gunicorn: от них считаются размеры пулов соединений
+GUNICORN_WORKERS = int(os.getenv("GUNICORN_WORKERS", "3"))
+GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", "1" if SERVER_PROFILE == "sync" else "8"))
+
+# Сжатие ответов (core.compression): brotli при установленном пакете brotli,
+# иначе gzip. Ответы короче COMPRESSION_MIN_SIZE байт и типы не из списка
+# (изображения и другие уже сжатые форматы) отдаются как есть
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "True").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "512"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_CONTENT_TYPES = _split_env(
+    "COMPRESSION_CONTENT_TYPES",
+    "application/json,application/javascript,application/xml,application/geo+json,"
+    "text/css,text/javascript,text/plain,text/csv,text/xml,image/svg+xml",
+)
+
 
 # Application definition
 
@@ -60,8 +84,13 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    # WhiteNoise только в production, в DEBUG статика обслуживается через Django
-    *([] if DEBUG else ["whitenoise.middleware.WhiteNoiseMiddleware"]),
+    # WhiteNoise только в production, в DEBUG статика обслуживается через Django.
+    # Под ASGI статику отдаёт core.asgi: синхронная middleware заняла бы поток
+    # на каждый запрос
+    *([] if DEBUG or SERVER_PROFILE == "asgi" else ["whitenoise.middleware.WhiteNoiseMiddleware"]),
+    # После WhiteNoise: статику он отдаёт уже сжатой при collectstatic
+    *(["core.compression.CompressionMiddleware"] if COMPRESSION_ENABLED else []),
+    "core.db_router.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -112,8 +141,113 @@ else:
             "PASSWORD": os.getenv("DB_PASSWORD", "mypassword"),
             "HOST": os.getenv("DB_HOST", "localhost"),
             "PORT": os.getenv("DB_PORT", "5432"),
+            # Соединение живёт между запросами DB_CONN_MAX_AGE секунд и
+            # проверяется перед повторным использованием
+            "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": os.getenv("DB_CONN_HEALTH_CHECKS", "True").lower() == "true",
+            "OPTIONS": {},
         }
     }
+    if os.getenv("DB_POOL", "False").lower() == "true":
+        # Пул psycopg 3 (Django 5.1+): свой в каждом воркере gunicorn, поэтому
+        # по умолчанию он рассчитан на потоки воркера плюс фоновые потоки
+        # (журнал действий, разбор файлов маршрутов). Всего соединений с базой
+        # до GUNICORN_WORKERS * DB_POOL_MAX_SIZE — должно укладываться в
+        # max_connections PostgreSQL.
+        from psycopg_pool import ConnectionPool
+
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", str(GUNICORN_THREADS + 2))),
+            # Сколько ждать свободного соединения, прежде чем запрос упадёт
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+            "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+            "check": ConnectionPool.check_connection,
+        }
+        # Пул сам управляет временем жизни соединений
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+    elif SERVER_PROFILE == "asgi":
+        # Под ASGI синхронный код запроса выполняется в отдельном потоке, и
+        # постоянные соединения копились бы по одному на поток
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+
+# Реплики для чтения (core.db_router): через запятую host[:port] для PostgreSQL
+# (имя базы и учётные данные как у основной) или пути к файлам для SQLite
+DB_REPLICAS = _split_env("DB_REPLICAS")
+for _index, _location in enumerate(DB_REPLICAS, start=1):
+    _replica = copy.deepcopy(DATABASES["default"])
+    if _replica["ENGINE"].endswith("sqlite3"):
+        _replica["NAME"] = _location
+    else:
+        _host, _, _port = _location.partition(":")
+        _replica["HOST"] = _host
+        _replica["PORT"] = _port or _replica["PORT"]
+    # В тестах реплика — та же база, что и default
+    _replica["TEST"] = {"MIRROR": "default"}
+    DATABASES[f"replica{_index}"] = _replica
+DATABASE_ROUTERS = ["core.db_router.PrimaryReplicaRouter"] if DB_REPLICAS else []
+# Сколько секунд после записи клиент читает из основной базы
+DB_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+DB_REPLICA_STICKY_COOKIE = os.getenv("DB_REPLICA_STICKY_COOKIE", "db_sticky")
+# На сколько секунд недоступная реплика исключается из выбора
+DB_REPLICA_RETRY_SECONDS = int(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))
+
+
+# Cache (core.cache)
+# CACHE_URL выбирает общий для воркеров бэкенд:
+#   redis://host:6379/1            — Redis (пакет redis), для production
+#   memcached://host:11211[,host2] — Memcached (пакет pymemcache)
+#   db:// или db://<таблица>        — таблица в базе (manage.py createcachetable)
+#   locmem://                      — память процесса
+# Без CACHE_URL — память процесса: годится только для runserver и одного
+# воркера, иначе инвалидация и счётчики не видны другим воркерам. Тесты
+# всегда работают с памятью процесса (core.test_runner), чтобы cache.clear()
+# не задевал общий кэш.
+# Файловый кэш не поддерживается: каждая запись обходит весь каталог, а add/incr
+# в нём не атомарны между процессами.
+
+def _cache_backend(url: str) -> dict:
+    if url.startswith(("redis://", "rediss://")):
+        return {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": url}
+    if url.startswith("memcached://"):
+        return {
+            "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            "LOCATION": url.removeprefix("memcached://").split(","),
+        }
+    if url.startswith("db://"):
+        backend = {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": url.removeprefix("db://") or "django_cache",
+        }
+    elif not url or url.startswith("locmem://"):
+        backend = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    else:
+        raise ImproperlyConfigured(f"Unsupported cache URL scheme: {url!r}")
+    # Локальные бэкенды отбрасывают часть записей при переполнении; держим
+    # их небольшими — в db:// каждая запись ещё и считает строки таблицы
+    backend["OPTIONS"] = {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "1000"))}
+    return backend
+
+
+CACHE_URL = os.getenv("CACHE_URL", "")
+# Отдельный кэш для чёрного списка JWT (JWT_BLACKLIST_CACHE): ключи в нём не
+# должны вытесняться, поэтому в production это свой Redis с noeviction, а не
+# общий кэш с allkeys-lru. Пусто — тот же бэкенд, что и CACHE_URL.
+JWT_BLACKLIST_CACHE_URL = os.getenv("JWT_BLACKLIST_CACHE_URL", "")
+
+_cache_common = {
+    "KEY_PREFIX": os.getenv("CACHE_KEY_PREFIX", "v-one"),
+    # Повышение CACHE_VERSION разом отменяет все записи (например, после деплоя)
+    "VERSION": int(os.getenv("CACHE_VERSION", "1")),
+    "TIMEOUT": int(os.getenv("CACHE_DEFAULT_TIMEOUT", "300")),
+}
+CACHES = {
+    "default": {**_cache_backend(CACHE_URL), **_cache_common},
+    "tokens": {**_cache_backend(JWT_BLACKLIST_CACHE_URL or CACHE_URL), **_cache_common},
+}
+TEST_RUNNER = "core.test_runner.LocalCacheTestRunner"
+# Как часто воркер добавляет свои счётчики попаданий к общим, секунды
+CACHE_STATS_FLUSH_INTERVAL = float(os.getenv("CACHE_STATS_FLUSH_INTERVAL", "30"))
 
 
 # Password validation
@@ -157,6 +291,9 @@ SESSION_COOKIE_SECURE = not DEBUG
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
 CORS_ALLOW_CREDENTIALS = True
+# Метка read-your-writes для клиентов без cookie (core.db_router)
+CORS_ALLOW_HEADERS = (*default_headers, "x-db-sticky-until")
+CORS_EXPOSE_HEADERS = ["X-DB-Sticky-Until"]
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.1/howto/static-files/
@@ -179,17 +316,42 @@ else:
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
+# JWT без запроса пользователя на каждый запрос: пользователь собирается из
+# claims, флаги сверяются с кэшем состояния аккаунта раз в JWT_REVOCATION_CHECK_TTL
+JWT_STATELESS_AUTH = os.getenv("JWT_STATELESS_AUTH", "True").lower() == "true"
+JWT_REVOCATION_CHECK_TTL = int(os.getenv("JWT_REVOCATION_CHECK_TTL", "30"))
+# Проверка чёрного списка refresh-токенов через кэш (нужен общий кэш, например Redis);
+# истёкшие токены удаляет команда prune_tokens
+JWT_BLACKLIST_CACHE = os.getenv("JWT_BLACKLIST_CACHE", "False").lower() == "true"
+
+# Библиотека JSON для API (core.fast_json): auto — orjson или msgspec, если
+# установлены, иначе стандартный json; можно указать orjson, msgspec или stdlib
+JSON_BACKEND = os.getenv("JSON_BACKEND", "auto")
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.ClaimsJWTAuthentication"
+        if JWT_STATELESS_AUTH
+        else "rest_framework_simplejwt.authentication.JWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("accounts.permissions.IsAuthenticatedReadOnlyForDemo",),
+    "DEFAULT_RENDERER_CLASSES": (
+        "core.fast_json.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "core.fast_json.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 5,
 }
 
 AUTH_USER_MODEL = "accounts.User"
+# Вход по имени или email; в остальном — стандартный ModelBackend
+AUTHENTICATION_BACKENDS = ["accounts.backends.LoginBackend"]
 
 # Media files configuration
 USE_S3 = os.getenv("USE_S3", "False").lower() == "true"
@@ -237,11 +399,81 @@ if USE_S3:
     MEDIA_URL = "/media/"
     MEDIA_ROOT = ""
 else:
+    # STATICFILES_STORAGE Django 5.1+ не читает — без STORAGES collectstatic
+    # не создавал бы сжатые .br/.gz для WhiteNoise
+    STORAGES = {
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": STATICFILES_STORAGE},
+    }
     MEDIA_ROOT = os.path.join(BASE_DIR, "media")
     MEDIA_URL = "/media/"
 
 MAX_IMAGE_SIZE = 100 * 1024 * 1024  # 100MB
 
+# Файлы маршрутов (GPX/KML/IGC): небольшие разбираются прямо в запросе,
+# крупные — в фоновом пуле потоков после сохранения маршрута (недоразобранные
+# после перезапуска воркера дорабатывает команда ingest_route_files).
+ROUTE_FILE_SYNC_PARSE_MAX_BYTES = int(os.getenv("ROUTE_FILE_SYNC_PARSE_MAX_BYTES", str(2 * 1024 * 1024)))
+ROUTE_FILE_INGEST_WORKERS = int(os.getenv("ROUTE_FILE_INGEST_WORKERS", "2"))
+
+# Массовый импорт маршрутов (CSV-логбук или ZIP с GPX/KML/IGC)
+ROUTE_IMPORT_CHUNK_SIZE = int(os.getenv("ROUTE_IMPORT_CHUNK_SIZE", "500"))
+# Процессы общего пула разбора архивов (на каждый воркер, запускаются через spawn); 0 — разбор в запросе
+ROUTE_IMPORT_PROCESSES = int(os.getenv("ROUTE_IMPORT_PROCESSES", "2"))
+ROUTE_IMPORT_MAX_FILES = int(os.getenv("ROUTE_IMPORT_MAX_FILES", "2000"))
+ROUTE_IMPORT_MAX_BYTES = int(os.getenv("ROUTE_IMPORT_MAX_BYTES", str(200 * 1024 * 1024)))
+
+# Рекомендации подписок («возможно, вы знакомы»): пересчитываются командой
+# build_follow_suggestions (по расписанию), хранятся FOLLOW_SUGGESTIONS_TTL_HOURS
+FOLLOW_SUGGESTIONS_TTL_HOURS = int(os.getenv("FOLLOW_SUGGESTIONS_TTL_HOURS", "48"))
+FOLLOW_SUGGESTIONS_PER_USER = int(os.getenv("FOLLOW_SUGGESTIONS_PER_USER", "20"))
+FOLLOW_SUGGESTIONS_CHUNK_SIZE = int(os.getenv("FOLLOW_SUGGESTIONS_CHUNK_SIZE", "500"))
+
+# Журнал действий пользователей (UserActionLog) пишется фоновым потоком пачками:
+# сброс по ACTION_LOG_BATCH_SIZE записей или раз в ACTION_LOG_FLUSH_INTERVAL секунд,
+# при переполнении буфера записи отбрасываются. GET-запросы можно сэмплировать.
+ACTION_LOG_BUFFERED = os.getenv("ACTION_LOG_BUFFERED", "True").lower() == "true"
+ACTION_LOG_BUFFER_SIZE = int(os.getenv("ACTION_LOG_BUFFER_SIZE", "10000"))
+ACTION_LOG_BATCH_SIZE = int(os.getenv("ACTION_LOG_BATCH_SIZE", "200"))
+ACTION_LOG_FLUSH_INTERVAL = float(os.getenv("ACTION_LOG_FLUSH_INTERVAL", "2"))
+ACTION_LOG_GET_SAMPLE_RATE = float(os.getenv("ACTION_LOG_GET_SAMPLE_RATE", "1.0"))
+
+# Срок хранения журнала (команда prune_action_logs, запускать по cron; 0 — бессрочно).
+# Перед удалением записи можно выгружать в хранилище gzip-файлами JSONL.
+# На PostgreSQL с партициями (prune_action_logs --partition) команда заранее
+# создаёт партиции на ACTION_LOG_PARTITIONS_AHEAD месяцев вперёд.
+ACTION_LOG_RETENTION_DAYS = int(os.getenv("ACTION_LOG_RETENTION_DAYS", "180"))
+ACTION_LOG_ARCHIVE = os.getenv("ACTION_LOG_ARCHIVE", "False").lower() == "true"
+ACTION_LOG_ARCHIVE_DIR = os.getenv("ACTION_LOG_ARCHIVE_DIR", "action_logs")
+ACTION_LOG_PARTITIONS_AHEAD = int(os.getenv("ACTION_LOG_PARTITIONS_AHEAD", "2"))
+
+# Дашборд админки читает почасовые/дневные сводки журнала (UserActionRollup)
+# и кэширует ответы на ADMIN_DASHBOARD_CACHE_TTL секунд
+ADMIN_DASHBOARD_CACHE_TTL = int(os.getenv("ADMIN_DASHBOARD_CACHE_TTL", "60"))
+
+# SiteSettings (режим обслуживания) кэшируются в памяти воркера; версия в общем
+# кэше сверяется раз в SITE_SETTINGS_CACHE_TTL секунд
+SITE_SETTINGS_CACHE_TTL = float(os.getenv("SITE_SETTINGS_CACHE_TTL", "5"))
+
+# Кэш ответов публичных эндпоинтов для анонимных посетителей (core.http_cache):
+# хранится HTTP_CACHE_TIMEOUT секунд или до изменения данных; браузеру
+# разрешено держать ответ HTTP_CACHE_MAX_AGE секунд (0 — перепроверка по ETag)
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "True").lower() == "true"
+HTTP_CACHE_TIMEOUT = int(os.getenv("HTTP_CACHE_TIMEOUT", "60"))
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "0"))
+
+# Кэш общей для всех зрителей части сериализованных постов и маршрутов
+# (post.fragments); сбрасывается сигналами, TTL ограничивает устаревание
+FRAGMENT_CACHE_ENABLED = os.getenv("FRAGMENT_CACHE_ENABLED", "True").lower() == "true"
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv("FRAGMENT_CACHE_TIMEOUT", "600"))
+
+# Long-polling счётчика уведомлений в ASGI-профиле: максимальное ожидание и
+# период проверки метки изменений, секунды
+NOTIFICATION_POLL_MAX_WAIT = float(os.getenv("NOTIFICATION_POLL_MAX_WAIT", "25"))
+NOTIFICATION_POLL_INTERVAL = float(os.getenv("NOTIFICATION_POLL_INTERVAL", "1"))
+# Потоки для блокирующих вызовов S3 в async-медиапрокси (ASGI-профиль)
+MEDIA_PROXY_THREADS = int(os.getenv("MEDIA_PROXY_THREADS", "32"))
+
 
 # ——— Логирование (красивый вывод в терминал) ———
 class EmojiColoredFormatter(colorlog.ColoredFormatter):
@@ -343,4 +575,6 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_REFRESH_EXP_CLAIM": "refresh_exp",
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
+    "TOKEN_REFRESH_SERIALIZER": "accounts.api.serializers.MyTokenRefreshSerializer",
+    "TOKEN_BLACKLIST_SERIALIZER": "accounts.api.serializers.MyTokenBlacklistSerializer",
 }
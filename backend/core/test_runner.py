@@ -0,0 +1,28 @@
+"""
+Запуск тестов с кэшем в памяти процесса.
+
+CACHE_URL и JWT_BLACKLIST_CACHE_URL из окружения в тестах не используются:
+``cache.clear()`` в тестах не должен задевать общий кэш работающего
+сервера. Подмена идёт через ``override_settings``, а не по
+``sys.argv`` в settings, поэтому не зависит от способа запуска. Другой
+раннер (pytest-django и т.п.) может применить ``TEST_CACHES`` так же.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_CACHES = {
+    alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": alias}
+    for alias in ("default", "tokens")
+}
+
+
+class LocalCacheTestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches_override = override_settings(CACHES=TEST_CACHES)
+        self._caches_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches_override.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,286 @@
+import gzip
+import io
+import time
+from unittest import mock, skipIf
+
+from asgiref.sync import async_to_sync, sync_to_async
+from botocore.exceptions import ClientError
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.db import connections
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.exceptions import Throttled
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import Notification, User
+from core import compression, media_proxy
+from core.compression import CompressionMiddleware
+from core.notification_views import (
+    UnreadNotificationsCountPoll,
+    unread_notifications_count,
+    unread_notifications_count_async,
+)
+
+
+@override_settings(NOTIFICATION_POLL_INTERVAL=0.01, NOTIFICATION_POLL_MAX_WAIT=0.2)
+class UnreadNotificationsCountAsyncTests(TestCase):
+    url = "/api/v1/user/notifications/unread_count/"
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        self.actor = User.objects.create_user(username="bob", email="bob@example.com", password="x")
+        self._notify()
+
+    def _notify(self):
+        Notification.objects.create(user=self.user, actor=self.actor, type="follow", message="bob подписался на вас")
+
+    def _get(self, view, method="get", user=None, **params):
+        request = getattr(APIRequestFactory(), method)(self.url, params)
+        if user is not None:
+            force_authenticate(request, user)
+        if view is unread_notifications_count_async:
+            response = async_to_sync(view)(request)
+        else:
+            response = view(request)
+        return response.render()
+
+    def test_matches_sync_view(self):
+        for user in (None, self.user):
+            sync = self._get(unread_notifications_count, user=user)
+            async_ = self._get(unread_notifications_count_async, user=user)
+            self.assertEqual((async_.status_code, async_.content), (sync.status_code, sync.content))
+        self.assertEqual(async_.data, {"unread_count": 1})
+
+    def test_anonymous_and_wrong_method_get_drf_errors(self):
+        response = self._get(unread_notifications_count_async)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("WWW-Authenticate", response)
+        response = self._get(unread_notifications_count_async, method="post", user=self.user)
+        self.assertEqual(response.status_code, 405)
+
+    def test_throttling_applies(self):
+        with mock.patch.object(UnreadNotificationsCountPoll, "check_throttles", side_effect=Throttled(wait=5)):
+            response = self._get(unread_notifications_count_async, user=self.user)
+        self.assertEqual(response.status_code, 429)
+
+    def test_long_poll_returns_on_new_notification(self):
+        async def sleep_and_notify(delay):
+            await sync_to_async(self._notify)()
+
+        with mock.patch("core.notification_views.asyncio.sleep", side_effect=sleep_and_notify) as sleep:
+            response = self._get(unread_notifications_count_async, user=self.user, since=1, wait=10)
+        self.assertEqual(response.data, {"unread_count": 2})
+        self.assertEqual(sleep.call_count, 1)
+
+    def test_long_poll_times_out_with_same_count(self):
+        response = self._get(unread_notifications_count_async, user=self.user, since=1, wait=10)
+        self.assertEqual(response.data, {"unread_count": 1})
+
+    def test_changed_count_answers_at_once(self):
+        with mock.patch("core.notification_views.asyncio.sleep") as sleep:
+            response = self._get(unread_notifications_count_async, user=self.user, since=0, wait=10)
+        self.assertEqual(response.data, {"unread_count": 1})
+        sleep.assert_not_called()
+
+
+class StubBody:
+    def __init__(self, data):
+        self.stream = io.BytesIO(data)
+        self.closed = False
+
+    def iter_chunks(self, size):
+        while chunk := self.stream.read(size):
+            yield chunk
+
+    def read(self, size):
+        return self.stream.read(size)
+
+    def close(self):
+        self.closed = True
+
+
+@override_settings(MEDIA_PROXY_THREADS=2)
+class MediaProxyTests(TestCase):
+    def setUp(self):
+        self.data = b"x" * (media_proxy.CHUNK_SIZE + 10)
+        self.body = StubBody(self.data)
+        self.client_stub = mock.Mock()
+        self.client_stub.get_object.return_value = {
+            "Body": self.body,
+            "ContentType": "binary/octet-stream",
+            "ContentLength": len(self.data),
+            "ETag": '"abc"',
+        }
+        self.enterContext(mock.patch.object(media_proxy, "_get_client", return_value=self.client_stub))
+        self.enterContext(mock.patch.object(media_proxy, "default_storage", mock.Mock(bucket_name="media")))
+        self.request = RequestFactory().get("/media/images/profile/a.png")
+
+    def _check(self, response, content):
+        self.assertEqual(content, self.data)
+        self.assertTrue(self.body.closed)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(response["Content-Length"], str(len(self.data)))
+        self.assertEqual(response["ETag"], '"abc"')
+        self.client_stub.get_object.assert_called_once_with(Bucket="media", Key="images/profile/a.png")
+
+    def test_sync_streams_object(self):
+        response = media_proxy.media_proxy(self.request, "/images/profile/a.png")
+        self._check(response, b"".join(response.streaming_content))
+
+    def test_async_streams_object(self):
+        async def fetch():
+            response = await media_proxy.media_proxy_async(self.request, "images/profile/a.png")
+            return response, b"".join([chunk async for chunk in response.streaming_content])
+
+        response, content = async_to_sync(fetch)()
+        self._check(response, content)
+
+    def test_missing_object_is_404(self):
+        self.client_stub.get_object.side_effect = ClientError(
+            {"Error": {"Code": "NoSuchKey"}}, "GetObject"
+        )
+        with self.assertLogs("core.media_proxy", "WARNING"), self.assertRaises(Http404):
+            media_proxy.media_proxy(self.request, "images/missing.png")
+        with self.assertLogs("core.media_proxy", "WARNING"), self.assertRaises(Http404):
+            async_to_sync(media_proxy.media_proxy_async)(self.request, "images/missing.png")
+
+    def test_empty_path_is_404(self):
+        with self.assertRaises(Http404):
+            media_proxy.media_proxy(self.request, "/")
+        self.client_stub.get_object.assert_not_called()
+
+
+class PersistentConnectionTests(TransactionTestCase):
+    """
+    Запросы идут через WSGIHandler, как под gunicorn: тестовый Client
+    отключает close_old_connections, а здесь сигналы начала и конца запроса
+    управляют соединением по DB_CONN_MAX_AGE и DB_CONN_HEALTH_CHECKS.
+    """
+
+    def setUp(self):
+        self.db = connections["default"]
+        self.db.ensure_connection()
+        self.closes = self.enterContext(mock.patch.object(self.db, "close", wraps=self.db.close))
+        self.checks = self.enterContext(mock.patch.object(self.db, "is_usable", wraps=self.db.is_usable))
+
+    def _configure(self, max_age, health_checks):
+        settings_dict = {**self.db.settings_dict, "CONN_MAX_AGE": max_age, "CONN_HEALTH_CHECKS": health_checks}
+        self.enterContext(mock.patch.object(self.db, "settings_dict", settings_dict))
+        # Как при подключении с этими настройками (BaseDatabaseWrapper.connect)
+        self.enterContext(mock.patch.object(self.db, "close_at", time.monotonic() + max_age))
+        self.enterContext(mock.patch.object(self.db, "health_check_enabled", health_checks))
+
+    def _request(self):
+        cache.clear()
+        statuses = []
+        request = RequestFactory().get("/api/admin/navigation/public/")
+        response = WSGIHandler()(request.environ, lambda status, headers: statuses.append(status))
+        b"".join(response)
+        response.close()
+        return statuses[0]
+
+    def test_connection_is_reused_between_requests(self):
+        self._configure(max_age=60, health_checks=True)
+        for _ in range(3):
+            self.assertEqual(self._request(), "200 OK")
+        self.closes.assert_not_called()
+        # Перед первым запросом к базе в каждом запросе — проверка соединения
+        self.assertEqual(self.checks.call_count, 3)
+
+    def test_without_health_checks_connection_is_not_pinged(self):
+        self._configure(max_age=60, health_checks=False)
+        self._request()
+        self.closes.assert_not_called()
+        self.checks.assert_not_called()
+
+    def test_zero_max_age_closes_after_each_request(self):
+        self._configure(max_age=0, health_checks=False)
+        self._request()
+        self._request()
+        self.assertGreaterEqual(self.closes.call_count, 2)
+
+    def test_bench_reports_connection_reuse(self):
+        self._configure(max_age=60, health_checks=True)
+        out = io.StringIO()
+        call_command("bench_db_connections", requests=20, threads=1, stdout=out)
+        self.assertIn("CONN_MAX_AGE=60 health checks=True pool=False", out.getvalue())
+        self.assertIn("20 requests, 1 threads", out.getvalue())
+        # Одно соединение потока бенчмарка на все 20 запросов
+        self.assertIn("1 connections opened", out.getvalue())
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100, COMPRESSION_CONTENT_TYPES=["application/json", "text/*"])
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = b'{"title": "' + b"route " * 100 + b'"}'
+
+    def _process(self, response, accept="gzip, deflate, br"):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response).process_response(request, response)
+
+    def _json(self, body=None):
+        return HttpResponse(self.body if body is None else body, content_type="application/json")
+
+    @skipIf(compression.brotli is None, "brotli is not installed")
+    def test_prefers_brotli(self):
+        response = self._process(self._json())
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(compression.brotli.decompress(response.content), self.body)
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+
+    def test_falls_back_to_gzip(self):
+        response = self._process(self._json(), accept="gzip, br;q=0")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+        with mock.patch.object(compression, "brotli", None):
+            self.assertEqual(self._process(self._json(), accept="br, gzip")["Content-Encoding"], "gzip")
+
+    def test_identity_only_client_gets_plain_body_with_vary(self):
+        response = self._process(self._json(), accept="identity")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, self.body)
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+    def test_vary_is_added_to_compressed_response(self):
+        response = HttpResponse(self.body, content_type="text/plain")
+        response["Vary"] = "Cookie"
+        self.assertEqual(self._process(response)["Vary"], "Cookie, Accept-Encoding")
+
+    def test_small_responses_are_left_alone(self):
+        response = self._process(self._json(b"[]"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertFalse(response.has_header("Vary"))
+
+    def test_non_allowlisted_types_are_left_alone(self):
+        response = self._process(HttpResponse(self.body, content_type="image/png"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, self.body)
+
+    def test_sync_stream_is_compressed_in_chunks(self):
+        response = StreamingHttpResponse([self.body[:50], self.body[50:]], content_type="application/json")
+        response["Content-Length"] = str(len(self.body))
+        response = self._process(response, accept="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertFalse(response.has_header("Content-Length"))
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), self.body)
+
+    def test_async_stream_is_compressed_in_chunks(self):
+        async def chunks():
+            yield self.body[:50]
+            yield self.body[50:]
+
+        response = self._process(StreamingHttpResponse(chunks(), content_type="application/json"), accept="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+        async def read():
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(gzip.decompress(async_to_sync(read)()), self.body)
+
+    def test_short_stream_is_left_alone(self):
+        response = StreamingHttpResponse([b"{}"], content_type="application/json")
+        response["Content-Length"] = "2"
+        self.assertFalse(self._process(response).has_header("Content-Encoding"))
@@ -0,0 +1,38 @@
+"""
+Конфигурация gunicorn (подхватывается из рабочей директории: ``gunicorn``
+без аргументов).
+
+``SERVER_PROFILE``:
+
+- ``sync`` — прежний режим: один запрос на процесс;
+- ``gthread`` (по умолчанию) — ``GUNICORN_THREADS`` потоков в каждом из
+  ``GUNICORN_WORKERS`` процессов; медленный S3 или загрузка занимает поток, а
+  не процесс. Соединения с базой — постоянные или пул (``DB_POOL``);
+- ``asgi`` — uvicorn-воркеры и ``core.asgi``: медиапрокси и long-polling
+  счётчика уведомлений асинхронные и ожидают, не занимая потоков.
+"""
+import os
+
+profile = os.getenv("SERVER_PROFILE", "gthread")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "3"))
+threads = int(os.getenv("GUNICORN_THREADS", "1" if profile == "sync" else "8"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# Плановый перезапуск воркеров ограничивает рост памяти; jitter разносит их во времени
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "5000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "500"))
+accesslog = "-"
+errorlog = "-"
+
+if profile == "asgi":
+    worker_class = "uvicorn_worker.UvicornWorker"
+    wsgi_app = "core.asgi:application"
+elif profile == "gthread":
+    worker_class = "gthread"
+    wsgi_app = "core.wsgi:application"
+else:
+    worker_class = "sync"
+    wsgi_app = "core.wsgi:application"
@@ -10,7 +10,7 @@ admin.site.register(Comment)
 
 @admin.register(FlightRoute)
 class FlightRouteAdmin(admin.ModelAdmin):
-    list_display = ('title', 'pilot', 'departure', 'destination', 'flight_date', 'is_public', 'created')
-    list_filter = ('is_public', 'flight_date', 'created')
+    list_display = ('title', 'pilot', 'departure', 'destination', 'flight_date', 'visibility', 'created')
+    list_filter = ('visibility', 'flight_date', 'created')
     search_fields = ('title', 'departure', 'destination', 'pilot__username')
     readonly_fields = ('created', 'updated')
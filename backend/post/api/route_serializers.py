@@ -1,12 +1,23 @@
 import json
 from rest_framework import serializers
+from post.fragments import ROUTE, FragmentCacheMixin, FragmentListSerializer
 from post.models import FlightRoute
-from accounts.api.serializers import UserSerializer
+from post.route_files import (
+    RouteFileError,
+    parse_route_file,
+    schedule_route_file_ingestion,
+    should_parse_in_background,
+)
+from accounts.api.serializers import UserBriefSerializer
 from django.contrib.humanize.templatetags.humanize import naturalday
 
 
-class FlightRouteSerializer(serializers.ModelSerializer):
-    pilot = UserSerializer(read_only=True)
+class FlightRouteSerializer(FragmentCacheMixin, serializers.ModelSerializer):
+    fragment_kind = ROUTE
+    # Зависят от зрителя или от текущей даты — в кэш фрагментов не попадают
+    per_request_fields = ('is_liked', 'is_saved', 'created_display', 'flight_date_display')
+
+    pilot = UserBriefSerializer(read_only=True)
     pilot_id = serializers.IntegerField(write_only=True, required=False)
     is_liked = serializers.SerializerMethodField()
     is_saved = serializers.SerializerMethodField()
@@ -15,6 +26,8 @@ class FlightRouteSerializer(serializers.ModelSerializer):
     created_display = serializers.SerializerMethodField()
     flight_date_display = serializers.SerializerMethodField()
     visibility_display = serializers.CharField(source="get_visibility_display", read_only=True)
+    # Устаревший флаг: на запись переводится в visibility, на чтение вычисляется из неё
+    is_public = serializers.BooleanField(required=False)
 
     class Meta:
         model = FlightRoute
@@ -37,6 +50,8 @@ class FlightRouteSerializer(serializers.ModelSerializer):
             'distance',
             'aircraft_type',
             'route_file',
+            'route_file_status',
+            'route_file_error',
             'visibility',
             'visibility_display',
             'is_public',
@@ -48,17 +63,50 @@ class FlightRouteSerializer(serializers.ModelSerializer):
             'likes_count',
             'saves_count',
         ]
-        read_only_fields = ['pilot', 'created', 'updated']
+        read_only_fields = ['pilot', 'created', 'updated', 'route_file_status', 'route_file_error']
+        list_serializer_class = FragmentListSerializer
+        # Могут быть извлечены из файла маршрута (см. validate)
+        extra_kwargs = {
+            'title': {'required': False},
+            'departure': {'required': False},
+            'destination': {'required': False},
+        }
+
+    ROUTE_FILE_REQUIRED_FIELDS = ('title', 'departure', 'destination')
+
+    def prepare_per_request(self, routes):
+        """Лайки и сохранения зрителя для всей страницы — двумя запросами."""
+        self._viewer_flags = None
+        request = self.context.get('request')
+        if routes is None or not (request and request.user.is_authenticated):
+            return
+        ids = [route.pk for route in routes]
+        self._viewer_flags = {
+            name: set(
+                through.objects.filter(user_id=request.user.id, flightroute_id__in=ids)
+                .values_list('flightroute_id', flat=True)
+            )
+            for name, through in (
+                ('liked', FlightRoute.likes.through),
+                ('saved', FlightRoute.saves.through),
+            )
+        }
 
     def get_is_liked(self, route):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
+            flags = getattr(self, '_viewer_flags', None)
+            if flags is not None:
+                return route.pk in flags['liked']
             return route.likes.filter(id=request.user.id).exists()
         return False
 
     def get_is_saved(self, route):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
+            flags = getattr(self, '_viewer_flags', None)
+            if flags is not None:
+                return route.pk in flags['saved']
             return route.saves.filter(id=request.user.id).exists()
         return False
 
@@ -76,9 +124,9 @@ class FlightRouteSerializer(serializers.ModelSerializer):
             return naturalday(route.flight_date)
         return None
 
-    def to_representation(self, instance):
+    def to_shared_representation(self, instance):
         """Переопределяем представление для правильного формирования URL файла маршрута"""
-        representation = super().to_representation(instance)
+        representation = self.render_shared_fields(instance)
         
         # Обрабатываем route_file
         if instance.route_file:
@@ -104,16 +152,98 @@ class FlightRouteSerializer(serializers.ModelSerializer):
         return value
 
     def validate(self, attrs):
-        visibility = attrs.get("visibility")
-        if visibility is None and "is_public" in attrs:
-            visibility = "public" if attrs.get("is_public") else "private"
-            attrs["visibility"] = visibility
-        if visibility is not None:
-            attrs["is_public"] = visibility == "public"
+        is_public = attrs.pop("is_public", None)
+        if attrs.get("visibility") is None and is_public is not None:
+            attrs["visibility"] = "public" if is_public else "private"
+
+        self._ingest_in_background = False
+        route_file = attrs.get("route_file")
+        if route_file:
+            if should_parse_in_background(route_file):
+                self._ingest_in_background = True
+            else:
+                self._fill_from_route_file(attrs, route_file)
+
+        if not attrs.get("title") and attrs.get("departure") and attrs.get("destination"):
+            attrs["title"] = f"{attrs['departure']} → {attrs['destination']}"
+
+        # Небольшой файл уже дополнил поля выше. Крупный разбирается в фоне и
+        # может не разобраться, поэтому с ним название и точки тоже
+        # обязательны: фоновый разбор дописывает только координаты и прочее
+        if self.instance is None:
+            missing = {
+                name: [self.fields[name].error_messages["required"]]
+                for name in self.ROUTE_FILE_REQUIRED_FIELDS
+                if not attrs.get(name)
+            }
+            if missing:
+                raise serializers.ValidationError(missing, code="required")
         return attrs
 
+    def _fill_from_route_file(self, attrs, route_file):
+        """Дополняет незаполненные поля данными из GPX/KML/IGC файла."""
+        try:
+            parsed = parse_route_file(route_file, route_file.name)
+        except RouteFileError as exc:
+            raise serializers.ValidationError({"route_file": [str(exc)]}) from exc
+        if parsed is None:
+            return
+        for name, value in parsed.as_route_fields().items():
+            if attrs.get(name) not in (None, "", []):
+                continue
+            if name not in attrs and getattr(self.instance, name, None) not in (None, "", []):
+                continue
+            attrs[name] = value
+
+    def _mark_pending(self, validated_data):
+        if getattr(self, "_ingest_in_background", False):
+            validated_data["route_file_status"] = "pending"
+            validated_data["route_file_error"] = ""
+
     def create(self, validated_data):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             validated_data['pilot'] = request.user
-        return super().create(validated_data)
+        self._mark_pending(validated_data)
+        route = super().create(validated_data)
+        if getattr(self, "_ingest_in_background", False):
+            schedule_route_file_ingestion(route.id)
+        return route
+
+    def update(self, instance, validated_data):
+        self._mark_pending(validated_data)
+        route = super().update(instance, validated_data)
+        if getattr(self, "_ingest_in_background", False):
+            schedule_route_file_ingestion(route.id)
+        return route
+
+
+class FlightRouteImportSerializer(serializers.ModelSerializer):
+    """Валидация одной строки массового импорта (CSV или файл из архива)."""
+
+    class Meta:
+        model = FlightRoute
+        fields = [
+            'title',
+            'departure',
+            'destination',
+            'departure_lat',
+            'departure_lng',
+            'destination_lat',
+            'destination_lng',
+            'waypoints',
+            'description',
+            'flight_date',
+            'flight_duration',
+            'distance',
+            'aircraft_type',
+            'visibility',
+        ]
+        extra_kwargs = {'title': {'required': False}}
+
+    validate_waypoints = FlightRouteSerializer.validate_waypoints
+
+    def validate(self, attrs):
+        if not attrs.get("title"):
+            attrs["title"] = f"{attrs['departure']} → {attrs['destination']}"[:200]
+        return attrs
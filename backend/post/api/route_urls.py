@@ -2,6 +2,7 @@ from django.urls import path
 from .route_views import (
     FlightRouteListAPIView,
     FlightRouteCreateAPIView,
+    FlightRouteImportAPIView,
     FlightRouteRetrieveAPIView,
     FlightRouteUpdateAPIView,
     FlightRouteDeleteAPIView,
@@ -15,6 +16,7 @@ from .route_views import (
 urlpatterns = [
     path('routes/', FlightRouteListAPIView.as_view(), name='route_list'),
     path('routes/create/', FlightRouteCreateAPIView.as_view(), name='route_create'),
+    path('routes/import/', FlightRouteImportAPIView.as_view(), name='route_import'),
     path('routes/<int:pk>/', FlightRouteRetrieveAPIView.as_view(), name='route_detail'),
     path('routes/<int:pk>/update/', FlightRouteUpdateAPIView.as_view(), name='route_update'),
     path('routes/<int:pk>/delete/', FlightRouteDeleteAPIView.as_view(), name='route_delete'),
@@ -8,12 +8,20 @@ from rest_framework.generics import (
 )
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import AllowAny
 from accounts.permissions import IsAuthenticatedReadOnlyForDemo
+from django.core.paginator import Paginator
+from django.http import Http404
+from django.utils.functional import cached_property
 from django.shortcuts import get_object_or_404
 from django.db import models
 from post.models import FlightRoute
-from accounts.models import Notification
+from post.route_import import RouteImportError, import_routes, read_import_rows
+from post.search import is_ranked, search_routes
+from accounts.models import Notification, get_following_ids
+from core.http_cache import AnonymousCacheMixin
 from .route_serializers import FlightRouteSerializer
 
 
@@ -28,12 +36,7 @@ def apply_route_filters(queryset, request):
 
     query = request.query_params.get('q', None)
     if query:
-        queryset = queryset.filter(
-            models.Q(title__icontains=query)
-            | models.Q(departure__icontains=query)
-            | models.Q(destination__icontains=query)
-            | models.Q(pilot__username__icontains=query)
-        )
+        queryset = search_routes(queryset, query)
 
     distance_min = request.query_params.get('distance_min', None)
     if distance_min:
@@ -49,37 +52,98 @@ def apply_route_filters(queryset, request):
         except ValueError:
             pass
 
-    order_by = request.query_params.get('order_by', '-created')
+    order_by = request.query_params.get('order_by', None)
     if order_by in ['created', '-created', 'flight_date', '-flight_date', 'distance', '-distance']:
         queryset = queryset.order_by(order_by)
+    elif query and is_ranked():
+        # Результаты поиска по умолчанию — по релевантности
+        queryset = queryset.order_by('-search_rank', '-created')
+    else:
+        queryset = queryset.order_by('-created')
 
-    return queryset
+    # Карточка пилота строится из той же строки — без запроса на каждый маршрут
+    return queryset.select_related('pilot')
+
+
+NON_PUBLIC_VISIBILITY = [value for value, _ in FlightRoute.VISIBILITY_CHOICES if value != "public"]
 
 
 def apply_visibility_filter(queryset, user):
-    if user and user.is_authenticated:
-        following_ids = user.following.values_list("id", flat=True)
-        return queryset.filter(
-            models.Q(pilot=user)
-            | models.Q(visibility="public")
-            | models.Q(visibility="followers", pilot_id__in=following_ids)
-            | models.Q(visibility__isnull=True, is_public=True)
-        )
-    return queryset.filter(
-        models.Q(visibility="public")
-        | models.Q(visibility__isnull=True, is_public=True)
-    )
-
-
-class FlightRouteListAPIView(ListAPIView):
+    """
+    Оставляет маршруты, доступные пользователю.
+
+    Вызывается последним — после фильтров и сортировки: для вошедшего
+    пользователя результат — UNION ALL непересекающихся веток, к которому
+    можно применить только срез и count(). Каждая ветка — простое условие по
+    своему индексу: публичные — (visibility, created), свои непубличные и
+    «для подписчиков» тех, на кого подписан, — (pilot, visibility, created).
+    PostgreSQL сворачивает такой UNION ALL в Merge Append и читает из каждой
+    ветки только строки текущей страницы, а не собирает весь OR через
+    BitmapOr с последующей сортировкой. Сравнение со старым OR-фильтром —
+    команда ``bench_route_visibility``.
+    """
+    if not (user and user.is_authenticated):
+        return queryset.filter(visibility="public")
+
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    base = queryset.order_by()
+    branches = [
+        base.filter(visibility="public"),
+        base.filter(pilot_id=user.id, visibility__in=NON_PUBLIC_VISIBILITY),
+    ]
+    following_ids = sorted(get_following_ids(user) - {user.id})
+    if following_ids:
+        branches.append(base.filter(visibility="followers", pilot_id__in=following_ids))
+    return branches[0].union(*branches[1:], all=True).order_by(*ordering)
+
+
+class VisibleRoutesPaginator(Paginator):
+    """Число маршрутов UNION ALL из apply_visibility_filter — суммой счётчиков веток."""
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if query is None or query.combinator != "union" or not query.combinator_all:
+            return super().count
+        # Ветки не пересекаются; COUNT(*) по ним идёт по индексам, а не по
+        # подзапросу со всеми колонками и JOIN из select_related
+        return sum(branch.get_count(using=self.object_list.db) for branch in query.combined_queries)
+
+
+class RoutePagination(PageNumberPagination):
+    django_paginator_class = VisibleRoutesPaginator
+
+
+def can_view_route(route, user) -> bool:
+    """То же правило, что в apply_visibility_filter, для уже загруженного маршрута."""
+    if route.visibility == "public":
+        return True
+    if not (user and user.is_authenticated):
+        return False
+    if route.pilot_id == user.id:
+        return True
+    return route.visibility == "followers" and route.pilot_id in get_following_ids(user)
+
+
+def get_visible_route(pk, user):
+    """Маршрут по id или 404, если его нет или он скрыт от пользователя."""
+    route = get_object_or_404(FlightRoute, pk=pk)
+    if not can_view_route(route, user):
+        raise Http404
+    return route
+
+
+class FlightRouteListAPIView(AnonymousCacheMixin, ListAPIView):
     """Список маршрутов полетов"""
     serializer_class = FlightRouteSerializer
     permission_classes = [AllowAny]
     authentication_classes = []
+    pagination_class = RoutePagination
+    cache_scopes = ("routes", "users")
 
     def get_queryset(self):
-        queryset = apply_visibility_filter(FlightRoute.objects.all(), self.request.user)
-        return apply_route_filters(queryset, self.request)
+        queryset = apply_route_filters(FlightRoute.objects.all(), self.request)
+        return apply_visibility_filter(queryset, self.request.user)
 
 
 class FlightRouteCreateAPIView(CreateAPIView):
@@ -88,15 +152,49 @@ class FlightRouteCreateAPIView(CreateAPIView):
     permission_classes = [IsAuthenticatedReadOnlyForDemo]
 
 
-class FlightRouteRetrieveAPIView(RetrieveAPIView):
+class FlightRouteImportAPIView(APIView):
+    """Массовый импорт маршрутов из CSV-логбука или ZIP-архива с GPX/KML/IGC"""
+    permission_classes = [IsAuthenticatedReadOnlyForDemo]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'file': ['Прикрепите файл .csv или .zip.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        visibility = request.data.get('visibility') or None
+        if visibility and visibility not in dict(FlightRoute.VISIBILITY_CHOICES):
+            return Response(
+                {'visibility': ['Недопустимое значение.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            rows = read_import_rows(upload, upload.name)
+        except RouteImportError as exc:
+            return Response({'file': [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        report = import_routes(request.user, rows, visibility=visibility)
+        response_status = status.HTTP_201_CREATED if report.created else status.HTTP_400_BAD_REQUEST
+        return Response(report.as_dict(), status=response_status)
+
+
+class FlightRouteRetrieveAPIView(AnonymousCacheMixin, RetrieveAPIView):
     """Детали маршрута"""
     serializer_class = FlightRouteSerializer
     queryset = FlightRoute.objects.all()
     permission_classes = [AllowAny]
     authentication_classes = []
 
-    def get_queryset(self):
-        return apply_visibility_filter(FlightRoute.objects.all(), self.request.user)
+    def get_cache_scopes(self, request, *args, **kwargs):
+        return (f"route:{kwargs['pk']}", "users")
+
+    def get_object(self):
+        route = super().get_object()
+        if not can_view_route(route, self.request.user):
+            raise Http404
+        return route
 
 
 class FlightRouteUpdateAPIView(UpdateAPIView):
@@ -126,8 +224,7 @@ class FlightRouteLikeAPIView(APIView):
     allow_read_only_user = True
 
     def post(self, request, pk):
-        queryset = apply_visibility_filter(FlightRoute.objects.all(), request.user)
-        route = get_object_or_404(queryset, pk=pk)
+        route = get_visible_route(pk, request.user)
         user = request.user
         
         if route.likes.filter(id=user.id).exists():
@@ -158,8 +255,7 @@ class FlightRouteSaveAPIView(APIView):
     allow_read_only_user = True
 
     def post(self, request, pk):
-        queryset = apply_visibility_filter(FlightRoute.objects.all(), request.user)
-        route = get_object_or_404(queryset, pk=pk)
+        route = get_visible_route(pk, request.user)
         user = request.user
         
         if route.saves.filter(id=user.id).exists():
@@ -198,10 +294,11 @@ class SavedFlightRoutesAPIView(ListAPIView):
     """Сохраненные маршруты"""
     serializer_class = FlightRouteSerializer
     permission_classes = [IsAuthenticatedReadOnlyForDemo]
+    pagination_class = RoutePagination
 
     def get_queryset(self):
-        queryset = apply_visibility_filter(self.request.user.saved_routes.all(), self.request.user)
-        return apply_route_filters(queryset, self.request)
+        queryset = apply_route_filters(self.request.user.saved_routes.all(), self.request)
+        return apply_visibility_filter(queryset, self.request.user)
 
 
 class FollowingFlightRoutesAPIView(ListAPIView):
@@ -210,9 +307,13 @@ class FollowingFlightRoutesAPIView(ListAPIView):
     permission_classes = [IsAuthenticatedReadOnlyForDemo]
 
     def get_queryset(self):
-        following_ids = self.request.user.following.values_list("id", flat=True)
-        queryset = FlightRoute.objects.filter(
-            models.Q(pilot_id__in=following_ids) | models.Q(pilot=self.request.user),
-        )
-        queryset = apply_visibility_filter(queryset, self.request.user)
+        user = self.request.user
+        condition = models.Q(pilot_id=user.id)
+        following_ids = get_following_ids(user)
+        if following_ids:
+            condition |= models.Q(
+                pilot_id__in=following_ids,
+                visibility__in=["public", "followers"],
+            )
+        queryset = FlightRoute.objects.filter(condition)
         return apply_route_filters(queryset, self.request)
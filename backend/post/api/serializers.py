@@ -1,5 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from accounts.api.serializers import file_url
+from accounts.models import Follow, get_following_ids
+from post.fragments import POST, FragmentCacheMixin, FragmentListSerializer
 from post.models import Post, Comment, PostImage
 from django.contrib.humanize.templatetags.humanize import naturaltime
 
@@ -15,12 +18,7 @@ class CreatorSerializer(serializers.ModelSerializer):
     
     def get_profile_pic(self, obj):
         """Возвращает URL профильного изображения"""
-        if obj.profile_pic:
-            try:
-                return obj.profile_pic.url
-            except Exception:
-                return ""
-        return ""
+        return file_url(obj.profile_pic)
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -55,13 +53,7 @@ class CommentSerializer(serializers.ModelSerializer):
         return comment.post.content
 
     def get_post_creator_profile(self, comment):
-        creator = comment.post.creator
-        try:
-            if creator.profile_pic:
-                return creator.profile_pic.url
-        except Exception:
-            pass
-        return None
+        return file_url(comment.post.creator.profile_pic, default=None)
 
     def get_post_creator(self, comment):
         return comment.post.creator.username
@@ -73,7 +65,18 @@ class CommentSerializer(serializers.ModelSerializer):
         return comment.post.created.isoformat()
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(FragmentCacheMixin, serializers.ModelSerializer):
+    fragment_kind = POST
+    # Зависят от зрителя или от текущего времени — в кэш фрагментов не попадают
+    per_request_fields = (
+        'created',
+        'is_liked',
+        'is_saved',
+        'is_commented',
+        'is_following_user',
+        'is_followed_by_user',
+    )
+
     creator = CreatorSerializer(read_only=True)
     likes = serializers.SerializerMethodField(read_only=True)
     is_liked = serializers.SerializerMethodField(read_only=True)
@@ -105,10 +108,11 @@ class PostSerializer(serializers.ModelSerializer):
             'is_followed_by_user',
             "isEdited"
         )
+        list_serializer_class = FragmentListSerializer
     
-    def to_representation(self, instance):
+    def to_shared_representation(self, instance):
         """Переопределяем представление для правильного формирования URL изображения"""
-        representation = super().to_representation(instance)
+        representation = self.render_shared_fields(instance)
         
         # Собираем все изображения поста (из PostImage и старое поле image для обратной совместимости)
         images = []
@@ -146,43 +150,84 @@ class PostSerializer(serializers.ModelSerializer):
         
         return representation
 
+    def _viewer(self):
+        request = self.context.get("request")
+        user = request.user if request else None
+        return user if user and user.is_authenticated else None
+
+    def prepare_per_request(self, posts):
+        """Флаги зрителя для всей страницы: по запросу на флаг, а не на пост."""
+        self._viewer_flags = None
+        user = self._viewer()
+        if posts is None or user is None:
+            return
+        ids = [post.pk for post in posts]
+        creator_ids = {post.creator_id for post in posts}
+        self._viewer_flags = {
+            "liked": set(
+                Post.likes.through.objects.filter(user_id=user.id, post_id__in=ids)
+                .values_list("post_id", flat=True)
+            ),
+            "saved": set(
+                Post.saves.through.objects.filter(user_id=user.id, post_id__in=ids)
+                .values_list("post_id", flat=True)
+            ),
+            "commented": set(
+                Comment.objects.filter(creator=user, post_id__in=ids).values_list("post_id", flat=True)
+            ),
+            "following": get_following_ids(user),
+            "followed_by": set(
+                Follow.objects.filter(followee=user, follower_id__in=creator_ids)
+                .values_list("follower_id", flat=True)
+            ),
+        }
+
+    def _flag(self, name, value):
+        flags = getattr(self, "_viewer_flags", None)
+        return value in flags[name] if flags is not None else None
+
     def get_created(self, post):
         return naturaltime(post.created)
 
     def get_is_liked(self, post):
-        user = self.context.get("request").user
-        if not user or not user.is_authenticated:
+        user = self._viewer()
+        if user is None:
             return False
-        return post.likes.filter(id=user.id).exists()
+        flag = self._flag("liked", post.pk)
+        return flag if flag is not None else post.likes.filter(id=user.id).exists()
 
     def get_is_saved(self, post):
-        user = self.context.get("request").user
-        if not user or not user.is_authenticated:
+        user = self._viewer()
+        if user is None:
             return False
-        return post.saves.filter(id=user.id).exists()
+        flag = self._flag("saved", post.pk)
+        return flag if flag is not None else post.saves.filter(id=user.id).exists()
 
     def get_is_commented(self, post):
-        user = self.context.get("request").user
-        if not user or not user.is_authenticated:
+        user = self._viewer()
+        if user is None:
             return False
-        return post.comments.filter(creator=user).exists()
+        flag = self._flag("commented", post.pk)
+        return flag if flag is not None else post.comments.filter(creator=user).exists()
 
     def get_likes(self, post):
         return post.likes.count()
 
     def get_is_following_user(self, post):
-        creator = post.creator
-        user = self.context.get("request").user
-        if not user or not user.is_authenticated:
+        user = self._viewer()
+        if user is None:
             return False
-        return user.following.filter(id=creator.id).exists()
+        flag = self._flag("following", post.creator_id)
+        return flag if flag is not None else post.creator_id in get_following_ids(user)
 
     def get_is_followed_by_user(self, post):
-        creator = post.creator
-        user = self.context.get("request").user
-        if not user or not user.is_authenticated:
+        user = self._viewer()
+        if user is None:
             return False
-        return creator.following.filter(id=user.id).exists()
+        flag = self._flag("followed_by", post.creator_id)
+        if flag is not None:
+            return flag
+        return Follow.objects.filter(follower_id=post.creator_id, followee=user).exists()
 
     def get_comments(self, post):
         return post.comments.count()
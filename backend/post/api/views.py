@@ -16,11 +16,13 @@ from rest_framework.permissions import AllowAny, IsAdminUser
 from accounts.permissions import IsAuthenticatedReadOnlyForDemo
 from accounts.models import User
 from typing import Any
+from core.http_cache import AnonymousCacheMixin
 
 
-class PostListAPIView(ListAPIView):
+class PostListAPIView(AnonymousCacheMixin, ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [AllowAny]
+    cache_scopes = ("posts", "users")
 
     def get_queryset(self):
         filter = self.request.query_params.get('filter', None)
@@ -80,12 +82,15 @@ class PostUpdateAPIView(RetrieveUpdateAPIView):
         return qs
 
 
-class PostRetrieveAPIView(RetrieveAPIView):
+class PostRetrieveAPIView(AnonymousCacheMixin, RetrieveAPIView):
     model = Post
     serializer_class = PostSerializer
     queryset = Post.objects.all()
     permission_classes = [AllowAny]
 
+    def get_cache_scopes(self, request, *args, **kwargs):
+        return (f"post:{kwargs['pk']}", "users")
+
 
 class PostDeleteAPIView(RetrieveDestroyAPIView):
     model = Post
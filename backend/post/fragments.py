@@ -0,0 +1,151 @@
+"""
+Кэш сериализованных постов и маршрутов, общих для всех зрителей.
+
+Представление объекта делится на две части:
+
+- общую (автор, ссылки на изображения, счётчики, тексты) — она хранится в
+  кэше (``core.cache``, пространство ``fragments``) под ключом ``<вид>:<id>``;
+- зависящую от запроса (``per_request_fields``: флаги «лайкнул/сохранил»,
+  «5 минут назад») — она считается на каждый ответ.
+
+Список сериализуется одним ``get_many`` по ключам страницы; промахи
+рендерятся и дописываются ``set_many``. Флаги зрителя для страницы
+собираются пакетно (``prepare_per_request``), а не запросом на объект.
+
+Сигналы (``post.signals``) удаляют фрагменты при правке объекта, лайке,
+сохранении, комментарии и смене профиля автора — после коммита транзакции:
+иначе параллельный запрос успел бы отрендерить и положить в кэш ещё
+незакоммиченное старое состояние на весь ``FRAGMENT_CACHE_TIMEOUT``. По той
+же причине при настроенных репликах удаление оставляет на
+``DB_REPLICA_STICKY_SECONDS`` отметку ``changed:<вид>:<id>``: пока она жива,
+фрагмент, прочитанный с реплики, в кэш не кладётся. ``FRAGMENT_VERSION``
+(версия пространства) повышается при изменении набора полей сериализаторов.
+"""
+from django.conf import settings
+from django.db import models, transaction
+from rest_framework import serializers
+
+from core.cache import namespace
+from core.db_router import reads_from_replica
+
+FRAGMENT_VERSION = 1
+
+cache = namespace("fragments", version=FRAGMENT_VERSION)
+
+POST = "post"
+ROUTE = "route"
+
+
+def _key(kind: str, pk) -> str:
+    return f"{kind}:{pk}"
+
+
+def _changed_key(kind: str, pk) -> str:
+    return f"changed:{kind}:{pk}"
+
+
+def get_fragments(kind: str, ids) -> dict:
+    keys = {_key(kind, pk): pk for pk in ids}
+    found = cache.get_many(keys)
+    return {keys[key]: value for key, value in found.items()}
+
+
+def set_fragments(kind: str, fragments: dict) -> None:
+    if fragments and reads_from_replica():
+        # Недавно изменённые объекты реплика могла ещё не догнать
+        changed = cache.get_many([_changed_key(kind, pk) for pk in fragments])
+        fragments = {pk: value for pk, value in fragments.items() if _changed_key(kind, pk) not in changed}
+    if not fragments:
+        return
+    cache.set_many(
+        {_key(kind, pk): value for pk, value in fragments.items()},
+        settings.FRAGMENT_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_fragments(kind: str, ids) -> None:
+    ids = list(ids)
+    if not ids:
+        return
+    cache.delete_many([_key(kind, pk) for pk in ids])
+    window = settings.DB_REPLICA_STICKY_SECONDS
+    if settings.DB_REPLICAS and window > 0:
+        cache.set_many({_changed_key(kind, pk): 1 for pk in ids}, window)
+
+
+def schedule_fragment_invalidation(kind: str, ids) -> None:
+    """
+    Удаляет фрагменты после коммита текущей транзакции (или сразу вне её).
+
+    ``ids`` может быть QuerySet — он выполняется уже после коммита.
+    """
+    transaction.on_commit(lambda: invalidate_fragments(kind, ids))
+
+
+class FragmentListSerializer(serializers.ListSerializer):
+    """Список: общие части — одним обращением к кэшу, флаги зрителя — пакетно."""
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        instances = list(iterable)
+        child = self.child
+        child.prepare_per_request(instances)
+        try:
+            shared = child.get_shared_representations(instances)
+            return [child.merge_representation(instance, shared[instance.pk]) for instance in instances]
+        finally:
+            child.prepare_per_request(None)
+
+
+class FragmentCacheMixin:
+    """
+    Подмешивается к ModelSerializer. Наследник задаёт ``fragment_kind`` и
+    ``per_request_fields``; вместо ``to_representation`` он переопределяет
+    ``to_shared_representation``, если общей части нужна доработка.
+    """
+
+    fragment_kind = None
+    per_request_fields = ()
+
+    @property
+    def _readable_fields(self):
+        skip = self.per_request_fields if getattr(self, "_shared_only", False) else ()
+        for field in super()._readable_fields:
+            if field.field_name not in skip:
+                yield field
+
+    def render_shared_fields(self, instance) -> dict:
+        self._shared_only = True
+        try:
+            return dict(super().to_representation(instance))
+        finally:
+            self._shared_only = False
+
+    def to_shared_representation(self, instance) -> dict:
+        return self.render_shared_fields(instance)
+
+    def get_shared_representations(self, instances) -> dict:
+        """{id: общая часть} для объектов; промахи рендерятся и кладутся в кэш."""
+        enabled = settings.FRAGMENT_CACHE_ENABLED
+        shared = get_fragments(self.fragment_kind, [obj.pk for obj in instances]) if enabled else {}
+        missing = {
+            obj.pk: self.to_shared_representation(obj) for obj in instances if obj.pk not in shared
+        }
+        if missing and enabled:
+            set_fragments(self.fragment_kind, missing)
+        shared.update(missing)
+        return shared
+
+    def prepare_per_request(self, instances) -> None:
+        """Пакетная подготовка флагов зрителя для списка (None — сброс)."""
+
+    def merge_representation(self, instance, shared: dict) -> dict:
+        data = dict(shared)
+        for name in self.per_request_fields:
+            field = self.fields[name]
+            data[name] = field.to_representation(field.get_attribute(instance))
+        return data
+
+    def to_representation(self, instance):
+        shared = self.get_shared_representations([instance])[instance.pk]
+        return self.merge_representation(instance, shared)
@@ -0,0 +1,114 @@
+import io
+import math
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+
+from post.route_files import ROUTE_FILE_FORMATS, parse_route_file
+
+START = datetime(2024, 5, 1, 8, 0, tzinfo=timezone.utc)
+
+
+def _track(points: int):
+    """Точки синтетического трека: зигзаг на северо-восток, точка в секунду."""
+    for index in range(points):
+        share = index / max(points - 1, 1)
+        lat = 55.97 + 2.0 * share + 0.01 * math.sin(index / 50)
+        lng = 37.41 + 2.5 * share
+        yield lat, lng, START + timedelta(seconds=index)
+
+
+def build_gpx(points: int) -> bytes:
+    out = io.StringIO()
+    out.write('<?xml version="1.0"?>\n<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">')
+    out.write("<trk><name>Bench</name><trkseg>\n")
+    for lat, lng, when in _track(points):
+        out.write(
+            f'<trkpt lat="{lat:.6f}" lon="{lng:.6f}"><ele>1200</ele>'
+            f"<time>{when:%Y-%m-%dT%H:%M:%SZ}</time></trkpt>\n"
+        )
+    out.write("</trkseg></trk></gpx>\n")
+    return out.getvalue().encode()
+
+
+def build_kml(points: int) -> bytes:
+    out = io.StringIO()
+    out.write('<?xml version="1.0"?>\n<kml xmlns="http://www.opengis.net/kml/2.2" ')
+    out.write('xmlns:gx="http://www.google.com/kml/ext/2.2"><Document><name>Bench</name>')
+    out.write("<Placemark><gx:Track>\n")
+    track = list(_track(points))
+    for _, _, when in track:
+        out.write(f"<when>{when:%Y-%m-%dT%H:%M:%SZ}</when>\n")
+    for lat, lng, _ in track:
+        out.write(f"<gx:coord>{lng:.6f} {lat:.6f} 1200</gx:coord>\n")
+    out.write("</gx:Track></Placemark></Document></kml>\n")
+    return out.getvalue().encode()
+
+
+def _igc_coord(value: float, width: int, positive: str, negative: str) -> str:
+    hemisphere = positive if value >= 0 else negative
+    value = abs(value)
+    degrees = int(value)
+    thousandths = round((value - degrees) * 60000)
+    return f"{degrees:0{width}d}{thousandths:05d}{hemisphere}"
+
+
+def build_igc(points: int) -> bytes:
+    lines = ["AXXX001 Bench", f"HFDTE{START:%d%m%y}"]
+    for lat, lng, when in _track(points):
+        lines.append(
+            f"B{when:%H%M%S}{_igc_coord(lat, 2, 'N', 'S')}{_igc_coord(lng, 3, 'E', 'W')}A0120001200"
+        )
+    return ("\r\n".join(lines) + "\r\n").encode("latin-1")
+
+
+BUILDERS = {"gpx": build_gpx, "kml": build_kml, "igc": build_igc}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure GPX/KML/IGC route file parsing on synthetic tracks: wall time, "
+        "points per second and peak Python memory of one parse."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--points",
+            type=int,
+            nargs="+",
+            default=[1_000, 100_000],
+            help="Track sizes to generate.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=ROUTE_FILE_FORMATS,
+            nargs="+",
+            default=list(ROUTE_FILE_FORMATS),
+            help="Formats to measure.",
+        )
+        parser.add_argument("--iterations", type=int, default=3, help="Parses per measurement (best is reported).")
+
+    def handle(self, *args, **options):
+        for fmt in options["format"]:
+            for points in options["points"]:
+                content = BUILDERS[fmt](points)
+                timings = []
+                for _ in range(options["iterations"]):
+                    started = time.perf_counter()
+                    parsed = parse_route_file(io.BytesIO(content), f"bench.{fmt}")
+                    timings.append(time.perf_counter() - started)
+
+                tracemalloc.start()
+                parse_route_file(io.BytesIO(content), f"bench.{fmt}")
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                best = min(timings)
+                self.stdout.write(
+                    f"{fmt} {points:>8} points {len(content) / 1_048_576:7.2f} MB: "
+                    f"{best * 1000:9.1f} ms, {points / best:10,.0f} points/s, "
+                    f"peak {peak / 1024:8.0f} KiB, {len(parsed.waypoints)} waypoints, "
+                    f"{parsed.distance} km, {parsed.flight_duration}"
+                )
@@ -0,0 +1,119 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from accounts.models import Follow, User, get_following_ids
+from post.api.route_views import VisibleRoutesPaginator, apply_visibility_filter
+from post.models import FlightRoute
+
+SEED_CHUNK = 1000
+
+
+class Rollback(Exception):
+    pass
+
+
+def or_filter(queryset, user):
+    """Прежний фильтр видимости — одно OR-условие с подставленными id подписок."""
+    condition = models.Q(visibility="public") | models.Q(pilot_id=user.id)
+    following_ids = get_following_ids(user)
+    if following_ids:
+        condition |= models.Q(visibility="followers", pilot_id__in=following_ids)
+    return queryset.filter(condition)
+
+
+STRATEGIES = {"or": or_filter, "union": apply_visibility_filter}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare route visibility strategies (single OR filter vs UNION ALL branches) on a "
+        "synthetic data set: seeds routes and a viewer who follows many pilots inside a "
+        "transaction, times count(), the first page and a deep page, and rolls everything back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--routes", type=int, default=100_000, help="Routes to seed.")
+        parser.add_argument("--pilots", type=int, default=2_000, help="Pilots owning the routes.")
+        parser.add_argument("--following", type=int, default=1_000, help="Pilots the viewer follows.")
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--deep-page", type=int, default=50, help="Page number for the deep page timing.")
+        parser.add_argument("--iterations", type=int, default=5, help="Runs per measurement (best is reported).")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                viewer = self._seed(options)
+                self._measure(viewer, options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Seeded data rolled back.")
+
+    def _seed(self, options):
+        started = time.perf_counter()
+        suffix = f"{time.time_ns():x}"
+        users = User.objects.bulk_create(
+            User(username=f"bench-{suffix}-{index}", email=f"bench-{suffix}-{index}@example.com", password="!")
+            for index in range(options["pilots"] + 1)
+        )
+        viewer, pilots = users[0], users[1:]
+        Follow.objects.bulk_create(
+            Follow(follower=viewer, followee=pilot) for pilot in pilots[: options["following"]]
+        )
+
+        # 80% публичных, 10% для подписчиков, 10% приватных; часть — у самого зрителя
+        visibilities = ["public"] * 8 + ["followers", "private"]
+        now = timezone.now()
+        for start in range(0, options["routes"], SEED_CHUNK):
+            routes = FlightRoute.objects.bulk_create(
+                FlightRoute(
+                    pilot=viewer if index % 500 == 0 else pilots[index % len(pilots)],
+                    title=f"Bench {index}",
+                    departure="UUEE",
+                    destination="ULLI",
+                    visibility=visibilities[index % len(visibilities)],
+                )
+                for index in range(start, min(start + SEED_CHUNK, options["routes"]))
+            )
+            # auto_now_add ставит всем одно время — разносим порции по минутам
+            FlightRoute.objects.filter(pk__in=[route.pk for route in routes]).update(
+                created=now - timedelta(minutes=start // SEED_CHUNK)
+            )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.stdout.write(
+            f"Seeded {options['routes']} routes, {options['pilots']} pilots, viewer follows "
+            f"{options['following']} ({time.perf_counter() - started:.1f} s)"
+        )
+        return viewer
+
+    def _best(self, iterations, func):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - started)
+        return min(timings) * 1000, result
+
+    def _measure(self, viewer, options):
+        page_size = options["page_size"]
+        deep = (options["deep_page"] - 1) * page_size
+        iterations = options["iterations"]
+        pages = {}
+        for name, strategy in STRATEGIES.items():
+            queryset = strategy(FlightRoute.objects.select_related("pilot").order_by("-created", "-id"), viewer)
+            # Счётчик — как у пагинатора списков маршрутов
+            count_ms, count = self._best(iterations, lambda: VisibleRoutesPaginator(queryset, page_size).count)
+            first_ms, first = self._best(iterations, lambda: tuple(route.pk for route in queryset[:page_size]))
+            deep_ms, deep_page = self._best(
+                iterations, lambda: tuple(route.pk for route in queryset[deep:deep + page_size])
+            )
+            pages[name] = (count, first, deep_page)
+            self.stdout.write(
+                f"  {name:6} count {count:>7} {count_ms:8.1f} ms  first page {first_ms:7.1f} ms  "
+                f"page {options['deep_page']} {deep_ms:7.1f} ms"
+            )
+        self.stdout.write(f"  same results: {'yes' if len(set(pages.values())) == 1 else 'NO'}")
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from post.models import FlightRoute
+from post.route_import import RouteImportError, import_routes, read_import_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk import flight routes for a pilot from a CSV logbook or a ZIP of GPX/KML/IGC files."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to a .csv or .zip file.")
+        parser.add_argument(
+            "--user",
+            required=True,
+            help="Username or id of the pilot who will own the routes.",
+        )
+        parser.add_argument(
+            "--visibility",
+            choices=[value for value, _ in FlightRoute.VISIBILITY_CHOICES],
+            help="Visibility for rows that do not specify it.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=None,
+            help="Rows per bulk_create batch (defaults to ROUTE_IMPORT_CHUNK_SIZE).",
+        )
+
+    def handle(self, *args, **options):
+        lookup = options["user"]
+        pilot = User.objects.filter(username=lookup).first()
+        if pilot is None and lookup.isdigit():
+            pilot = User.objects.filter(pk=int(lookup)).first()
+        if pilot is None:
+            raise CommandError(f"User {lookup!r} not found.")
+
+        path = options["path"]
+        try:
+            with open(path, "rb") as fileobj:
+                rows = read_import_rows(fileobj, path)
+        except OSError as exc:
+            raise CommandError(str(exc)) from exc
+        except RouteImportError as exc:
+            raise CommandError(str(exc)) from exc
+
+        report = import_routes(
+            pilot,
+            rows,
+            visibility=options["visibility"],
+            chunk_size=options["chunk_size"],
+        )
+
+        for error in report.errors:
+            self.stdout.write(f"[ERROR] row {error['row']} ({error['source']}): {error['errors']}")
+
+        message = f"Imported {report.created} of {report.total} routes for {pilot.username}."
+        if report.errors:
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from post.models import FlightRoute
+from post.route_files import ingest_route_file
+
+
+class Command(BaseCommand):
+    help = (
+        "Parse route files left pending by the background pool (for example after a worker "
+        "restart). Run it periodically, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=10,
+            help="Only pick routes pending for at least N minutes, so live workers can finish theirs.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options["older_than"])
+        ids = list(
+            FlightRoute.objects.filter(route_file_status="pending", updated__lte=cutoff)
+            .order_by("updated")
+            .values_list("pk", flat=True)
+        )
+        failed = 0
+        for route_id in ids:
+            ingest_route_file(route_id)
+            failed += FlightRoute.objects.filter(pk=route_id, route_file_status="failed").exists()
+        self.stdout.write(self.style.SUCCESS(f"Parsed {len(ids)} pending route files, {failed} failed."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from post.stats import rebuild_pilot_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute per-pilot flight statistics (PilotStats) from their routes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Pilots recomputed per batch.",
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_pilot_stats(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Pilot statistics rebuilt for {total} pilots."))
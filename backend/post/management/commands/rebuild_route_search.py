@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from post.search import get_search_backend, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for flight routes."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Route search index rebuilt ({type(backend).__name__})."))
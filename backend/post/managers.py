@@ -1,9 +1,19 @@
 from django.db.models import Manager
 from django.db.models import Q
 
+from accounts.models import Follow
+
 
 class PostManager(Manager):
 
     def user_post(self, user):
-        query = Q(creator=user) | Q(creator__in=user.following.all())
-        return self.get_queryset().filter(query).distinct()
+        followee_ids = Follow.objects.filter(follower=user).values("followee_id")
+        query = Q(creator=user) | Q(creator__in=followee_ids)
+        return self.get_queryset().filter(query)
+
+
+class FlightRouteManager(Manager):
+
+    def get_queryset(self):
+        # search_vector нужен только базе для поиска — не читаем его в каждом запросе
+        return super().get_queryset().defer("search_vector")
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def visibility_from_is_public(apps, schema_editor):
+    """Строки без visibility (старая схема) получают её из флага is_public."""
+    FlightRoute = apps.get_model('post', 'FlightRoute')
+    legacy = FlightRoute.objects.filter(models.Q(visibility__isnull=True) | models.Q(visibility=''))
+    legacy.filter(is_public=False).update(visibility='private')
+    legacy.update(visibility='public')
+
+
+def is_public_from_visibility(apps, schema_editor):
+    FlightRoute = apps.get_model('post', 'FlightRoute')
+    FlightRoute.objects.exclude(visibility='public').update(is_public=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0006_postimage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(visibility_from_is_public, is_public_from_visibility),
+        migrations.RemoveField(
+            model_name='flightroute',
+            name='is_public',
+        ),
+        migrations.AddIndex(
+            model_name='flightroute',
+            index=models.Index(fields=['visibility', '-created'], name='route_visibility_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightroute',
+            index=models.Index(fields=['pilot', 'visibility', '-created'], name='route_pilot_visibility_idx'),
+        ),
+    ]
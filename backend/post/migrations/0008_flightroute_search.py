@@ -0,0 +1,88 @@
+from django.db import migrations
+
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE post_flightroute ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE INDEX IF NOT EXISTS route_search_vector_idx ON post_flightroute USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS route_departure_trgm_idx"
+    " ON post_flightroute USING gin (upper(departure) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS route_destination_trgm_idx"
+    " ON post_flightroute USING gin (upper(destination) gin_trgm_ops)",
+    """
+    UPDATE post_flightroute AS r SET search_vector =
+        setweight(to_tsvector('simple', coalesce(r.title, '') || ' ' || coalesce(r.departure, '')
+            || ' ' || coalesce(r.destination, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(u.username, '')), 'B')
+        || setweight(to_tsvector('simple', coalesce(r.aircraft_type, '')), 'C')
+        || setweight(to_tsvector('simple', coalesce(r.description, '')), 'D')
+    FROM accounts_user AS u WHERE u.id = r.pilot_id
+    """,
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS route_destination_trgm_idx",
+    "DROP INDEX IF EXISTS route_departure_trgm_idx",
+    "DROP INDEX IF EXISTS route_search_vector_idx",
+    "ALTER TABLE post_flightroute DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS post_flightroute_fts USING fts5("
+    "title, departure, destination, pilot, aircraft_type, description,"
+    " tokenize = 'unicode61 remove_diacritics 2')",
+    """
+    INSERT INTO post_flightroute_fts (rowid, title, departure, destination, pilot, aircraft_type, description)
+    SELECT r.id, r.title, r.departure, r.destination, u.username,
+        coalesce(r.aircraft_type, ''), coalesce(r.description, '')
+    FROM post_flightroute AS r JOIN accounts_user AS u ON u.id = r.pilot_id
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS post_flightroute_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Поисковый индекс маршрутов зависит от СУБД (см. post.search).
+    Если SQLite собран без FTS5, поиск остаётся на icontains.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        statements = POSTGRES_FORWARD
+    elif vendor == "sqlite":
+        if not _sqlite_has_fts5(schema_editor):
+            return
+        statements = SQLITE_FORWARD
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {"postgresql": POSTGRES_BACKWARD, "sqlite": SQLITE_BACKWARD}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def _sqlite_has_fts5(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        options = {row[0] for row in cursor.fetchall()}
+    return "ENABLE_FTS5" in options
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("post", "0007_flightroute_visibility_cleanup"),
+        ("accounts", "0006_set_demo_user_read_only"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:29
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_pilot_stats(apps, schema_editor):
+    from post.stats import rebuild_pilot_stats
+
+    rebuild_pilot_stats(
+        user_model=apps.get_model(*settings.AUTH_USER_MODEL.split('.')),
+        route_model=apps.get_model('post', 'FlightRoute'),
+        stats_model=apps.get_model('post', 'PilotStats'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_set_demo_user_read_only'),
+        ('post', '0008_flightroute_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PilotStats',
+            fields=[
+                ('pilot', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='flight_stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пилот')),
+                ('routes_count', models.PositiveIntegerField(default=0, verbose_name='Маршрутов')),
+                ('total_distance', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Общее расстояние (км)')),
+                ('total_duration', models.DurationField(default=datetime.timedelta(0), verbose_name='Общий налёт')),
+                ('aircraft_types_count', models.PositiveIntegerField(default=0, verbose_name='Типов самолетов')),
+                ('airports_count', models.PositiveIntegerField(default=0, verbose_name='Аэропортов')),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Статистика пилота',
+                'verbose_name_plural': 'Статистика пилотов',
+                'indexes': [models.Index(fields=['-routes_count', 'pilot'], name='pilotstats_routes_idx'), models.Index(fields=['-total_distance', 'pilot'], name='pilotstats_distance_idx'), models.Index(fields=['-total_duration', 'pilot'], name='pilotstats_duration_idx'), models.Index(fields=['-aircraft_types_count', 'pilot'], name='pilotstats_aircraft_idx'), models.Index(fields=['-airports_count', 'pilot'], name='pilotstats_airports_idx')],
+            },
+        ),
+        migrations.RunPython(populate_pilot_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0009_pilotstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flightroute',
+            name='route_file_error',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Ошибка разбора файла'),
+        ),
+        migrations.AddField(
+            model_name='flightroute',
+            name='route_file_status',
+            field=models.CharField(blank=True, choices=[('', 'Не требуется'), ('pending', 'Разбирается'), ('done', 'Разобран'), ('failed', 'Ошибка разбора')], default='', max_length=10, verbose_name='Разбор файла'),
+        ),
+        migrations.AddIndex(
+            model_name='flightroute',
+            index=models.Index(condition=models.Q(('route_file_status', 'pending')), fields=['updated'], name='route_file_pending_idx'),
+        ),
+    ]
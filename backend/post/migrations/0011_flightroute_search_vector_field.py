@@ -0,0 +1,105 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:21
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.text
+import post.search
+from django.conf import settings
+from django.db import migrations
+
+# 0008 создала колонку и индексы на PostgreSQL сырым SQL, мимо состояния
+# моделей. Убираем их, чтобы AddField/AddIndex ниже создали те же объекты
+# уже из модели.
+POSTGRES_DROP_LEGACY = [
+    "DROP INDEX IF EXISTS route_destination_trgm_idx",
+    "DROP INDEX IF EXISTS route_departure_trgm_idx",
+    "DROP INDEX IF EXISTS route_search_vector_idx",
+    "ALTER TABLE post_flightroute DROP COLUMN IF EXISTS search_vector",
+]
+
+# Документ считает база: при вставке и изменении полей маршрута и при смене
+# имени пилота. Приложению не нужен отдельный UPDATE после сохранения.
+POSTGRES_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION post_flightroute_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.title, '') || ' ' || coalesce(NEW.departure, '')
+                || ' ' || coalesce(NEW.destination, '')), 'A')
+            || setweight(to_tsvector('simple',
+                coalesce((SELECT username FROM accounts_user WHERE id = NEW.pilot_id), '')), 'B')
+            || setweight(to_tsvector('simple', coalesce(NEW.aircraft_type, '')), 'C')
+            || setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER post_flightroute_search_vector
+    BEFORE INSERT OR UPDATE OF title, departure, destination, aircraft_type, description, pilot_id
+    ON post_flightroute FOR EACH ROW EXECUTE FUNCTION post_flightroute_search_vector()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION accounts_user_route_search_vector() RETURNS trigger AS $$
+    BEGIN
+        -- UPDATE OF pilot_id запускает триггер маршрута
+        UPDATE post_flightroute SET pilot_id = pilot_id WHERE pilot_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER accounts_user_route_search_vector
+    AFTER UPDATE OF username ON accounts_user FOR EACH ROW
+    WHEN (OLD.username IS DISTINCT FROM NEW.username)
+    EXECUTE FUNCTION accounts_user_route_search_vector()
+    """,
+    "UPDATE post_flightroute SET pilot_id = pilot_id",
+]
+
+POSTGRES_DROP_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS accounts_user_route_search_vector ON accounts_user",
+    "DROP FUNCTION IF EXISTS accounts_user_route_search_vector()",
+    "DROP TRIGGER IF EXISTS post_flightroute_search_vector ON post_flightroute",
+    "DROP FUNCTION IF EXISTS post_flightroute_search_vector()",
+]
+
+
+def _run_on_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0010_flightroute_route_file_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(_run_on_postgres(POSTGRES_DROP_LEGACY), migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='flightroute',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='flightroute',
+            index=post.search.SearchGinIndex(fields=['search_vector'], name='route_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightroute',
+            index=post.search.SearchGinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('departure'), name='gin_trgm_ops'), name='route_departure_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightroute',
+            index=post.search.SearchGinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('destination'), name='gin_trgm_ops'), name='route_destination_trgm_idx'),
+        ),
+        migrations.RunPython(_run_on_postgres(POSTGRES_TRIGGERS), _run_on_postgres(POSTGRES_DROP_TRIGGERS)),
+    ]
@@ -1,8 +1,13 @@
+from datetime import timedelta
+from django.contrib.postgres.indexes import OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Upper
 import hashlib
 import time
 from django.conf import settings
-from .managers import PostManager
+from .managers import FlightRouteManager, PostManager
+from .search import SearchGinIndex
 
 User: str = settings.AUTH_USER_MODEL
 
@@ -84,6 +89,13 @@ class FlightRoute(models.Model):
         ("followers", "Только подписчики"),
         ("private", "Только я"),
     ]
+    # Фоновый разбор крупного файла маршрута (post.route_files)
+    ROUTE_FILE_STATUS_CHOICES = [
+        ("", "Не требуется"),
+        ("pending", "Разбирается"),
+        ("done", "Разобран"),
+        ("failed", "Ошибка разбора"),
+    ]
 
     pilot = models.ForeignKey(
         User,
@@ -153,22 +165,101 @@ class FlightRoute(models.Model):
         null=True,
         verbose_name='Файл маршрута',
     )
+    route_file_status = models.CharField(
+        max_length=10,
+        choices=ROUTE_FILE_STATUS_CHOICES,
+        blank=True,
+        default="",
+        verbose_name='Разбор файла',
+    )
+    route_file_error = models.CharField(
+        max_length=255,
+        blank=True,
+        default="",
+        verbose_name='Ошибка разбора файла',
+    )
     visibility = models.CharField(
         max_length=20,
         choices=VISIBILITY_CHOICES,
         default="public",
         verbose_name="Доступ",
     )
-    is_public = models.BooleanField(default=True, verbose_name='Публичный маршрут')
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     likes = models.ManyToManyField(User, related_name="liked_routes", blank=True)
     saves = models.ManyToManyField(User, related_name="saved_routes", blank=True)
+    # Поисковый документ для PostgreSQL; заполняет триггер базы (см. post.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = FlightRouteManager()
 
     class Meta:
         ordering = ['-created']
         verbose_name = 'Маршрут полета'
         verbose_name_plural = 'Маршруты полетов'
+        indexes = [
+            # Ветки UNION ALL фильтра видимости (см. apply_visibility_filter)
+            models.Index(fields=['visibility', '-created'], name='route_visibility_created_idx'),
+            models.Index(fields=['pilot', 'visibility', '-created'], name='route_pilot_visibility_idx'),
+            # Недоразобранные файлы для команды ingest_route_files
+            models.Index(
+                fields=['updated'],
+                condition=models.Q(route_file_status='pending'),
+                name='route_file_pending_idx',
+            ),
+            # Полнотекстовый поиск и опечатки в кодах аэропортов (post.search)
+            SearchGinIndex(fields=['search_vector'], name='route_search_vector_idx'),
+            SearchGinIndex(OpClass(Upper('departure'), name='gin_trgm_ops'), name='route_departure_trgm_idx'),
+            SearchGinIndex(OpClass(Upper('destination'), name='gin_trgm_ops'), name='route_destination_trgm_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.departure} → {self.destination} by {self.pilot.username}'
+
+    @property
+    def is_public(self) -> bool:
+        """Совместимость со старым флагом: публичный = visibility "public"."""
+        return self.visibility == "public"
+
+
+class PilotStats(models.Model):
+    """
+    Сводная статистика пилота по его маршрутам.
+
+    Пересчитывается для одного пилота при создании/изменении/удалении
+    маршрута (см. post.stats), поэтому список пилотов и лидерборд
+    сортируются по готовым колонкам с индексами, без GROUP BY.
+    """
+
+    pilot = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='flight_stats',
+        on_delete=models.CASCADE,
+        verbose_name='Пилот',
+    )
+    routes_count = models.PositiveIntegerField(default=0, verbose_name='Маршрутов')
+    total_distance = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name='Общее расстояние (км)',
+    )
+    total_duration = models.DurationField(default=timedelta(0), verbose_name='Общий налёт')
+    aircraft_types_count = models.PositiveIntegerField(default=0, verbose_name='Типов самолетов')
+    airports_count = models.PositiveIntegerField(default=0, verbose_name='Аэропортов')
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Статистика пилота'
+        verbose_name_plural = 'Статистика пилотов'
+        indexes = [
+            models.Index(fields=['-routes_count', 'pilot'], name='pilotstats_routes_idx'),
+            models.Index(fields=['-total_distance', 'pilot'], name='pilotstats_distance_idx'),
+            models.Index(fields=['-total_duration', 'pilot'], name='pilotstats_duration_idx'),
+            models.Index(fields=['-aircraft_types_count', 'pilot'], name='pilotstats_aircraft_idx'),
+            models.Index(fields=['-airports_count', 'pilot'], name='pilotstats_airports_idx'),
+        ]
 
     def __str__(self):
-        return f'{self.departure} → {self.destination} by {self.pilot.username}'
\ No newline at end of file
+        return f'Stats for pilot {self.pilot_id}'
@@ -0,0 +1,547 @@
+"""
+Разбор загруженных файлов маршрутов (GPX, KML, IGC).
+
+Файлы читаются потоково: XML разбирается через ``iterparse`` с очисткой
+обработанных элементов, IGC — построчно. Поэтому даже многомегабайтные
+треки не загружаются в память целиком: в памяти держатся только
+агрегаты (расстояние, первая/последняя точка) и прореженный список точек.
+
+Файлы приходят от пользователей, поэтому XML разбирается через defusedxml
+(без раскрытия сущностей и внешних ссылок), а любая ошибка в данных —
+координаты вне диапазона, некорректное время — превращается в
+``RouteFileError``. Скорость разбора — команда ``bench_route_files``.
+"""
+import io
+import logging
+import math
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from xml.etree.ElementTree import ParseError
+
+from defusedxml import DefusedXmlException
+from defusedxml.ElementTree import iterparse
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+ROUTE_FILE_FORMATS = ("gpx", "kml", "igc")
+
+# Сколько точек маршрута сохраняем в FlightRoute.waypoints
+MAX_WAYPOINTS = 100
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+class RouteFileError(ValueError):
+    """Файл маршрута повреждён или не содержит координат."""
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Расстояние по дуге большого круга в километрах."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    h = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+def _check_point(lat: float, lng: float) -> None:
+    if not (math.isfinite(lat) and math.isfinite(lng)):
+        raise RouteFileError("Координаты точки должны быть конечными числами.")
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise RouteFileError(f"Координаты вне допустимого диапазона: {lat}, {lng}.")
+
+
+def _coord(value: float) -> Decimal:
+    return Decimal(str(round(value, 6)))
+
+
+@dataclass
+class ParsedRoute:
+    """Результат разбора файла маршрута."""
+
+    departure: str = ""
+    destination: str = ""
+    departure_lat: Decimal | None = None
+    departure_lng: Decimal | None = None
+    destination_lat: Decimal | None = None
+    destination_lng: Decimal | None = None
+    waypoints: list = field(default_factory=list)
+    flight_date: date | None = None
+    flight_duration: timedelta | None = None
+    distance: Decimal | None = None
+    title: str = ""
+
+    def as_route_fields(self) -> dict:
+        """Поля FlightRoute, которые удалось извлечь (пустые значения отброшены)."""
+        fields = {
+            "departure": self.departure,
+            "destination": self.destination,
+            "departure_lat": self.departure_lat,
+            "departure_lng": self.departure_lng,
+            "destination_lat": self.destination_lat,
+            "destination_lng": self.destination_lng,
+            "waypoints": self.waypoints,
+            "flight_date": self.flight_date,
+            "flight_duration": self.flight_duration,
+            "distance": self.distance,
+        }
+        if self.title:
+            fields["title"] = self.title
+        elif self.departure and self.destination:
+            fields["title"] = f"{self.departure} → {self.destination}"
+        return {key: value for key, value in fields.items() if value not in (None, "", [])}
+
+
+class _TrackAccumulator:
+    """
+    Копит статистику по потоку точек трека.
+
+    Для карты сохраняется порядка ``limit`` точек: когда буфер
+    переполняется, каждая вторая точка отбрасывается, а шаг выборки
+    удваивается. Так память остаётся O(limit) при любой длине трека.
+    Время точек хранится «как есть» и разбирается только для первой
+    и последней точки.
+    """
+
+    def __init__(self, limit: int = MAX_WAYPOINTS, parse_time=None):
+        self.limit = limit
+        self.parse_time = parse_time
+        self.named: list[tuple[float, float, str]] = []
+        self.sampled: list[tuple[float, float]] = []
+        self.stride = 1
+        self.count = 0
+        self.first: tuple[float, float] | None = None
+        self.last: tuple[float, float] | None = None
+        self.distance_km = 0.0
+        self.start_time = None
+        self.end_time = None
+
+    def add_track_point(self, lat: float, lng: float, when=None) -> None:
+        _check_point(lat, lng)
+        point = (lat, lng)
+        if self.last is None:
+            self.first = point
+        else:
+            self.distance_km += haversine_km(self.last[0], self.last[1], lat, lng)
+        self.last = point
+
+        if when is not None:
+            if self.start_time is None:
+                self.start_time = when
+            self.end_time = when
+
+        if self.count % self.stride == 0:
+            self.sampled.append(point)
+            if len(self.sampled) >= self.limit * 2:
+                self.sampled = self.sampled[::2]
+                self.stride *= 2
+        self.count += 1
+
+    def add_named_point(self, lat: float, lng: float, name: str = "") -> None:
+        _check_point(lat, lng)
+        if len(self.named) >= self.limit:
+            # Последнюю точку всё равно запоминаем — обычно это аэропорт назначения
+            self.named[-1] = (lat, lng, name)
+            return
+        self.named.append((lat, lng, name))
+
+    def _time(self, value):
+        if value is None or self.parse_time is None:
+            return value
+        return self.parse_time(value)
+
+    def result(self, title: str = "", flight_date: date | None = None) -> ParsedRoute:
+        if self.first is None and not self.named:
+            raise RouteFileError("Файл не содержит координат.")
+
+        if self.named:
+            waypoints = list(self.named)
+        else:
+            step = math.ceil(len(self.sampled) / (self.limit - 1))
+            waypoints = self.sampled[::step]
+            if waypoints[-1] is not self.last:
+                waypoints.append(self.last)
+
+        start = waypoints[0]
+        end = waypoints[-1]
+
+        distance_km = self.distance_km
+        if not distance_km and len(waypoints) > 1:
+            distance_km = sum(
+                haversine_km(a[0], a[1], b[0], b[1]) for a, b in zip(waypoints, waypoints[1:])
+            )
+
+        try:
+            start_time = self._time(self.start_time)
+            end_time = self._time(self.end_time)
+            duration = None
+            # Сравнение с часовым поясом и без него — TypeError
+            if start_time is not None and end_time is not None and end_time >= start_time:
+                duration = end_time - start_time
+        except (TypeError, ValueError, OverflowError) as exc:
+            raise RouteFileError(f"Некорректное время точек трека: {exc}") from exc
+
+        if flight_date is None and start_time is not None:
+            flight_date = start_time.date()
+
+        def label(point):
+            if len(point) > 2 and point[2]:
+                return point[2][:100]
+            return f"{point[0]:.4f}, {point[1]:.4f}"
+
+        def as_waypoint(point):
+            waypoint = {"lat": round(point[0], 6), "lng": round(point[1], 6)}
+            if len(point) > 2:
+                waypoint["name"] = point[2]
+            return waypoint
+
+        return ParsedRoute(
+            title=title.strip()[:200],
+            departure=label(start),
+            destination=label(end),
+            departure_lat=_coord(start[0]),
+            departure_lng=_coord(start[1]),
+            destination_lat=_coord(end[0]),
+            destination_lng=_coord(end[1]),
+            waypoints=[as_waypoint(point) for point in waypoints],
+            flight_date=flight_date,
+            flight_duration=duration,
+            distance=Decimal(str(round(distance_km, 2))) if distance_km else None,
+        )
+
+
+def _local_name(tag: str) -> str:
+    """Имя тега без XML-namespace: ``{http://...}trkpt`` -> ``trkpt``."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _iter_xml(fileobj):
+    """
+    Потоково обходит XML, отдавая закрытые элементы вместе с родителем.
+
+    После обработки элемента вызывающий код может вызвать ``_release``,
+    чтобы удалить элемент из дерева и не копить уже обработанные узлы.
+    """
+    stack = []
+    try:
+        for event, elem in iterparse(fileobj, events=("start", "end")):
+            if event == "start":
+                stack.append(elem)
+                continue
+            stack.pop()
+            yield elem, (stack[-1] if stack else None)
+    except ParseError as exc:
+        raise RouteFileError(f"Некорректный XML: {exc}") from exc
+    except DefusedXmlException as exc:
+        raise RouteFileError(f"Недопустимый XML: {exc}") from exc
+
+
+def _release(elem, parent) -> None:
+    elem.clear()
+    if parent is not None:
+        parent.remove(elem)
+
+
+def _child_text(elem, name: str) -> str:
+    for child in elem:
+        if _local_name(child.tag) == name:
+            return (child.text or "").strip()
+    return ""
+
+
+def parse_gpx(fileobj) -> ParsedRoute:
+    """Разбор GPX: точки трека (trkpt) и именованные точки (wpt, rtept)."""
+    acc = _TrackAccumulator(parse_time=parse_datetime)
+    title = ""
+    for elem, parent in _iter_xml(fileobj):
+        tag = _local_name(elem.tag)
+        if tag in ("trkpt", "rtept", "wpt"):
+            try:
+                lat = float(elem.get("lat"))
+                lng = float(elem.get("lon"))
+            except (TypeError, ValueError):
+                _release(elem, parent)
+                continue
+            if tag == "trkpt":
+                acc.add_track_point(lat, lng, _child_text(elem, "time") or None)
+            else:
+                acc.add_named_point(lat, lng, _child_text(elem, "name"))
+            _release(elem, parent)
+        elif tag == "name" and not title and parent is not None:
+            if _local_name(parent.tag) in ("trk", "rte", "metadata"):
+                title = (elem.text or "").strip()
+        elif tag in ("trkseg", "trk", "rte"):
+            _release(elem, parent)
+    return acc.result(title=title)
+
+
+def _parse_kml_coordinates(text: str):
+    for chunk in text.split():
+        parts = chunk.split(",")
+        if len(parts) < 2:
+            continue
+        try:
+            yield float(parts[1]), float(parts[0])
+        except ValueError:
+            continue
+
+
+def parse_kml(fileobj) -> ParsedRoute:
+    """Разбор KML: Point — именованные точки, LineString и gx:Track — трек."""
+    acc = _TrackAccumulator(parse_time=parse_datetime)
+    title = ""
+    placemark_name = ""
+    pending_times: deque[str] = deque()
+    for elem, parent in _iter_xml(fileobj):
+        tag = _local_name(elem.tag)
+        parent_tag = _local_name(parent.tag) if parent is not None else ""
+        if tag == "name":
+            text = (elem.text or "").strip()
+            if parent_tag == "Placemark":
+                placemark_name = text
+            elif parent_tag == "Document" and not title:
+                title = text
+        elif tag == "coordinates":
+            if parent_tag == "Point":
+                for lat, lng in _parse_kml_coordinates(elem.text or ""):
+                    acc.add_named_point(lat, lng, placemark_name)
+                    break
+            else:
+                for lat, lng in _parse_kml_coordinates(elem.text or ""):
+                    acc.add_track_point(lat, lng)
+            _release(elem, parent)
+        elif tag == "when":
+            pending_times.append((elem.text or "").strip())
+            _release(elem, parent)
+        elif tag == "coord":
+            parts = (elem.text or "").split()
+            when = (pending_times.popleft() or None) if pending_times else None
+            if len(parts) >= 2:
+                try:
+                    acc.add_track_point(float(parts[1]), float(parts[0]), when)
+                except ValueError:
+                    pass
+            _release(elem, parent)
+        elif tag == "Placemark":
+            placemark_name = ""
+            _release(elem, parent)
+    return acc.result(title=title)
+
+
+_IGC_B_RECORD = re.compile(r"^B(\d{2})(\d{2})(\d{2})(\d{2})(\d{5})([NS])(\d{3})(\d{5})([EW])")
+_IGC_C_RECORD = re.compile(r"^C(\d{2})(\d{5})([NS])(\d{3})(\d{5})([EW])(.*)$")
+_IGC_DATE = re.compile(r"^HFDTE(?:DATE:)?(\d{2})(\d{2})(\d{2})")
+
+
+def _igc_degrees(degrees: str, minutes_thousandths: str, hemisphere: str) -> float:
+    value = int(degrees) + int(minutes_thousandths) / 60000
+    return -value if hemisphere in ("S", "W") else value
+
+
+def parse_igc(fileobj) -> ParsedRoute:
+    """Разбор IGC: B-записи — трек, C-записи — объявленное задание."""
+    acc = _TrackAccumulator()
+    flight_date = None
+    # Время B-записей храним в секундах от полуночи дня полёта
+    day_offset = 0
+    previous_seconds = None
+    for raw_line in fileobj:
+        line = raw_line.decode("latin-1").strip()
+        if not line:
+            continue
+        record = line[0]
+        if record == "B":
+            match = _IGC_B_RECORD.match(line)
+            if not match:
+                continue
+            hh, mm, ss, lat_d, lat_m, lat_h, lng_d, lng_m, lng_h = match.groups()
+            seconds = int(hh) * 3600 + int(mm) * 60 + int(ss) + day_offset
+            # Полёт через полночь: время в B-записях начинается заново
+            if previous_seconds is not None and seconds < previous_seconds:
+                day_offset += 86400
+                seconds += 86400
+            previous_seconds = seconds
+            acc.add_track_point(
+                _igc_degrees(lat_d, lat_m, lat_h),
+                _igc_degrees(lng_d, lng_m, lng_h),
+                seconds,
+            )
+        elif record == "C":
+            match = _IGC_C_RECORD.match(line)
+            if not match:
+                continue
+            lat_d, lat_m, lat_h, lng_d, lng_m, lng_h, name = match.groups()
+            if int(lat_d + lat_m) == 0 and int(lng_d + lng_m) == 0:
+                continue
+            acc.add_named_point(
+                _igc_degrees(lat_d, lat_m, lat_h),
+                _igc_degrees(lng_d, lng_m, lng_h),
+                name.strip(),
+            )
+        elif record == "H" and flight_date is None:
+            match = _IGC_DATE.match(line)
+            if match:
+                day, month, year = (int(part) for part in match.groups())
+                try:
+                    flight_date = date(2000 + year, month, day)
+                except ValueError:
+                    flight_date = None
+
+    midnight = datetime.combine(flight_date or date.min, datetime.min.time())
+    acc.parse_time = lambda seconds: midnight + timedelta(seconds=seconds)
+    parsed = acc.result(flight_date=flight_date)
+    if flight_date is None:
+        # Без заголовка HFDTE дата полёта неизвестна, остаётся только длительность
+        parsed.flight_date = None
+    return parsed
+
+
+PARSERS = {
+    "gpx": parse_gpx,
+    "kml": parse_kml,
+    "igc": parse_igc,
+}
+
+
+def detect_format(name: str, head: bytes = b"") -> str | None:
+    """Определяет формат по расширению, а при его отсутствии — по содержимому."""
+    extension = (name or "").rsplit(".", 1)[-1].lower() if "." in (name or "") else ""
+    if extension in PARSERS:
+        return extension
+    sample = head.lstrip()[:512].lower()
+    if b"<gpx" in sample:
+        return "gpx"
+    if b"<kml" in sample:
+        return "kml"
+    if sample.startswith(b"a") and b"\nh" in sample:
+        return "igc"
+    return None
+
+
+def parse_route_file(fileobj, name: str = "") -> ParsedRoute | None:
+    """
+    Разбирает файл маршрута. Возвращает None, если формат не распознан.
+
+    Позиция в файле восстанавливается, чтобы файл можно было сохранить в storage.
+    """
+    start = fileobj.tell() if hasattr(fileobj, "tell") else 0
+    head = fileobj.read(512)
+    fileobj.seek(start)
+    fmt = detect_format(name or getattr(fileobj, "name", ""), head)
+    if fmt is None:
+        return None
+    try:
+        return PARSERS[fmt](fileobj)
+    finally:
+        fileobj.seek(start)
+
+
+def parse_route_fields(name: str, content: bytes) -> tuple[dict | None, str | None]:
+    """
+    Поля маршрута из содержимого файла или текст ошибки.
+
+    Выполняется и в пуле процессов импорта (``post.route_import``), поэтому
+    не трогает модели и возвращает только простые типы.
+    """
+    try:
+        parsed = parse_route_file(io.BytesIO(content), name)
+    except RouteFileError as exc:
+        return None, str(exc)
+    if parsed is None:
+        return None, "Неподдерживаемый формат файла."
+    return parsed.as_route_fields(), None
+
+
+def fill_missing_fields(route, parsed: ParsedRoute) -> list[str]:
+    """Заполняет пустые поля маршрута данными из файла; введённое пилотом не трогает."""
+    updated = []
+    for name, value in parsed.as_route_fields().items():
+        if getattr(route, name) in (None, "", []):
+            setattr(route, name, value)
+            updated.append(name)
+    return updated
+
+
+def should_parse_in_background(uploaded_file) -> bool:
+    size = getattr(uploaded_file, "size", None) or 0
+    return size > settings.ROUTE_FILE_SYNC_PARSE_MAX_BYTES
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ROUTE_FILE_INGEST_WORKERS,
+                thread_name_prefix="route-ingest",
+            )
+        return _executor
+
+
+def ingest_route_file(route_id: int) -> list[str]:
+    """
+    Разбирает сохранённый файл маршрута и дописывает извлечённые поля.
+
+    Итог пишется в ``route_file_status``: ``done`` или ``failed`` с текстом
+    ошибки в ``route_file_error`` — его видит пилот в ответе API.
+    """
+    from post.models import FlightRoute
+
+    route = FlightRoute.objects.filter(pk=route_id).first()
+    if route is None:
+        return []
+    if not route.route_file:
+        if route.route_file_status:
+            route.route_file_status = ""
+            route.save(update_fields=["route_file_status"])
+        return []
+    try:
+        with route.route_file.open("rb") as fileobj:
+            parsed = parse_route_file(fileobj, route.route_file.name)
+        if parsed is None:
+            raise RouteFileError("Неподдерживаемый формат файла.")
+    except (RouteFileError, OSError) as exc:
+        logger.warning("Failed to parse route file for route %s: %s", route_id, exc)
+        route.route_file_status = "failed"
+        route.route_file_error = str(exc)[:255]
+        route.save(update_fields=["route_file_status", "route_file_error", "updated"])
+        return []
+    updated = fill_missing_fields(route, parsed)
+    route.route_file_status = "done"
+    route.route_file_error = ""
+    route.save(update_fields=updated + ["route_file_status", "route_file_error", "updated"])
+    return updated
+
+
+def _ingest_in_worker(route_id: int) -> None:
+    close_old_connections()
+    try:
+        ingest_route_file(route_id)
+    except Exception:
+        logger.exception("Route file ingestion failed for route %s", route_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_route_file_ingestion(route_id: int) -> None:
+    """
+    Ставит разбор файла в фоновый пул после коммита транзакции.
+
+    Пул живёт в памяти процесса: задачи, не дошедшие до разбора к перезапуску
+    воркера (в том числе по ``max_requests``), остаются в статусе
+    ``pending`` и дорабатываются командой ``ingest_route_files``.
+    """
+    transaction.on_commit(lambda: _get_executor().submit(_ingest_in_worker, route_id))
@@ -0,0 +1,327 @@
+"""
+Массовый импорт маршрутов: CSV-логбук или ZIP-архив с GPX/KML/IGC.
+
+Строки валидируются пачками, маршруты создаются через ``bulk_create``
+порциями. Ошибка в одной строке не прерывает импорт — она попадает в отчёт.
+
+Файлы архива читаются по одному: в памяти одновременно только разбираемые
+файлы, а строка импорта хранит ссылку на файл в архиве, а не его байты.
+Крупные архивы разбираются в общем на процесс пуле
+(``ROUTE_IMPORT_PROCESSES`` процессов, запущенных через spawn: fork из
+многопоточного воркера gunicorn небезопасен); в пул одновременно отдано не
+больше двух файлов на процесс. Повреждённый архив (битая CRC, обрезанный
+файл, шифрование) — ``RouteImportError``, а не 500.
+"""
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from rest_framework import serializers
+
+from core.http_cache import schedule_invalidation
+from post.fragments import ROUTE, schedule_fragment_invalidation
+from post.models import FlightRoute
+from post.route_files import detect_format, parse_route_fields
+from post.search import index_routes
+from post.stats import refresh_pilot_stats
+
+logger = logging.getLogger(__name__)
+
+# Колонки CSV совпадают с полями FlightRoute
+CSV_FIELDS = (
+    "title",
+    "departure",
+    "destination",
+    "departure_lat",
+    "departure_lng",
+    "destination_lat",
+    "destination_lng",
+    "waypoints",
+    "description",
+    "flight_date",
+    "flight_duration",
+    "distance",
+    "aircraft_type",
+    "visibility",
+)
+
+# Меньше этого числа файлов разбираем в текущем процессе: пул дороже
+MIN_FILES_FOR_PROCESS_POOL = 8
+
+_HOURS_MINUTES = re.compile(r"^\d+:\d{2}$")
+
+# Чем zipfile сообщает о повреждённом содержимом архива
+_ZIP_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError)
+
+
+class RouteImportError(ValueError):
+    """Файл импорта целиком непригоден (формат, размер, кодировка)."""
+
+
+@dataclass
+class ImportRow:
+    """Строка импорта: номер/источник и сырые данные для сериализатора."""
+
+    row: int
+    source: str
+    data: dict
+    file_name: str = ""
+    archive: zipfile.ZipFile | None = None
+    member: zipfile.ZipInfo | None = None
+    error: str = ""
+
+    def read_file(self) -> bytes:
+        """Содержимое файла из архива — читается только когда нужно."""
+        try:
+            return self.archive.read(self.member)
+        except _ZIP_ERRORS as exc:
+            raise RouteImportError(f"Не удалось распаковать {self.file_name}: {exc}") from exc
+
+
+@dataclass
+class ImportReport:
+    total: int = 0
+    created: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, row: ImportRow, errors) -> None:
+        self.errors.append({"row": row.row, "source": row.source, "errors": errors})
+
+    def as_dict(self) -> dict:
+        return {"total": self.total, "created": self.created, "errors": self.errors}
+
+
+def _normalize_csv_value(name: str, value: str) -> str | None:
+    value = (value or "").strip()
+    if not value:
+        return None
+    # В логбуках длительность обычно пишут как ЧЧ:ММ, DRF понял бы это как ММ:СС
+    if name == "flight_duration" and _HOURS_MINUTES.match(value):
+        return f"{value}:00"
+    if name in ("distance", "departure_lat", "departure_lng", "destination_lat", "destination_lng"):
+        return value.replace(",", ".")
+    return value
+
+
+def read_csv_rows(fileobj) -> list[ImportRow]:
+    """Читает CSV-логбук; разделитель (``,``, ``;`` или табуляция) определяется автоматически."""
+    raw = fileobj.read()
+    if isinstance(raw, bytes):
+        try:
+            raw = raw.decode("utf-8-sig")
+        except UnicodeDecodeError as exc:
+            raise RouteImportError("CSV должен быть в кодировке UTF-8.") from exc
+    try:
+        dialect = csv.Sniffer().sniff(raw[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(raw), dialect=dialect)
+    if not reader.fieldnames:
+        raise RouteImportError("CSV не содержит заголовка.")
+    columns = {name: (name or "").strip().lower() for name in reader.fieldnames}
+    if not {"departure", "destination"} <= set(columns.values()):
+        raise RouteImportError("В CSV нужны как минимум колонки departure и destination.")
+
+    rows = []
+    # Строка 1 — заголовок
+    for number, record in enumerate(reader, start=2):
+        data = {}
+        for original, name in columns.items():
+            if name in CSV_FIELDS:
+                value = _normalize_csv_value(name, record.get(original))
+                if value is not None:
+                    data[name] = value
+        rows.append(ImportRow(row=number, source="csv", data=data))
+    return rows
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Пул процессов для разбора файлов, один на процесс-воркер."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        # Пул родителя после fork (gunicorn --preload) в дочернем процессе не работает
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.ROUTE_IMPORT_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _discard_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _read_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> bytes:
+    try:
+        return archive.read(info)
+    except _ZIP_ERRORS as exc:
+        raise RouteImportError(f"Архив повреждён: {info.filename}: {exc}") from exc
+
+
+def _parse_members(archive: zipfile.ZipFile, members: list) -> list:
+    """(поля, ошибка) для каждого файла; файлы распаковываются по одному."""
+    processes = settings.ROUTE_IMPORT_PROCESSES
+    if processes <= 0 or len(members) < MIN_FILES_FOR_PROCESS_POOL:
+        return [parse_route_fields(info.filename, _read_member(archive, info)) for info in members]
+
+    try:
+        pool = _get_pool()
+        results = []
+        pending = deque()
+        for info in members:
+            pending.append(pool.submit(parse_route_fields, info.filename, _read_member(archive, info)))
+            if len(pending) >= processes * 2:
+                results.append(pending.popleft().result())
+        results.extend(future.result() for future in pending)
+        return results
+    except BrokenProcessPool:
+        # Процесс пула погиб (OOM-killer и т.п.) — пересоздадим пул в следующий раз
+        logger.exception("Route import process pool is broken, parsing in-process")
+        _discard_pool()
+        return [parse_route_fields(info.filename, _read_member(archive, info)) for info in members]
+
+
+def read_zip_rows(fileobj) -> list[ImportRow]:
+    """Достаёт GPX/KML/IGC из архива и разбирает их (крупные архивы — в пуле процессов)."""
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except (zipfile.BadZipFile, OSError) as exc:
+        raise RouteImportError("Файл не является ZIP-архивом.") from exc
+
+    members = [
+        info for info in archive.infolist()
+        if not info.is_dir() and detect_format(info.filename) is not None
+    ]
+    if len(members) > settings.ROUTE_IMPORT_MAX_FILES:
+        raise RouteImportError(
+            f"Слишком много файлов в архиве (максимум {settings.ROUTE_IMPORT_MAX_FILES})."
+        )
+    if sum(info.file_size for info in members) > settings.ROUTE_IMPORT_MAX_BYTES:
+        raise RouteImportError("Архив слишком большой после распаковки.")
+    if any(info.flag_bits & 0x1 for info in members):
+        raise RouteImportError("Зашифрованные архивы не поддерживаются.")
+
+    results = _parse_members(archive, members)
+    return [
+        ImportRow(
+            row=number,
+            source=info.filename,
+            data=data or {},
+            file_name=info.filename,
+            archive=archive,
+            member=info,
+            error=error or "",
+        )
+        for number, (info, (data, error)) in enumerate(zip(members, results), start=1)
+    ]
+
+
+def read_import_rows(fileobj, name: str) -> list[ImportRow]:
+    extension = (name or "").rsplit(".", 1)[-1].lower()
+    if extension == "zip":
+        return read_zip_rows(fileobj)
+    if extension == "csv":
+        return read_csv_rows(fileobj)
+    raise RouteImportError("Поддерживаются только файлы .csv и .zip.")
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def import_routes(
+    pilot,
+    rows: list[ImportRow],
+    visibility: str | None = None,
+    chunk_size: int | None = None,
+) -> ImportReport:
+    """
+    Валидирует строки и создаёт маршруты пачками.
+
+    Каждая порция создаётся в своей транзакции: сбой базы затрагивает
+    только её строки, уже созданные порции остаются.
+    """
+    from post.api.route_serializers import FlightRouteImportSerializer
+
+    chunk_size = chunk_size or settings.ROUTE_IMPORT_CHUNK_SIZE
+    report = ImportReport(total=len(rows))
+    # Один экземпляр на весь импорт: поля сериализатора строятся один раз
+    validator = FlightRouteImportSerializer()
+    route_file_field = FlightRoute._meta.get_field("route_file")
+
+    for batch in _chunks(rows, chunk_size):
+        routes = []
+        batch_rows = []
+        for row in batch:
+            if row.error:
+                report.add_error(row, {"route_file": [row.error]})
+                continue
+            data = dict(row.data)
+            if visibility and "visibility" not in data:
+                data["visibility"] = visibility
+            try:
+                validated = validator.run_validation(data)
+            except serializers.ValidationError as exc:
+                report.add_error(row, exc.detail)
+                continue
+            route = FlightRoute(pilot=pilot, **validated)
+            if row.member is not None:
+                try:
+                    content = row.read_file()
+                except RouteImportError as exc:
+                    report.add_error(row, {"route_file": [str(exc)]})
+                    continue
+                stored_name = route_file_field.generate_filename(route, row.file_name.rsplit("/", 1)[-1])
+                route.route_file.name = route_file_field.storage.save(stored_name, ContentFile(content))
+            routes.append(route)
+            batch_rows.append(row)
+
+        if not routes:
+            continue
+        try:
+            with transaction.atomic():
+                FlightRoute.objects.bulk_create(routes)
+                # bulk_create не шлёт post_save — индексируем порцию сами
+                index_routes(route.pk for route in routes)
+        except Exception as exc:
+            logger.exception("Bulk route import chunk failed")
+            for route in routes:
+                if route.route_file:
+                    route.route_file.storage.delete(route.route_file.name)
+            for row in batch_rows:
+                report.add_error(row, {"non_field_errors": [f"Ошибка сохранения: {exc}"]})
+            continue
+        report.created += len(routes)
+        # bulk_create не шлёт post_save — сбрасываем кэши ответов и фрагментов сами
+        schedule_invalidation("routes", "pilots", *(f"route:{route.pk}" for route in routes))
+        schedule_fragment_invalidation(ROUTE, [route.pk for route in routes])
+
+    if report.created:
+        # Статистику пересчитываем один раз на весь импорт
+        refresh_pilot_stats([pilot.pk])
+    return report
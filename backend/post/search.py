@@ -0,0 +1,233 @@
+"""
+Полнотекстовый поиск по маршрутам.
+
+- PostgreSQL: поле ``FlightRoute.search_vector`` (tsvector) с GIN-индексом
+  плюс триграммные индексы по кодам аэропортов (pg_trgm). Поле и индексы
+  объявлены в модели; значение считает триггер базы при вставке и
+  изменении маршрута и при смене имени пилота
+  (миграция ``0011_flightroute_search_vector_field``), без лишнего UPDATE
+  из приложения.
+- SQLite: виртуальная таблица FTS5 ``post_flightroute_fts``, которую
+  обновляют сигналы (см. ``post.signals``); ``search_vector`` там пуст.
+- Прочие БД (или SQLite без FTS5): прежний поиск через icontains.
+
+В запрос попадают только слова (``\\w+``): кавычки и операторы из ввода
+пользователя отбрасываются и не доходят до синтаксиса tsquery/FTS5.
+"""
+import re
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import connection, models
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "post_flightroute_fts"
+
+# Запросы короче этого считаем кодом аэропорта и ищем ещё и по триграммам
+AIRPORT_CODE_MAX_LENGTH = 4
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+class SearchGinIndex(GinIndex):
+    """
+    GIN-индекс на PostgreSQL. На прочих СУБД вместо него создаётся обычный
+    индекс по тем же полям и выражениям без классов операторов: GIN там не
+    поддерживается, а миграции и пересоздание таблиц в SQLite должны
+    проходить.
+    """
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        if schema_editor.connection.vendor == "postgresql":
+            return super().create_sql(model, schema_editor, using=using, **kwargs)
+        if self.expressions:
+            expressions = [
+                expression.source_expressions[0] if isinstance(expression, OpClass) else expression
+                for expression in self.expressions
+            ]
+            fallback = models.Index(*expressions, name=self.name)
+        else:
+            fallback = models.Index(fields=self.fields, name=self.name)
+        return fallback.create_sql(model, schema_editor, **kwargs)
+
+
+def _tables():
+    from accounts.models import User
+    from post.models import FlightRoute
+
+    quote = connection.ops.quote_name
+    return quote(FlightRoute._meta.db_table), quote(User._meta.db_table)
+
+
+def _search_words(query: str) -> list[str]:
+    return _WORD.findall(query or "")[:16]
+
+
+def _no_matches(queryset):
+    # Запрос из одних знаков препинания; search_rank нужен сортировке во вью
+    return queryset.annotate(search_rank=models.Value(0.0, output_field=models.FloatField())).none()
+
+
+class IcontainsRouteSearch:
+    """Запасной вариант без поискового индекса."""
+
+    ranked = False
+
+    def filter(self, queryset, query: str):
+        return queryset.filter(
+            models.Q(title__icontains=query)
+            | models.Q(departure__icontains=query)
+            | models.Q(destination__icontains=query)
+            | models.Q(pilot__username__icontains=query)
+        )
+
+    def index_where(self, where_sql: str, params) -> None:
+        pass
+
+    def remove(self, route_ids) -> None:
+        pass
+
+    def rebuild(self) -> None:
+        pass
+
+
+class PostgresRouteSearch:
+    """tsvector + GIN для текста, pg_trgm для кодов аэропортов; индекс ведёт триггер."""
+
+    ranked = True
+
+    def filter(self, queryset, query: str):
+        words = _search_words(query)
+        if not words:
+            return _no_matches(queryset)
+        table, _ = _tables()
+        # Префиксный поиск: "uue" находит "UUEE"
+        tsquery = " & ".join(f"{word}:*" for word in words)
+        match_sql = f"{table}.search_vector @@ to_tsquery('simple', %s)"
+        rank_sql = f"ts_rank({table}.search_vector, to_tsquery('simple', %s))"
+        params = [tsquery]
+
+        code = query.strip().upper()
+        if len(words) == 1 and len(code) <= AIRPORT_CODE_MAX_LENGTH:
+            # Триграммы (порог pg_trgm.similarity_threshold) ловят опечатки: "UUEW" -> "UUEE"
+            match_sql = (
+                f"({match_sql} OR upper({table}.departure) %% %s OR upper({table}.destination) %% %s)"
+            )
+            rank_sql = (
+                f"({rank_sql} + greatest(similarity(upper({table}.departure), %s),"
+                f" similarity(upper({table}.destination), %s)))"
+            )
+            params += [code, code]
+
+        return queryset.filter(
+            RawSQL(match_sql, params, output_field=models.BooleanField())
+        ).annotate(search_rank=RawSQL(rank_sql, params, output_field=models.FloatField()))
+
+    def index_where(self, where_sql: str, params) -> None:
+        # search_vector пересчитывает триггер
+        pass
+
+    def remove(self, route_ids) -> None:
+        # Колонка удаляется вместе со строкой
+        pass
+
+    def rebuild(self) -> None:
+        table, _ = _tables()
+        with connection.cursor() as cursor:
+            # Триггер срабатывает на UPDATE OF pilot_id и пересчитывает документ
+            cursor.execute(f"UPDATE {table} SET pilot_id = pilot_id")
+
+
+class SqliteRouteSearch:
+    """FTS5 с ранжированием bm25."""
+
+    ranked = True
+
+    def filter(self, queryset, query: str):
+        words = _search_words(query)
+        if not words:
+            return _no_matches(queryset)
+        table, _ = _tables()
+        match = " ".join(f'"{word}"*' for word in words)
+        # bm25 тем меньше, чем документ релевантнее — меняем знак
+        rank_sql = (
+            f"(SELECT -bm25({FTS_TABLE}, 10.0, 10.0, 10.0, 5.0, 2.0, 1.0) FROM {FTS_TABLE}"
+            f" WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {table}.id)"
+        )
+        return queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        ).annotate(search_rank=RawSQL(rank_sql, [match], output_field=models.FloatField()))
+
+    def index_where(self, where_sql: str, params) -> None:
+        table, user_table = _tables()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT r.id FROM {table} AS r WHERE {where_sql})",
+                params,
+            )
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, departure, destination, pilot, aircraft_type, description)"
+                f" SELECT r.id, r.title, r.departure, r.destination, u.username,"
+                f" coalesce(r.aircraft_type, ''), coalesce(r.description, '')"
+                f" FROM {table} AS r JOIN {user_table} AS u ON u.id = r.pilot_id WHERE {where_sql}",
+                params,
+            )
+
+    def remove(self, route_ids) -> None:
+        route_ids = list(route_ids)
+        if not route_ids:
+            return
+        placeholders = ", ".join(["%s"] * len(route_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", route_ids)
+
+    def rebuild(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        self.index_where("1 = 1", [])
+
+
+_backends = {}
+
+
+def get_search_backend():
+    """Бэкенд поиска для текущего соединения (определяется один раз)."""
+    vendor = connection.vendor
+    backend = _backends.get(connection.alias)
+    if backend is None:
+        if vendor == "postgresql":
+            backend = PostgresRouteSearch()
+        elif vendor == "sqlite" and FTS_TABLE in connection.introspection.table_names():
+            backend = SqliteRouteSearch()
+        else:
+            backend = IcontainsRouteSearch()
+        _backends[connection.alias] = backend
+    return backend
+
+
+def search_routes(queryset, query: str):
+    """Фильтрует маршруты по поисковому запросу; при наличии индекса добавляет ``search_rank``."""
+    return get_search_backend().filter(queryset, query)
+
+
+def is_ranked() -> bool:
+    return get_search_backend().ranked
+
+
+def index_routes(route_ids) -> None:
+    route_ids = [int(route_id) for route_id in route_ids]
+    if not route_ids:
+        return
+    placeholders = ", ".join(["%s"] * len(route_ids))
+    get_search_backend().index_where(f"r.id IN ({placeholders})", route_ids)
+
+
+def index_pilot_routes(pilot_id: int) -> None:
+    get_search_backend().index_where("r.pilot_id = %s", [pilot_id])
+
+
+def remove_routes(route_ids) -> None:
+    get_search_backend().remove(route_ids)
+
+
+def rebuild_index() -> None:
+    get_search_backend().rebuild()
@@ -0,0 +1,122 @@
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.http_cache import schedule_invalidation
+from post.fragments import POST, ROUTE, schedule_fragment_invalidation
+from post.models import Comment, FlightRoute, Post, PostImage
+from post.search import index_pilot_routes, index_routes, remove_routes
+from post.stats import refresh_pilot_stats
+
+
+@receiver(post_save, sender=FlightRoute)
+def index_flight_route(sender, instance, **kwargs):
+    """Держим поисковый индекс маршрутов в актуальном состоянии."""
+    index_routes([instance.pk])
+
+
+@receiver(post_delete, sender=FlightRoute)
+def unindex_flight_route(sender, instance, **kwargs):
+    remove_routes([instance.pk])
+
+
+@receiver(post_save, sender=FlightRoute)
+def update_pilot_stats_on_save(sender, instance, **kwargs):
+    """Пересчитываем статистику только владельца маршрута."""
+    refresh_pilot_stats([instance.pilot_id])
+
+
+@receiver(post_delete, sender=FlightRoute)
+def update_pilot_stats_on_delete(sender, instance, **kwargs):
+    refresh_pilot_stats([instance.pilot_id], create=False)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reindex_pilot_routes(sender, instance, created, **kwargs):
+    """Имя пилота входит в поисковый документ его маршрутов."""
+    if not created and "username" in getattr(instance, "_changed_author_fields", ()):
+        index_pilot_routes(instance.pk)
+
+
+# --- Кэш анонимных ответов (core.http_cache) и фрагментов (post.fragments) ---
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_cache(sender, instance, **kwargs):
+    schedule_invalidation("posts", f"post:{instance.pk}")
+    schedule_fragment_invalidation(POST, [instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=PostImage)
+@receiver(post_delete, sender=PostImage)
+def invalidate_post_cache_for_child(sender, instance, **kwargs):
+    """Комментарии и изображения входят в ответ поста."""
+    schedule_invalidation("posts", f"post:{instance.post_id}")
+    schedule_fragment_invalidation(POST, [instance.post_id])
+
+
+@receiver(post_save, sender=FlightRoute)
+@receiver(post_delete, sender=FlightRoute)
+def invalidate_route_cache(sender, instance, **kwargs):
+    # Статистика маршрутов выводится в списке пилотов
+    schedule_invalidation("routes", f"route:{instance.pk}", "pilots")
+    schedule_fragment_invalidation(ROUTE, [instance.pk])
+
+
+def _cleared_key(sender) -> str:
+    return f"_cleared_{sender._meta.db_table}"
+
+
+def _changed_object_ids(sender, instance, action, reverse, model, pk_set):
+    """
+    id постов или маршрутов, которых коснулось изменение m2m.
+
+    reverse — изменение со стороны пользователя (user.liked_post.add(...)).
+    После обратного clear() pk_set пуст, поэтому связанные id запоминаются
+    на pre_clear и забираются на post_clear.
+    """
+    if action == "pre_clear":
+        if reverse:
+            fields = {field.related_model: field for field in sender._meta.concrete_fields if field.is_relation}
+            source, target = fields[instance._meta.concrete_model], fields[model]
+            instance.__dict__[_cleared_key(sender)] = list(
+                sender.objects.filter(**{source.attname: instance.pk}).values_list(target.attname, flat=True)
+            )
+        return []
+    if not reverse:
+        return [instance.pk]
+    if action == "post_clear":
+        return instance.__dict__.pop(_cleared_key(sender), [])
+    return list(pk_set or ())
+
+
+@receiver(m2m_changed, sender=Post.likes.through)
+@receiver(m2m_changed, sender=Post.saves.through)
+def invalidate_post_cache_on_reaction(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action in ("pre_clear", "post_add", "post_remove", "post_clear"):
+        ids = _changed_object_ids(sender, instance, action, reverse, model, pk_set)
+        if ids:
+            schedule_invalidation("posts", *(f"post:{pk}" for pk in ids))
+            schedule_fragment_invalidation(POST, ids)
+
+
+@receiver(m2m_changed, sender=FlightRoute.likes.through)
+@receiver(m2m_changed, sender=FlightRoute.saves.through)
+def invalidate_route_cache_on_reaction(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action in ("pre_clear", "post_add", "post_remove", "post_clear"):
+        ids = _changed_object_ids(sender, instance, action, reverse, model, pk_set)
+        if ids:
+            schedule_invalidation("routes", *(f"route:{pk}" for pk in ids))
+            schedule_fragment_invalidation(ROUTE, ids)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_author_fragments(sender, instance, created, **kwargs):
+    """Карточка автора входит во фрагменты его постов и маршрутов."""
+    if created or not getattr(instance, "_changed_author_fields", ()):
+        return
+    schedule_fragment_invalidation(POST, Post.objects.filter(creator=instance).values_list("pk", flat=True))
+    schedule_fragment_invalidation(ROUTE, FlightRoute.objects.filter(pilot=instance).values_list("pk", flat=True))
@@ -0,0 +1,129 @@
+"""
+Статистика пилотов (PilotStats) по их маршрутам.
+
+Пересчёт идёт только для затронутых пилотов и опирается на индекс
+FlightRoute(pilot, ...), так что стоимость записи не зависит от размера
+таблицы маршрутов.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+from django.db.models.functions import Trim, Upper
+
+from post.models import FlightRoute, PilotStats
+
+# Поля, по которым можно строить лидерборд
+LEADERBOARD_STATS = (
+    "routes_count",
+    "total_distance",
+    "total_duration",
+    "aircraft_types_count",
+    "airports_count",
+)
+
+STATS_FIELDS = LEADERBOARD_STATS
+
+
+def compute_pilot_stats(pilot_ids, route_model=FlightRoute) -> dict:
+    """
+    Считает статистику для набора пилотов (пилоты без маршрутов получают нули).
+
+    ``route_model`` подменяется исторической моделью в миграциях.
+    """
+    pilot_ids = list(pilot_ids)
+    stats = {
+        pilot_id: {
+            "routes_count": 0,
+            "total_distance": Decimal("0"),
+            "total_duration": timedelta(0),
+            "aircraft_types_count": 0,
+            "airports_count": 0,
+        }
+        for pilot_id in pilot_ids
+    }
+    if not pilot_ids:
+        return stats
+
+    routes = route_model.objects.filter(pilot_id__in=pilot_ids).order_by()
+    totals = routes.values("pilot_id").annotate(
+        routes_count=Count("id"),
+        total_distance=Sum("distance"),
+        total_duration=Sum("flight_duration"),
+        aircraft_types_count=Count(Upper(Trim("aircraft_type")), distinct=True),
+    )
+    for row in totals:
+        stats[row["pilot_id"]].update(
+            routes_count=row["routes_count"],
+            total_distance=row["total_distance"] or Decimal("0"),
+            total_duration=row["total_duration"] or timedelta(0),
+            aircraft_types_count=row["aircraft_types_count"],
+        )
+
+    # Аэропорты — объединение пунктов вылета и назначения без учёта регистра
+    airports = defaultdict(set)
+    for field in ("departure", "destination"):
+        pairs = (
+            routes.annotate(code=Upper(Trim(field)))
+            .values_list("pilot_id", "code")
+            .distinct()
+        )
+        for pilot_id, code in pairs:
+            if code:
+                airports[pilot_id].add(code)
+    for pilot_id, codes in airports.items():
+        stats[pilot_id]["airports_count"] = len(codes)
+    return stats
+
+
+def refresh_pilot_stats(
+    pilot_ids,
+    create: bool = True,
+    route_model=FlightRoute,
+    stats_model=PilotStats,
+) -> None:
+    """
+    Пересчитывает и сохраняет статистику указанных пилотов одним upsert.
+
+    ``create=False`` только обновляет существующие строки — так делаем при
+    удалении маршрутов, чтобы каскадное удаление пилота не создало строку
+    статистики заново.
+    """
+    stats = compute_pilot_stats(set(pilot_ids), route_model=route_model)
+    if not stats:
+        return
+    if not create:
+        for pilot_id, values in stats.items():
+            stats_model.objects.filter(pilot_id=pilot_id).update(**values)
+        return
+    stats_model.objects.bulk_create(
+        [stats_model(pilot_id=pilot_id, **values) for pilot_id, values in stats.items()],
+        update_conflicts=True,
+        unique_fields=["pilot"],
+        update_fields=[*STATS_FIELDS, "updated"],
+    )
+
+
+def rebuild_pilot_stats(
+    chunk_size: int = 500,
+    user_model=None,
+    route_model=FlightRoute,
+    stats_model=PilotStats,
+) -> int:
+    """Полный пересчёт статистики всех пилотов порциями; возвращает число пилотов."""
+    if user_model is None:
+        user_model = PilotStats._meta.get_field("pilot").related_model
+    total = 0
+    last_id = 0
+    while True:
+        pilot_ids = list(
+            user_model.objects.filter(pk__gt=last_id)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:chunk_size]
+        )
+        if not pilot_ids:
+            return total
+        refresh_pilot_stats(pilot_ids, route_model=route_model, stats_model=stats_model)
+        total += len(pilot_ids)
+        last_id = pilot_ids[-1]
@@ -1,3 +1,512 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from accounts.models import Follow, User
+from core.fast_json import BACKENDS, FastJSONRenderer, load_backend
+from post.api.route_serializers import FlightRouteSerializer
+from post.api.route_views import apply_visibility_filter
+from post.api.serializers import PostSerializer
+from post.fragments import POST, get_fragments, invalidate_fragments, set_fragments
+from core.http_cache import get_generations
+from post.models import FlightRoute, PilotStats, Post
+from post.route_import import RouteImportError, import_routes, read_import_rows
+from post.route_files import RouteFileError, ingest_route_file, parse_route_file
+from post.search import SqliteRouteSearch, get_search_backend, search_routes
+from post.stats import rebuild_pilot_stats, refresh_pilot_stats
+
+
+def _gpx(*points) -> io.BytesIO:
+    body = "".join(
+        f'<trkpt lat="{lat}" lon="{lng}">' + (f"<time>{when}</time>" if when else "") + "</trkpt>"
+        for lat, lng, when in points
+    )
+    return io.BytesIO(
+        '<?xml version="1.0"?><gpx xmlns="http://www.topografix.com/GPX/1/1">'
+        f"<trk><trkseg>{body}</trkseg></trk></gpx>".encode()
+    )
+
+
+class RouteFileParsingTests(SimpleTestCase):
+    def test_track_time_gives_duration(self):
+        parsed = parse_route_file(
+            _gpx((55.97, 37.41, "2024-05-01T08:00:00Z"), (59.8, 30.26, "2024-05-01T09:20:00Z")),
+            "track.gpx",
+        )
+        self.assertEqual(str(parsed.flight_duration), "1:20:00")
+        self.assertEqual(str(parsed.departure_lat), "55.97")
+
+    def test_invalid_time_is_route_file_error(self):
+        with self.assertRaises(RouteFileError):
+            parse_route_file(_gpx((1, 2, "2024-13-01T00:00:00Z"), (1.1, 2.1, "2024-01-01T00:00:00Z")), "a.gpx")
+
+    def test_mixed_timezones_are_route_file_error(self):
+        with self.assertRaises(RouteFileError):
+            parse_route_file(_gpx((1, 2, "2024-01-01T00:00:00Z"), (1.1, 2.1, "2024-01-01T01:00:00")), "a.gpx")
+
+    def test_non_finite_and_out_of_range_coordinates_are_rejected(self):
+        for lat, lng in (("nan", "inf"), (91, 10), (10, 500)):
+            with self.subTest(lat=lat, lng=lng), self.assertRaises(RouteFileError):
+                parse_route_file(_gpx((lat, lng, None), (1, 2, None)), "a.gpx")
+
+    def test_xml_entities_are_rejected(self):
+        content = (
+            b'<?xml version="1.0"?><!DOCTYPE gpx [<!ENTITY x SYSTEM "file:///etc/passwd">]>'
+            b"<gpx><trk><name>&x;</name></trk></gpx>"
+        )
+        with self.assertRaises(RouteFileError):
+            parse_route_file(io.BytesIO(content), "a.gpx")
+
+
+
+class RouteZipImportTests(SimpleTestCase):
+    def _zip(self, compression=zipfile.ZIP_DEFLATED, **files) -> bytes:
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", compression) as archive:
+            for name, content in files.items():
+                archive.writestr(name, content)
+        return buffer.getvalue()
+
+    def test_rows_reference_archive_members(self):
+        track = _gpx((56.0, 37.0, "2024-05-01T08:00:00Z"), (56.1, 37.1, "2024-05-01T08:30:00Z")).getvalue()
+        rows = read_import_rows(io.BytesIO(self._zip(**{"a.gpx": track, "b.gpx": b"<gpx><trk"})), "log.zip")
+        self.assertEqual([row.source for row in rows], ["a.gpx", "b.gpx"])
+        self.assertEqual(rows[0].error, "")
+        self.assertTrue(rows[1].error)
+        # Байты файла не хранятся в строке, а читаются при сохранении
+        self.assertEqual(rows[0].read_file(), track)
+
+    def test_corrupted_member_is_import_error(self):
+        content = bytearray(self._zip(zipfile.ZIP_STORED, **{"a.gpx": _gpx((56.0, 37.0, None)).getvalue()}))
+        content[content.index(b"<trkpt") + 2] ^= 0xFF
+        with self.assertRaisesMessage(RouteImportError, "Архив повреждён"):
+            read_import_rows(io.BytesIO(bytes(content)), "log.zip")
+
+    def test_truncated_archive_is_import_error(self):
+        content = self._zip(**{"a.gpx": _gpx((56.0, 37.0, None)).getvalue()})
+        with self.assertRaises(RouteImportError):
+            read_import_rows(io.BytesIO(content[:40]), "log.zip")
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", email="author@example.com", password="x")
+        self.post = Post.objects.create(creator=self.author, content="first")
+        request = Request(RequestFactory().get("/"))
+        request.user = AnonymousUser()
+        self.context = {"request": request}
+
+    def _render(self):
+        return PostSerializer(Post.objects.filter(pk=self.post.pk), many=True, context=self.context).data[0]
+
+    def test_fragment_is_dropped_only_after_commit(self):
+        self._render()
+        self.assertIn(self.post.pk, get_fragments(POST, [self.post.pk]))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.post.content = "second"
+            self.post.save()
+            # Пока транзакция не закоммичена, фрагмент не трогаем
+            self.assertIn(self.post.pk, get_fragments(POST, [self.post.pk]))
+        for callback in callbacks:
+            callback()
+
+        self.assertNotIn(self.post.pk, get_fragments(POST, [self.post.pk]))
+        self.assertEqual(self._render()["content"], "second")
+
+    def test_author_profile_change_drops_fragments(self):
+        self._render()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.username = "renamed"
+            self.author.save()
+        self.assertEqual(self._render()["creator"]["username"], "renamed")
+
+    def test_login_keeps_author_fragments(self):
+        self._render()
+        author = User.objects.get(pk=self.author.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            # Только UPDATE: старое имя не перечитывается из базы
+            with self.assertNumQueries(1):
+                author.last_login = timezone.now()
+                author.save(update_fields=["last_login"])
+            author.bio = "Пишу о полётах"
+            author.save()
+        self.assertIn(self.post.pk, get_fragments(POST, [self.post.pk]))
+
+    def test_deferred_author_field_change_drops_fragments(self):
+        self._render()
+        author = User.objects.only("id").get(pk=self.author.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            author.email = "new@example.com"
+            author.save()
+        self.assertNotIn(self.post.pk, get_fragments(POST, [self.post.pk]))
+        self.assertEqual(self._render()["creator"]["email"], "new@example.com")
+
+
+
+# Журнал действий пишется в запросе: фоновый поток не видит тестовую транзакцию
+@override_settings(ACTION_LOG_BUFFERED=False)
+class RouteVisibilityTests(TestCase):
+    def setUp(self):
+        self.viewer = User.objects.create_user(username="viewer", email="viewer@example.com", password="x")
+        self.followed = User.objects.create_user(username="followed", email="followed@example.com", password="x")
+        self.stranger = User.objects.create_user(username="stranger", email="stranger@example.com", password="x")
+        Follow.toggle(self.viewer, self.followed)
+        self.routes = {}
+        for owner in (self.viewer, self.followed, self.stranger):
+            for visibility in ("public", "followers", "private"):
+                self.routes[owner.username, visibility] = FlightRoute.objects.create(
+                    pilot=owner, title=f"{owner.username} {visibility}", departure="UUEE",
+                    destination="ULLI", visibility=visibility,
+                )
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def _visible(self, user):
+        return sorted(route.title for route in apply_visibility_filter(FlightRoute.objects.order_by("-created"), user))
+
+    def test_union_branches(self):
+        self.assertEqual(
+            self._visible(self.viewer),
+            [
+                "followed followers",
+                "followed public",
+                "stranger public",
+                "viewer followers",
+                "viewer private",
+                "viewer public",
+            ],
+        )
+        self.assertEqual(self._visible(AnonymousUser()), ["followed public", "stranger public", "viewer public"])
+
+    def test_saved_routes_page_and_count(self):
+        for route in self.routes.values():
+            route.saves.add(self.viewer)
+        response = self.client.get("/api/post/routes/saved/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 6)
+        self.assertEqual(len(response.json()["results"]), 5)
+
+    def test_hidden_route_is_not_found(self):
+        hidden = self.routes["stranger", "followers"]
+        self.assertEqual(self.client.post(f"/api/post/routes/{hidden.pk}/like/").status_code, 404)
+        visible = self.routes["followed", "followers"]
+        self.assertEqual(self.client.post(f"/api/post/routes/{visible.pk}/save/").json()["saved"], True)
+        # Детали отдаются без аутентификации — только публичные
+        self.assertEqual(APIClient().get(f"/api/post/routes/{visible.pk}/").status_code, 404)
+
+
+@override_settings(ROUTE_FILE_SYNC_PARSE_MAX_BYTES=0, ACTION_LOG_BUFFERED=False)
+class RouteFileIngestionTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        self.scheduled = []
+        self.enterContext(
+            mock.patch("post.api.route_serializers.schedule_route_file_ingestion", self.scheduled.append)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="pilot", email="pilot@example.com", password="x"))
+
+    def _upload(self, content, **fields):
+        upload = SimpleUploadedFile("track.gpx", content, content_type="application/gpx+xml")
+        return self.client.post("/api/post/routes/create/", {"route_file": upload, **fields}, format="multipart")
+
+    def test_background_file_does_not_replace_required_fields(self):
+        response = self._upload(_gpx((55.97, 37.41, None), (59.8, 30.26, None)).getvalue())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {"title", "departure", "destination"})
+        self.assertEqual(self.scheduled, [])
+
+    def test_failed_parse_is_reported_on_the_route(self):
+        response = self._upload(b"<gpx>", title="Test", departure="UUEE", destination="ULLI")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["route_file_status"], "pending")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_route_file(self.scheduled[0])
+        route = self.client.get(f"/api/post/routes/{self.scheduled[0]}/").json()
+        self.assertEqual(route["route_file_status"], "failed")
+        self.assertTrue(route["route_file_error"])
+        self.assertEqual(route["title"], "Test")
+
+    def test_pending_files_are_picked_up_by_command(self):
+        self._upload(
+            _gpx((55.97, 37.41, None), (59.8, 30.26, None)).getvalue(),
+            title="Test", departure="UUEE", destination="ULLI",
+        )
+        # Воркер перезапустился, не дойдя до задачи
+        out = io.StringIO()
+        call_command("ingest_route_files", older_than=0, stdout=out)
+        self.assertIn("Parsed 1 pending route files, 0 failed.", out.getvalue())
+        route = FlightRoute.objects.get(pk=self.scheduled[0])
+        self.assertEqual(route.route_file_status, "done")
+        self.assertEqual(float(route.departure_lat), 55.97)
+
+
+class RouteSearchTests(TestCase):
+    def setUp(self):
+        self.pilot = User.objects.create_user(username="sokolov", email="sokolov@example.com", password="x")
+        self.in_title = FlightRoute.objects.create(
+            pilot=self.pilot, title="Перелёт в Казань", departure="UUEE", destination="UWKD"
+        )
+        self.in_description = FlightRoute.objects.create(
+            pilot=self.pilot, title="Тренировка", departure="UUBW", destination="UUBW",
+            description="Разворот над Казанью", aircraft_type="Cessna 172",
+        )
+
+    def _search(self, query):
+        return list(search_routes(FlightRoute.objects.all(), query).order_by("-search_rank", "-created"))
+
+    def test_uses_fts5_on_sqlite(self):
+        self.assertIsInstance(get_search_backend(), SqliteRouteSearch)
+
+    def test_title_match_ranks_above_description(self):
+        self.assertEqual(self._search("казан"), [self.in_title, self.in_description])
+
+    def test_prefix_and_airport_code(self):
+        self.assertEqual(self._search("uwk"), [self.in_title])
+        self.assertEqual(self._search("cessna"), [self.in_description])
+
+    def test_quotes_and_operators_are_plain_words(self):
+        for query in ('UUEE" OR "x', "UUEE*", "NEAR(UUEE UWKD)", "uuee AND -uwkd", "'; --"):
+            with self.subTest(query=query):
+                self._search(query)
+        self.assertEqual(self._search('"UUEE" OR'), [])
+        self.assertEqual(self._search('"UUEE"'), [self.in_title])
+        self.assertEqual(self._search("()*:^"), [])
+        response = APIClient().get("/api/post/routes/", {"q": "()*:^"})
+        self.assertEqual((response.status_code, response.json()["count"]), (200, 0))
+
+    def test_pilot_rename_reindexes_routes(self):
+        self.pilot.username = "orlov"
+        self.pilot.save()
+        self.assertEqual(len(self._search("orlov")), 2)
+        self.assertEqual(self._search("sokolov"), [])
+
+
+class PilotStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice, self.bob, self.carol = (
+            User.objects.create_user(username=name, email=f"{name}@example.com", password="x")
+            for name in ("alice", "bob", "carol")
+        )
+
+    def _route(self, pilot, departure, destination, **fields):
+        return FlightRoute.objects.create(
+            pilot=pilot, title=f"{departure} → {destination}", departure=departure, destination=destination, **fields
+        )
+
+    def test_airports_and_aircraft_are_counted_case_insensitively(self):
+        self._route(self.alice, "UUEE", "ulli", distance="600.50", flight_duration=timedelta(hours=1), aircraft_type="A320")
+        self._route(self.alice, " ulli ", "Uuee", distance="600.00", flight_duration=timedelta(hours=2), aircraft_type=" a320")
+        self._route(self.alice, "UUEE", "URSS")
+        stats = PilotStats.objects.get(pilot=self.alice)
+        self.assertEqual(
+            (stats.routes_count, stats.airports_count, stats.aircraft_types_count),
+            (3, 3, 1),
+        )
+        self.assertEqual((stats.total_distance, stats.total_duration), (Decimal("1200.50"), timedelta(hours=3)))
+
+    def test_route_delete_updates_stats_without_recreating_rows(self):
+        route = self._route(self.alice, "UUEE", "ULLI")
+        self._route(self.alice, "ULLI", "UUEE")
+        route.delete()
+        self.assertEqual(PilotStats.objects.get(pilot=self.alice).routes_count, 1)
+
+        # Каскад при удалении пилота не должен создать строку заново
+        self.alice.delete()
+        self.assertFalse(PilotStats.objects.filter(pilot_id=self.alice.pk).exists())
+        refresh_pilot_stats([self.bob.pk], create=False)
+        self.assertFalse(PilotStats.objects.filter(pilot=self.bob).exists())
+
+    def test_rebuild_restores_all_pilots(self):
+        self._route(self.alice, "UUEE", "ULLI")
+        PilotStats.objects.all().delete()
+        self.assertEqual(rebuild_pilot_stats(chunk_size=2), 3)
+        self.assertEqual(
+            dict(PilotStats.objects.values_list("pilot_id", "routes_count")),
+            {self.alice.pk: 1, self.bob.pk: 0, self.carol.pk: 0},
+        )
+
+    def test_leaderboard_order_and_stat(self):
+        self._route(self.alice, "UUEE", "ULLI", distance="100", flight_duration=timedelta(hours=5))
+        self._route(self.bob, "UUEE", "ULLI", distance="900", flight_duration=timedelta(hours=1))
+        self._route(self.bob, "ULLI", "UUEE", distance="900", flight_duration=timedelta(hours=1))
+        self._route(self.carol, "UUEE", "URSS", distance="900", flight_duration=timedelta(hours=2))
+        self.carol.is_active = False
+        self.carol.save()
+
+        def usernames(**params):
+            response = APIClient().get("/api/accounts/pilots/leaderboard/", params)
+            self.assertEqual(response.status_code, 200)
+            return [row["username"] for row in response.json()["results"]]
+
+        self.assertEqual(usernames(stat="total_distance"), ["bob", "alice"])
+        self.assertEqual(usernames(stat="routes_count"), ["bob", "alice"])
+        # Неизвестная статистика — налёт по умолчанию
+        self.assertEqual(usernames(stat="password"), ["alice", "bob"])
+        self.assertEqual(usernames(), ["alice", "bob"])
+        # При равенстве — по id пилота
+        self.assertEqual(usernames(stat="airports_count"), ["alice", "bob"])
+
+
+@override_settings(HTTP_CACHE_ENABLED=True, FRAGMENT_CACHE_ENABLED=True)
+class AnonymousResponseCacheTests(TestCase):
+    list_url = "/api/post/routes/"
+
+    def setUp(self):
+        cache.clear()
+        self.pilot = User.objects.create_user(username="pilot", email="pilot@example.com", password="x")
+        self.viewer = User.objects.create_user(username="viewer", email="viewer@example.com", password="x")
+        self.route = FlightRoute.objects.create(
+            pilot=self.pilot, title="Old", departure="UUEE", destination="ULLI", visibility="public"
+        )
+
+    def _titles(self):
+        return [route["title"] for route in self.client.get(self.list_url).json()["results"]]
+
+    def test_second_request_is_served_from_cache(self):
+        self.assertEqual(self._titles(), ["Old"])
+        # update() не шлёт сигналов — ответ остаётся закэшированным
+        FlightRoute.objects.filter(pk=self.route.pk).update(title="New")
+        self.assertEqual(self._titles(), ["Old"])
+
+    def test_etag_revalidation(self):
+        etag = self.client.get(self.list_url)["ETag"]
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_generation_changes_only_after_commit(self):
+        self._titles()
+        before = get_generations(["routes"])
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.route.title = "New"
+            self.route.save()
+            self.assertEqual(get_generations(["routes"]), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_generations(["routes"]), before)
+        self.assertEqual(self._titles(), ["New"])
+
+    def test_reverse_clear_invalidates_detail(self):
+        self.route.likes.add(self.viewer)
+        detail_url = f"/api/post/routes/{self.route.pk}/"
+        self.assertEqual(self.client.get(detail_url).json()["likes_count"], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.viewer.liked_routes.clear()
+        self.assertEqual(self.client.get(detail_url).json()["likes_count"], 0)
+
+    def test_bulk_import_invalidates_list(self):
+        self.assertEqual(self._titles(), ["Old"])
+        rows = read_import_rows(io.BytesIO(b"departure,destination,title\nUUDD,URSS,Imported\n"), "log.csv")
+        with self.captureOnCommitCallbacks(execute=True):
+            report = import_routes(self.pilot, rows, visibility="public")
+        self.assertEqual(report.created, 1)
+        self.assertCountEqual(self._titles(), ["Old", "Imported"])
+
+
+@override_settings(
+    HTTP_CACHE_ENABLED=True, FRAGMENT_CACHE_ENABLED=True, DB_REPLICAS=["replica"], DB_REPLICA_STICKY_SECONDS=5
+)
+class ReplicaLagCacheTests(TestCase):
+    """Сразу после изменения чтение с реплики не должно заново заполнять кэши."""
+
+    list_url = "/api/post/routes/"
+
+    def setUp(self):
+        cache.clear()
+        pilot = User.objects.create_user(username="pilot", email="pilot@example.com", password="x")
+        self.route = FlightRoute.objects.create(
+            pilot=pilot, title="Old", departure="UUEE", destination="ULLI", visibility="public"
+        )
+
+    def _titles(self):
+        return [route["title"] for route in self.client.get(self.list_url).json()["results"]]
+
+    def test_response_from_replica_is_not_cached_right_after_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.route.title = "New"
+            self.route.save()
+        with (
+            mock.patch("core.http_cache.reads_from_replica", return_value=True),
+            mock.patch("post.fragments.reads_from_replica", return_value=True),
+        ):
+            self.assertEqual(self._titles(), ["New"])
+            # Ни ответ, ни фрагмент не закэшированы: следующий запрос снова читает базу
+            FlightRoute.objects.filter(pk=self.route.pk).update(title="Newer")
+            self.assertEqual(self._titles(), ["Newer"])
+
+    def test_response_from_primary_is_cached_right_after_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.route.title = "New"
+            self.route.save()
+        self.assertEqual(self._titles(), ["New"])
+        FlightRoute.objects.filter(pk=self.route.pk).update(title="Newer")
+        self.assertEqual(self._titles(), ["New"])
+
+    def test_fragment_from_replica_is_not_stored_right_after_invalidation(self):
+        invalidate_fragments(POST, [1, 2])
+        with mock.patch("post.fragments.reads_from_replica", return_value=True):
+            set_fragments(POST, {1: {"content": "stale"}, 3: {"content": "fresh"}})
+        self.assertEqual(list(get_fragments(POST, [1, 2, 3])), [3])
+
+        set_fragments(POST, {1: {"content": "primary"}})
+        self.assertEqual(get_fragments(POST, [1]), {1: {"content": "primary"}})
+
+
+class FastJSONParityTests(TestCase):
+    """Быстрые JSON-бэкенды против стандартного рендерера DRF."""
+
+    def _renderers(self):
+        for name in BACKENDS:
+            try:
+                backend = load_backend(name)
+            except ImproperlyConfigured:
+                continue
+            yield name, type("Renderer", (FastJSONRenderer,), {"backend": backend})()
+
+    def test_serializer_output_is_byte_identical(self):
+        pilot = User.objects.create_user(username="пилот", email="pilot@example.com", password="x")
+        Post.objects.create(creator=pilot, content="Полёт\u2028над «облаками» ✈")
+        FlightRoute.objects.create(
+            pilot=pilot, title="Шереметьево → Пулково", departure="UUEE", destination="ULLI",
+            departure_lat="55.972642", departure_lng="37.414589", distance="597.40",
+            flight_duration=timedelta(hours=1, minutes=25), waypoints=[{"lat": 56.5, "lng": 35.25}],
+        )
+        request = Request(RequestFactory().get("/"))
+        request.user = AnonymousUser()
+        context = {"request": request}
+        payload = {
+            "posts": PostSerializer(Post.objects.all(), many=True, context=context).data,
+            "routes": FlightRouteSerializer(FlightRoute.objects.all(), many=True, context=context).data,
+        }
+        reference = JSONRenderer().render(payload, "application/json")
+        for name, renderer in self._renderers():
+            with self.subTest(backend=name):
+                self.assertEqual(renderer.render(payload, "application/json"), reference)
+
+    def test_raw_numbers_differ_only_in_notation(self):
+        payload = {"small": 1.5e-7, "tiny": 1e-5, "big": 1e16, "decimal": Decimal("1.10")}
+        reference = JSONRenderer().render(payload, "application/json")
+        for name, renderer in self._renderers():
+            with self.subTest(backend=name):
+                self.assertEqual(json.loads(renderer.render(payload, "application/json")), json.loads(reference))